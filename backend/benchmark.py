@@ -0,0 +1,392 @@
+import argparse
+import asyncio
+import json
+import os
+import resource
+import secrets
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone, timedelta
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).parent
+DEFAULT_BASELINE = ROOT_DIR / 'benchmark_baseline.json'
+BENCHMARK_PASSWORD = "bench123"
+
+# The app reads its configuration at import time, so the benchmark environment has to be in place first.
+# load_dotenv() never overrides variables that are already set.
+def configure_environment(args):
+    os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+    os.environ['DB_NAME'] = args.db
+    os.environ.setdefault('JWT_SECRET', secrets.token_hex(32))
+    os.environ['PAYMENT_GATEWAY'] = 'fake'
+    os.environ.setdefault('FAKE_PAYMENT_LATENCY_MS', str(args.payment_latency_ms))
+    os.environ.setdefault('AUTO_CREATE_INDEXES', 'true')
+    os.environ.setdefault('STATS_RECONCILE_INTERVAL_SECONDS', '0')
+    os.environ.setdefault('MAX_UPLOAD_SIZE_MB', str(max(args.upload_mb, 1)))
+    # Every simulated client shares one address, so login throttling would measure the limiter rather than the app
+    os.environ.setdefault('LOGIN_RATE_PER_IP_PER_MINUTE', '0')
+    os.environ.setdefault('LOGIN_RATE_PER_EMAIL_PER_MINUTE', '0')
+    # Likewise size the login admission gate to the client count so the storm measures bcrypt queueing, not 503s
+    os.environ.setdefault('LOGIN_VERIFY_CONCURRENCY', str(args.concurrency))
+    os.environ.setdefault('PASSWORD_HASH_QUEUE_SIZE', str(args.concurrency))
+    work_dir = Path(tempfile.mkdtemp(prefix='aibuildx-bench-'))
+    os.environ['UPLOAD_DIR'] = str(work_dir / 'uploads')
+    return work_dir
+
+class RssSampler:
+    # ru_maxrss only ever grows, so sample VmRSS to attribute a peak to each scenario
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak_kb = 0
+        self.task = None
+    
+    @staticmethod
+    def current_kb() -> int:
+        try:
+            with open('/proc/self/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        return int(line.split()[1])
+        except OSError:
+            pass
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    
+    async def run(self):
+        while True:
+            self.peak_kb = max(self.peak_kb, self.current_kb())
+            await asyncio.sleep(self.interval)
+    
+    def __enter__(self):
+        self.peak_kb = self.current_kb()
+        self.task = asyncio.create_task(self.run())
+        return self
+    
+    def __exit__(self, *exc):
+        self.task.cancel()
+        self.peak_kb = max(self.peak_kb, self.current_kb())
+
+def percentile(sorted_values: list, pct: float) -> float:
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, int(round(pct / 100 * len(sorted_values))) - 1))
+    return sorted_values[rank]
+
+class Scenario:
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies = []
+        self.errors = 0
+        self.bytes = 0
+    
+    async def timed(self, coro):
+        started = time.perf_counter()
+        try:
+            response = await coro
+        except Exception:
+            self.errors += 1
+            self.latencies.append(time.perf_counter() - started)
+            return None
+        self.latencies.append(time.perf_counter() - started)
+        if response.status_code >= 400:
+            self.errors += 1
+        return response
+    
+    def report(self, elapsed: float, peak_rss_kb: int) -> dict:
+        latencies = sorted(self.latencies)
+        return {
+            "requests": len(latencies),
+            "errors": self.errors,
+            "seconds": round(elapsed, 3),
+            "throughput": round(len(latencies) / elapsed, 2) if elapsed else 0.0,
+            "p50Ms": round(percentile(latencies, 50) * 1000, 2),
+            "p95Ms": round(percentile(latencies, 95) * 1000, 2),
+            "p99Ms": round(percentile(latencies, 99) * 1000, 2),
+            "peakRssMb": round(peak_rss_kb / 1024, 1),
+            "uploadedMb": round(self.bytes / (1024 * 1024), 1)
+        }
+
+async def run_concurrently(concurrency: int, total: int, worker):
+    queue = asyncio.Queue()
+    for i in range(total):
+        queue.put_nowait(i)
+    
+    async def drain():
+        while True:
+            try:
+                i = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            await worker(i)
+    
+    await asyncio.gather(*(drain() for _ in range(concurrency)))
+
+async def seed_fixture(server, args) -> dict:
+    db = server.db
+    for name in ("users", "companies", "plans", "projects", "transactions", "upload_sessions", "blobs", "processing_jobs"):
+        await db[name].delete_many({})
+    
+    now = datetime.now(timezone.utc)
+    password_hash = await server.hash_password(BENCHMARK_PASSWORD)
+    plan = {"id": "plan_bench", "name": "Bench", "price": 65000, "currency": "INR", "maxUsers": 1000, "storageLimitGB": 1000, "isActive": True}
+    await db.plans.insert_one(plan)
+    
+    companies = [{
+        "id": f"company_bench_{c}",
+        "name": f"Bench Company {c}",
+        "subscriptionStatus": server.SubscriptionStatus.ACTIVE,
+        "subscriptionTier": plan["name"],
+        "maxUsers": plan["maxUsers"],
+        "storageLimit": plan["storageLimitGB"],
+        "subscriptionExpiryDate": now + timedelta(days=30),
+        "createdAt": now
+    } for c in range(args.companies)]
+    await db.companies.insert_many(companies)
+    
+    users = [
+        {"id": "user_bench_super", "name": "Bench Super Admin", "email": "super@bench.example.com", "role": server.UserRole.SUPER_ADMIN},
+        {"id": "user_bench_marketing", "name": "Bench Marketing", "email": "marketing@bench.example.com", "role": server.UserRole.MARKETING}
+    ]
+    for c, company in enumerate(companies):
+        users.append({"id": f"user_bench_admin_{c}", "name": f"Bench Admin {c}", "email": f"admin{c}@bench.example.com", "role": server.UserRole.CLIENT_ADMIN, "companyId": company["id"]})
+        for u in range(args.engineers):
+            users.append({"id": f"user_bench_eng_{c}_{u}", "name": f"Bench Engineer {c}-{u}", "email": f"eng{c}.{u}@bench.example.com", "role": server.UserRole.CLIENT_ENGINEER, "companyId": company["id"]})
+    for user in users:
+        user.update({"passwordHash": password_hash, "createdAt": now})
+    await db.users.insert_many(users)
+    
+    projects = [{
+        "id": f"project_bench_{c}_{p}",
+        "title": f"Bench Project {p}",
+        "location": "Mumbai, Maharashtra",
+        "drawingType": server.DrawingType.PDF,
+        "fileName": f"bench_{p}.pdf",
+        "filePath": "",
+        "status": server.ProjectStatus.COMPLETED,
+        "createdBy": f"user_bench_admin_{c}",
+        "companyId": company["id"],
+        "createdAt": now - timedelta(seconds=p)
+    } for c, company in enumerate(companies) for p in range(args.projects)]
+    for start in range(0, len(projects), 1000):
+        await db.projects.insert_many(projects[start:start + 1000])
+    
+    await server.reconcile_platform_stats()
+    return {
+        "super": "super@bench.example.com",
+        "marketing": "marketing@bench.example.com",
+        "admins": [f"admin{c}@bench.example.com" for c in range(args.companies)],
+        "engineers": [u["email"] for u in users if u["role"] == server.UserRole.CLIENT_ENGINEER]
+    }
+
+async def login(http, email: str) -> dict:
+    response = await http.post("/api/auth/login", json={"email": email, "password": BENCHMARK_PASSWORD})
+    response.raise_for_status()
+    return {"Cookie": f"token={response.cookies['token']}"}
+
+async def scenario_login_storm(http, fixture, args, scenario):
+    emails = fixture["engineers"] or fixture["admins"]
+    
+    async def worker(i):
+        await scenario.timed(http.post("/api/auth/login", json={"email": emails[i % len(emails)], "password": BENCHMARK_PASSWORD}))
+    
+    await run_concurrently(args.concurrency, args.logins, worker)
+
+async def scenario_dashboards(http, fixture, args, scenario):
+    # Each simulated page load issues the same requests the role's dashboard makes on mount
+    sessions = [
+        (await login(http, fixture["super"]), ["/api/dashboard/super-admin"]),
+        (await login(http, fixture["marketing"]), ["/api/dashboard/marketing"]),
+        (await login(http, fixture["admins"][0]), ["/api/dashboard/client-admin"]),
+    ]
+    if fixture["engineers"]:
+        sessions.append((await login(http, fixture["engineers"][0]), ["/api/dashboard/client-engineer"]))
+    
+    async def worker(i):
+        headers, paths = sessions[i % len(sessions)]
+        await asyncio.gather(*(scenario.timed(http.get(path, headers=headers)) for path in paths))
+    
+    await run_concurrently(args.concurrency, args.dashboards, worker)
+
+async def scenario_pagination(http, fixture, args, scenario):
+    headers = await login(http, fixture["admins"][0])
+    
+    async def worker(i):
+        cursor = None
+        while True:
+            params = {"limit": args.page_size}
+            if cursor:
+                params["cursor"] = cursor
+            response = await scenario.timed(http.get("/api/projects", params=params, headers=headers))
+            if response is None or response.status_code != 200:
+                return
+            cursor = response.json()["nextCursor"]
+            if not cursor:
+                return
+    
+    await run_concurrently(args.concurrency, args.page_walks, worker)
+
+async def scenario_checkout(http, fixture, args, scenario, server):
+    headers = await login(http, fixture["admins"][0])
+    
+    async def worker(i):
+        response = await scenario.timed(http.post("/api/subscriptions/create-order", json={"planId": "plan_bench"}, headers=headers))
+        if response is None or response.status_code != 200:
+            return
+        order_id = response.json()["orderId"]
+        payment_id = f"pay_bench_{secrets.token_hex(8)}"
+        await scenario.timed(http.post("/api/subscriptions/verify-payment", headers=headers, json={
+            "razorpayOrderId": order_id,
+            "razorpayPaymentId": payment_id,
+            "razorpaySignature": server.payment_gateway.sign(order_id, payment_id)
+        }))
+    
+    await run_concurrently(args.concurrency, args.checkouts, worker)
+
+async def scenario_uploads(http, fixture, args, scenario):
+    emails = fixture["engineers"] or fixture["admins"]
+    total_size = args.upload_mb * 1024 * 1024
+    
+    async def worker(i):
+        headers = await login(http, emails[i % len(emails)])
+        response = await scenario.timed(http.post("/api/uploads", headers=headers, json={
+            "title": f"Bench Upload {i}",
+            "location": "Pune, Maharashtra",
+            "drawingType": "PDF",
+            "fileName": f"bench_upload_{i}.pdf",
+            "totalSize": total_size
+        }))
+        if response is None or response.status_code != 200:
+            return
+        session = response.json()
+        chunk_size = session["chunkSize"]
+        
+        # Unique content per upload so deduplication does not short-circuit the write path
+        header = b"%PDF-1.4\n%" + secrets.token_bytes(16) + b"\n"
+        for index in range(session["totalChunks"]):
+            size = min(chunk_size, total_size - index * chunk_size)
+            body = (header if index == 0 else b"") + b"\0" * (size - (len(header) if index == 0 else 0))
+            if await scenario.timed(http.put(f"/api/uploads/{session['uploadId']}/chunks/{index}", content=body, headers=headers)) is not None:
+                scenario.bytes += size
+        await scenario.timed(http.post(f"/api/uploads/{session['uploadId']}/complete", headers=headers))
+    
+    await run_concurrently(args.upload_concurrency, args.uploads, worker)
+
+SCENARIOS = ("login_storm", "dashboards", "pagination", "checkout", "uploads")
+
+async def run_benchmarks(args) -> dict:
+    import httpx
+    import server
+    
+    if args.mongo == 'mock':
+        try:
+            from mongomock_motor import AsyncMongoMockClient
+        except ImportError:
+            sys.exit("--mongo mock requires the mongomock-motor package")
+        server.client.close()
+        server.client = AsyncMongoMockClient()
+        server.db = server.client[args.db]
+    
+    await server.app.router.startup()
+    results = {}
+    try:
+        fixture = await seed_fixture(server, args)
+        transport = httpx.ASGITransport(app=server.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=None) as http:
+            for name in args.scenarios:
+                scenario = Scenario(name)
+                with RssSampler() as sampler:
+                    started = time.perf_counter()
+                    if name == "checkout":
+                        await scenario_checkout(http, fixture, args, scenario, server)
+                    else:
+                        await globals()[f"scenario_{name}"](http, fixture, args, scenario)
+                    elapsed = time.perf_counter() - started
+                results[name] = scenario.report(elapsed, sampler.peak_kb)
+                print(f"{name:12s} {json.dumps(results[name])}", file=sys.stderr)
+    finally:
+        if not args.keep_data:
+            await server.client.drop_database(args.db)
+        await server.app.router.shutdown()
+    return results
+
+def compare_to_baseline(results: dict, baseline: dict, tolerance: float) -> list:
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        for metric in ("p50Ms", "p95Ms", "p99Ms", "peakRssMb"):
+            if previous[metric] and current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append(f"{name}.{metric}: {previous[metric]} -> {current[metric]}")
+        if previous["throughput"] and current["throughput"] < previous["throughput"] * (1 - tolerance):
+            regressions.append(f"{name}.throughput: {previous['throughput']} -> {current['throughput']}")
+        if current["errors"] > previous["errors"]:
+            regressions.append(f"{name}.errors: {previous['errors']} -> {current['errors']}")
+    return regressions
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AiBuild X API benchmark")
+    parser.add_argument("--mongo", choices=("local", "mock"), default="mock", help="Use an in-process mongomock-motor stand-in (the committed baseline) or MONGO_URL (default localhost)")
+    parser.add_argument("--db", default="aibuildx_benchmark", help="Database to seed and drop; never point this at real data")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=list(SCENARIOS))
+    parser.add_argument("--concurrency", type=int, default=50)
+    parser.add_argument("--companies", type=int, default=5)
+    parser.add_argument("--engineers", type=int, default=10, help="Engineers per company")
+    parser.add_argument("--projects", type=int, default=2000, help="Projects per company")
+    parser.add_argument("--logins", type=int, default=500)
+    parser.add_argument("--dashboards", type=int, default=500)
+    parser.add_argument("--page-walks", type=int, default=20)
+    parser.add_argument("--page-size", type=int, default=50)
+    parser.add_argument("--checkouts", type=int, default=200)
+    parser.add_argument("--payment-latency-ms", type=int, default=50)
+    parser.add_argument("--uploads", type=int, default=8)
+    parser.add_argument("--upload-concurrency", type=int, default=4)
+    parser.add_argument("--upload-mb", type=int, default=100)
+    parser.add_argument("--baseline", type=Path, default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="Overwrite the baseline with this run")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="Allowed relative slowdown before a metric counts as a regression")
+    parser.add_argument("--allow-missing-baseline", action="store_true", help="Report results without failing when there is no baseline to compare against")
+    parser.add_argument("--keep-data", action="store_true")
+    args = parser.parse_args()
+    
+    settings = {k: v for k, v in vars(args).items() if k not in ("baseline", "save_baseline", "allow_missing_baseline", "keep_data")}
+    baseline = None
+    if not args.save_baseline:
+        # A run with nothing comparable to check against must not read as a pass; fail before the slow part
+        if not args.baseline.exists():
+            print(f"No baseline at {args.baseline}; record one with --save-baseline", file=sys.stderr)
+            if not args.allow_missing_baseline:
+                sys.exit(2)
+        else:
+            baseline = json.loads(args.baseline.read_text())
+            changed = sorted(key for key, value in settings.items() if key not in ("scenarios", "tolerance") and baseline.get("settings", {}).get(key) != value)
+            if changed:
+                print(f"Baseline {args.baseline} was recorded with different settings ({', '.join(changed)}); rerun with its settings or record a new one with --save-baseline", file=sys.stderr)
+                sys.exit(2)
+    
+    work_dir = configure_environment(args)
+    sys.path.insert(0, str(ROOT_DIR))
+    try:
+        results = asyncio.run(run_benchmarks(args))
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+    
+    run = {"createdAt": datetime.now(timezone.utc).isoformat(), "settings": settings, "scenarios": results}
+    print(json.dumps(run, indent=2))
+    
+    if args.save_baseline:
+        args.baseline.write_text(json.dumps(run, indent=2) + "\n")
+        print(f"Saved baseline to {args.baseline}", file=sys.stderr)
+        sys.exit(0)
+    
+    if baseline is None:
+        sys.exit(0)
+    regressions = compare_to_baseline(results, baseline, args.tolerance)
+    if regressions:
+        print("Regressions against baseline:", file=sys.stderr)
+        for line in regressions:
+            print(f"  {line}", file=sys.stderr)
+        sys.exit(1)
+    print("No regressions against baseline", file=sys.stderr)
@@ -0,0 +1,103 @@
+"""MongoDB index registry.
+
+Kept free of app configuration and I/O so `python indexes.py --print-index-plan` works on a machine
+with no database, environment or upload directories.
+"""
+import argparse
+import json
+import sys
+from typing import List
+
+# List endpoints sort newest first with id as tie-breaker, so compound indexes end in (createdAt/date, id) descending
+INDEX_REGISTRY = [
+    {"collection": "users", "keys": [("email", 1)], "unique": True},
+    {"collection": "users", "keys": [("id", 1)], "unique": True},
+    {"collection": "users", "keys": [("companyId", 1), ("createdAt", -1), ("id", -1)]},
+    {"collection": "users", "keys": [("createdAt", -1), ("id", -1)]},
+    {"collection": "users", "keys": [("role", 1), ("createdAt", -1), ("id", -1)]},
+    # Reset tokens expire through the resetPasswordExpires filter; a TTL index here would delete the user
+    {
+        "collection": "users",
+        "keys": [("resetPasswordToken", 1), ("resetPasswordExpires", 1)],
+        "partialFilterExpression": {"resetPasswordToken": {"$exists": True}}
+    },
+    {"collection": "companies", "keys": [("id", 1)], "unique": True},
+    {"collection": "companies", "keys": [("createdAt", -1), ("id", -1)]},
+    {"collection": "companies", "keys": [("subscriptionStatus", 1), ("createdAt", -1), ("id", -1)]},
+    {"collection": "companies", "keys": [("subscriptionStatus", 1), ("subscriptionExpiryDate", 1)]},
+    {"collection": "plans", "keys": [("id", 1)], "unique": True},
+    {"collection": "projects", "keys": [("id", 1)], "unique": True},
+    {"collection": "projects", "keys": [("companyId", 1), ("createdAt", -1), ("id", -1)]},
+    {"collection": "projects", "keys": [("companyId", 1), ("status", 1), ("createdAt", -1), ("id", -1)]},
+    {"collection": "projects", "keys": [("companyId", 1), ("blobId", 1)]},
+    {"collection": "projects", "keys": [("blobId", 1)]},
+    {"collection": "blobs", "keys": [("id", 1)], "unique": True},
+    {"collection": "blobs", "keys": [("refCount", 1), ("lastReferencedAt", 1)]},
+    {"collection": "transactions", "keys": [("id", 1)], "unique": True},
+    {"collection": "transactions", "keys": [("companyId", 1), ("date", -1), ("id", -1)]},
+    {"collection": "transactions", "keys": [("companyId", 1), ("status", 1), ("date", -1), ("id", -1)]},
+    {
+        "collection": "transactions",
+        "keys": [("razorpayOrderId", 1)],
+        "unique": True,
+        "partialFilterExpression": {"razorpayOrderId": {"$type": "string"}}
+    },
+    # Only transactions with unfinished settlement steps are indexed, so the recovery sweep stays cheap
+    {
+        "collection": "transactions",
+        "keys": [("paidAt", 1)],
+        "partialFilterExpression": {"settlementPending": True}
+    },
+    {"collection": "revenue_buckets", "keys": [("period", 1), ("bucket", 1)], "unique": True},
+    {"collection": "payment_events", "keys": [("id", 1)], "unique": True},
+    {"collection": "payment_events", "keys": [("status", 1), ("nextAttemptAt", 1)]},
+    {"collection": "payment_events", "keys": [("status", 1), ("claimedAt", 1)]},
+    {"collection": "processing_jobs", "keys": [("id", 1)], "unique": True},
+    {"collection": "processing_jobs", "keys": [("status", 1), ("companyId", 1), ("createdAt", 1)]},
+    {"collection": "upload_sessions", "keys": [("id", 1)], "unique": True},
+    {"collection": "upload_sessions", "keys": [("expiresAt", 1)]},
+    {"collection": "leases", "keys": [("id", 1)], "unique": True},
+    {"collection": "revocations", "keys": [("subject", 1)], "unique": True},
+    {"collection": "revocations", "keys": [("revokedAt", 1)]},
+    {"collection": "revocations", "keys": [("expiresAt", 1)], "expireAfterSeconds": 0},
+]
+
+INDEX_OPTIONS = ("unique", "partialFilterExpression", "expireAfterSeconds", "sparse")
+
+def index_name(spec: dict) -> str:
+    return spec.get("name") or "_".join(f"{field}_{direction}" for field, direction in spec["keys"])
+
+def index_plan() -> List[dict]:
+    return [
+        {
+            "collection": spec["collection"],
+            "name": index_name(spec),
+            "keys": dict(spec["keys"]),
+            **{option: spec[option] for option in INDEX_OPTIONS if option in spec}
+        }
+        for spec in INDEX_REGISTRY
+    ]
+
+def index_conflicts(spec: dict, existing: dict) -> List[str]:
+    conflicts = []
+    if [tuple(key) for key in existing["key"]] != [tuple(key) for key in spec["keys"]]:
+        conflicts.append(f"keys {existing['key']} != {spec['keys']}")
+    for option in INDEX_OPTIONS:
+        current, wanted = existing.get(option), spec.get(option)
+        if option in ("unique", "sparse"):
+            current, wanted = bool(current), bool(wanted)
+        if current != wanted:
+            conflicts.append(f"{option} {current!r} != {wanted!r}")
+    return conflicts
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="AiBuild X index registry")
+    parser.add_argument("--print-index-plan", action="store_true", help="Print the index registry without touching the database")
+    args = parser.parse_args()
+    
+    if args.print_index_plan:
+        for entry in index_plan():
+            print(json.dumps(entry))
+        sys.exit(0)
+    
+    parser.print_help()
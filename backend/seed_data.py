@@ -1,8 +1,11 @@
 import asyncio
+import argparse
+import random
+import time
 from motor.motor_asyncio import AsyncIOMotorClient
 import bcrypt
 import secrets
-from datetime import datetime, timezone, timedelta
+from datetime import date, datetime, timezone, timedelta
 import os
 from dotenv import load_dotenv
 from pathlib import Path
@@ -168,6 +171,165 @@ async def seed_database():
     print("   Client Admin: john@techstruct.com / john123")
     print("   Client Engineer: jane@techstruct.com / jane123")
 
+# Synthetic data for benchmarking
+SYNTHETIC_PASSWORD = "synthetic123"
+SYNTHETIC_PLANS = [("Basic", 35000, 5, 50), ("Pro", 65000, 15, 200), ("Enterprise", 125000, 50, 1000)]
+CITIES = ["Mumbai, Maharashtra", "Pune, Maharashtra", "Bengaluru, Karnataka", "Hyderabad, Telangana", "Chennai, Tamil Nadu", "Delhi, NCR", "Ahmedabad, Gujarat", "Kolkata, West Bengal"]
+STRUCTURES = ["Tower", "Bridge", "Warehouse", "Metro Station", "Hospital", "Mall", "Residential Block", "Flyover"]
+
+def skewed_counts(rng: random.Random, buckets: int, mean: int) -> list:
+    # Real tenants are lopsided: a few large companies hold most of the users and drawings
+    if mean <= 0:
+        return [0] * buckets
+    weights = [rng.lognormvariate(0, 0.9) for _ in range(buckets)]
+    scale = mean * buckets / sum(weights)
+    return [max(1, round(w * scale)) for w in weights]
+
+class BatchWriter:
+    def __init__(self, collection, batch_size: int, max_in_flight: int = 4):
+        self.collection = collection
+        self.batch_size = batch_size
+        self.pending = []
+        self.in_flight = set()
+        self.max_in_flight = max_in_flight
+        self.written = 0
+    
+    async def add(self, document: dict):
+        self.pending.append(document)
+        if len(self.pending) >= self.batch_size:
+            await self.flush_batch()
+    
+    async def flush_batch(self):
+        batch, self.pending = self.pending, []
+        if not batch:
+            return
+        if len(self.in_flight) >= self.max_in_flight:
+            done, self.in_flight = await asyncio.wait(self.in_flight, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                task.result()
+        self.in_flight.add(asyncio.create_task(self.collection.insert_many(batch, ordered=False)))
+        self.written += len(batch)
+    
+    async def close(self):
+        await self.flush_batch()
+        for task in self.in_flight:
+            await task
+        self.in_flight = set()
+
+async def generate_synthetic_data(companies: int, users: int, projects: int, transactions: int, seed: int = 42, batch_size: int = 5000, anchor_date: date = None):
+    """Append N companies with roughly M users, K projects and T transactions each (averages, skewed per company)."""
+    rng = random.Random(seed)
+    # Every date is relative to the anchor, so the same seed and anchor produce identical documents. It
+    # defaults to today so expiry dates stay realistic; pass one to reproduce a dataset on another day.
+    anchor_date = anchor_date or datetime.now(timezone.utc).date()
+    now = datetime(anchor_date.year, anchor_date.month, anchor_date.day, tzinfo=timezone.utc)
+    started = time.monotonic()
+    print(f"🏗️  Generating {companies} companies (seed={seed}, anchor={anchor_date.isoformat()})...")
+    
+    # bcrypt is deliberately slow; every synthetic user shares one hash
+    password_hash = hash_password(SYNTHETIC_PASSWORD)
+    
+    writers = {name: BatchWriter(db[name], batch_size) for name in ("companies", "users", "projects", "transactions")}
+    user_counts = skewed_counts(rng, companies, users)
+    project_counts = skewed_counts(rng, companies, projects)
+    transaction_counts = skewed_counts(rng, companies, transactions)
+    
+    for c in range(companies):
+        company_id = f"company_syn_{c:07d}"
+        plan_name, price, max_users, storage = rng.choices(SYNTHETIC_PLANS, weights=[5, 3, 1])[0]
+        created_at = now - timedelta(days=rng.randint(30, 730), seconds=rng.randint(0, 86399))
+        roll = rng.random()
+        if roll < 0.8:
+            status, expiry = "Active", now + timedelta(days=rng.randint(1, 30))
+        elif roll < 0.9:
+            status, expiry = "GracePeriod", now - timedelta(days=rng.randint(0, 6))
+        else:
+            status, expiry = "Expired", now - timedelta(days=rng.randint(7, 365))
+        await writers["companies"].add({
+            "id": company_id,
+            "name": f"{rng.choice(STRUCTURES)} Works {c}",
+            "subscriptionStatus": status,
+            "subscriptionTier": plan_name,
+            "maxUsers": max(max_users, user_counts[c]),
+            "storageLimit": storage,
+            "subscriptionExpiryDate": expiry,
+            "createdAt": created_at
+        })
+        
+        engineer_ids = []
+        for u in range(user_counts[c]):
+            user_id = f"user_syn_{c:07d}_{u:05d}"
+            role = "ClientAdmin" if u == 0 else "ClientEngineer"
+            if role == "ClientEngineer":
+                engineer_ids.append(user_id)
+            await writers["users"].add({
+                "id": user_id,
+                "name": f"Synthetic User {c}-{u}",
+                "email": f"user{u}@company{c}.synthetic.local",
+                "passwordHash": password_hash,
+                "role": role,
+                "companyId": company_id,
+                "createdAt": created_at + timedelta(minutes=u)
+            })
+        authors = engineer_ids or [f"user_syn_{c:07d}_00000"]
+        
+        span = max(1, int((now - created_at).total_seconds()))
+        for p in range(project_counts[c]):
+            drawing_type = "PDF" if rng.random() < 0.7 else "DWG"
+            await writers["projects"].add({
+                "id": f"project_syn_{c:07d}_{p:06d}",
+                "title": f"{rng.choice(STRUCTURES)} Phase {rng.randint(1, 9)}",
+                "location": rng.choice(CITIES),
+                "drawingType": drawing_type,
+                "fileName": f"drawing_{p}.{drawing_type.lower()}",
+                "filePath": "",
+                "fileSize": int(rng.lognormvariate(15, 1.2)),
+                "status": rng.choices(["Completed", "Processing", "Uploaded", "Failed"], weights=[90, 4, 4, 2])[0],
+                "createdBy": rng.choice(authors),
+                "companyId": company_id,
+                "createdAt": created_at + timedelta(seconds=rng.randint(0, span))
+            })
+        
+        for t in range(transaction_counts[c]):
+            paid = rng.random() < 0.85
+            occurred_at = created_at + timedelta(seconds=rng.randint(0, span))
+            transaction = {
+                "id": f"txn_syn_{c:07d}_{t:05d}",
+                "companyId": company_id,
+                "amount": price,
+                "currency": "INR",
+                "status": "Paid" if paid else rng.choice(["Created", "Failed"]),
+                "razorpayOrderId": f"order_syn_{c:07d}_{t:05d}",
+                "planSnapshot": {"name": plan_name, "price": price, "maxUsers": max_users, "storageLimitGB": storage},
+                "date": occurred_at
+            }
+            if paid:
+                transaction.update({"razorpayPaymentId": f"pay_syn_{c:07d}_{t:05d}", "paidAt": occurred_at})
+            await writers["transactions"].add(transaction)
+    
+    for name, writer in writers.items():
+        await writer.close()
+        print(f"✅ Inserted {writer.written} {name}")
+    print(f"\n🎉 Synthetic data generated in {time.monotonic() - started:.1f}s")
+    print(f"   Every synthetic user signs in with password '{SYNTHETIC_PASSWORD}'")
+    print("   Platform stats are derived data: run POST /api/admin/stats/reconcile to rebuild the dashboard counters")
+
 if __name__ == "__main__":
-    asyncio.run(seed_database())
+    parser = argparse.ArgumentParser(description="Seed the AiBuild X database")
+    parser.add_argument("--synthetic", action="store_true", help="Append generated tenants on top of the demo data")
+    parser.add_argument("--companies", type=int, default=1000)
+    parser.add_argument("--users", type=int, default=10, help="Average users per company")
+    parser.add_argument("--projects", type=int, default=100, help="Average projects per company")
+    parser.add_argument("--transactions", type=int, default=12, help="Average transactions per company")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--anchor-date", type=date.fromisoformat, help="Date (YYYY-MM-DD) the synthetic history is generated relative to; defaults to today")
+    parser.add_argument("--batch-size", type=int, default=5000)
+    args = parser.parse_args()
+    
+    async def main():
+        await seed_database()
+        if args.synthetic:
+            await generate_synthetic_data(args.companies, args.users, args.projects, args.transactions, args.seed, args.batch_size, args.anchor_date)
+    
+    asyncio.run(main())
     client.close()
\ No newline at end of file
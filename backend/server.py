@@ -1,40 +1,286 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File, Request, Response
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, status, UploadFile, File, Request, Response, Query
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
+from fastapi.responses import StreamingResponse, FileResponse
+from urllib.parse import quote
 from starlette.middleware.cors import CORSMiddleware
 from motor.motor_asyncio import AsyncIOMotorClient
-from pydantic import BaseModel, Field, ConfigDict, EmailStr
+from pymongo import ReturnDocument, ReplaceOne, UpdateOne, monitoring
+from pymongo.errors import DuplicateKeyError, BulkWriteError
+from pydantic import BaseModel, Field, ConfigDict, EmailStr, ValidationError
 from typing import List, Optional
 from datetime import datetime, timezone, timedelta
 from dotenv import load_dotenv
 from pathlib import Path
 import os
+import json
 import logging
 import bcrypt
 import jwt
-import razorpay
+import httpx
+import hmac
+import random
 import secrets
+import hashlib
+import base64
+import csv
+import io
+import shutil
+import subprocess
+import re
+import asyncio
+import time
+import bisect
+import threading
+from contextvars import ContextVar
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 import aiofiles
+from indexes import INDEX_REGISTRY, INDEX_OPTIONS, index_name, index_conflicts
 from enum import Enum
+from abc import ABC, abstractmethod
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / '.env')
 
+# Metrics Settings
+METRICS_ENABLED = os.environ.get('METRICS_ENABLED', 'true').lower() == 'true'
+# /api/metrics is served only to scrapers presenting this bearer token; without it the route is disabled
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN')
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+# Metrics
+class MetricsRegistry:
+    # Minimal Prometheus-style registry; Mongo listener callbacks arrive on executor threads, hence the lock
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.types = {}
+        self.help = {}
+        self.values = {}
+        self.histograms = {}
+    
+    def describe(self, name: str, metric_type: str, help_text: str):
+        self.types[name] = metric_type
+        self.help[name] = help_text
+    
+    def inc(self, name: str, labels: tuple, value: float = 1):
+        with self.lock:
+            self.values[(name, labels)] = self.values.get((name, labels), 0) + value
+    
+    def observe(self, name: str, labels: tuple, value: float):
+        with self.lock:
+            histogram = self.histograms.get((name, labels))
+            if histogram is None:
+                histogram = self.histograms[(name, labels)] = [[0] * len(LATENCY_BUCKETS), 0.0, 0]
+            index = bisect.bisect_left(LATENCY_BUCKETS, value)
+            if index < len(LATENCY_BUCKETS):
+                histogram[0][index] += 1
+            histogram[1] += value
+            histogram[2] += 1
+    
+    def render(self) -> str:
+        def label_text(labels: tuple, extra: tuple = ()) -> str:
+            pairs = labels + extra
+            if not pairs:
+                return ""
+            escaped = (str(value).replace('\\', '\\\\').replace('"', '\\"') for _, value in pairs)
+            return "{" + ",".join(f'{key}="{value}"' for (key, _), value in zip(pairs, escaped)) + "}"
+        
+        with self.lock:
+            values = dict(self.values)
+            histograms = {key: (list(buckets), total, count) for key, (buckets, total, count) in self.histograms.items()}
+        
+        lines = []
+        for name in sorted(self.types):
+            lines.append(f"# HELP {name} {self.help[name]}")
+            lines.append(f"# TYPE {name} {self.types[name]}")
+            if self.types[name] == "histogram":
+                for (metric, labels), (buckets, total, count) in sorted(histograms.items()):
+                    if metric != name:
+                        continue
+                    cumulative = 0
+                    for bound, bucket_count in zip(LATENCY_BUCKETS, buckets):
+                        cumulative += bucket_count
+                        lines.append(f"{name}_bucket{label_text(labels, (('le', bound),))} {cumulative}")
+                    lines.append(f"{name}_bucket{label_text(labels, (('le', '+Inf'),))} {count}")
+                    lines.append(f"{name}_sum{label_text(labels)} {total}")
+                    lines.append(f"{name}_count{label_text(labels)} {count}")
+            else:
+                for (metric, labels), value in sorted(values.items()):
+                    if metric == name:
+                        lines.append(f"{name}{label_text(labels)} {value}")
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+metrics.describe("http_requests_total", "counter", "HTTP requests by route, method and status")
+metrics.describe("http_request_duration_seconds", "histogram", "HTTP request latency by route")
+metrics.describe("http_requests_in_flight", "gauge", "HTTP requests currently being served")
+metrics.describe("http_request_bytes_total", "counter", "Request body bytes by route")
+metrics.describe("http_response_bytes_total", "counter", "Response body bytes by route")
+metrics.describe("http_request_mongo_commands_total", "counter", "MongoDB commands issued while serving each route")
+metrics.describe("http_request_mongo_seconds_total", "counter", "MongoDB command time spent while serving each route")
+metrics.describe("mongo_commands_total", "counter", "MongoDB commands by command name and outcome")
+metrics.describe("mongo_command_duration_seconds", "histogram", "MongoDB command latency by command name")
+metrics.describe("rate_limited_total", "counter", "Requests rejected by rate limits by action and bucket")
+
+# Holds a mutable per-request tally; Motor copies the caller's context into its executor threads
+request_metrics: ContextVar[Optional[dict]] = ContextVar("request_metrics", default=None)
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    def started(self, event):
+        pass
+    
+    def succeeded(self, event):
+        self.record(event.command_name, event.duration_micros, "ok")
+    
+    def failed(self, event):
+        self.record(event.command_name, event.duration_micros, "error")
+    
+    def record(self, command: str, duration_micros: int, outcome: str):
+        seconds = duration_micros / 1_000_000
+        metrics.inc("mongo_commands_total", (("command", command), ("outcome", outcome)))
+        metrics.observe("mongo_command_duration_seconds", (("command", command),), seconds)
+        tally = request_metrics.get()
+        if tally is not None:
+            # Commands gathered by one request finish on different executor threads
+            with metrics.lock:
+                tally["mongoCommands"] += 1
+                tally["mongoSeconds"] += seconds
+
 # MongoDB connection
 mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
+client = AsyncIOMotorClient(mongo_url, event_listeners=[MongoCommandMetrics()] if METRICS_ENABLED else [])
 db = client[os.environ['DB_NAME']]
 
-# Razorpay client
-razorpay_client = razorpay.Client(auth=(os.environ['RAZORPAY_KEY_ID'], os.environ['RAZORPAY_KEY_SECRET']))
+# Payment Gateway Settings
+PAYMENT_GATEWAY = os.environ.get('PAYMENT_GATEWAY', 'razorpay')
+RAZORPAY_API_URL = os.environ.get('RAZORPAY_API_URL', 'https://api.razorpay.com/v1')
+PAYMENT_TIMEOUT_SECONDS = float(os.environ.get('PAYMENT_TIMEOUT_SECONDS', 10))
+PAYMENT_MAX_RETRIES = int(os.environ.get('PAYMENT_MAX_RETRIES', 2))
+PAYMENT_POOL_SIZE = int(os.environ.get('PAYMENT_POOL_SIZE', 20))
+PAYMENT_BREAKER_FAILURES = int(os.environ.get('PAYMENT_BREAKER_FAILURES', 5))
+PAYMENT_BREAKER_RESET_SECONDS = float(os.environ.get('PAYMENT_BREAKER_RESET_SECONDS', 30))
+FAKE_PAYMENT_LATENCY_MS = int(os.environ.get('FAKE_PAYMENT_LATENCY_MS', 0))
+PAYMENT_EVENT_BATCH_SIZE = int(os.environ.get('PAYMENT_EVENT_BATCH_SIZE', 100))
+PAYMENT_EVENT_POLL_SECONDS = float(os.environ.get('PAYMENT_EVENT_POLL_SECONDS', 5))
+PAYMENT_EVENT_MAX_ATTEMPTS = int(os.environ.get('PAYMENT_EVENT_MAX_ATTEMPTS', 10))
+# Retries back off exponentially so a gateway outage of an hour or two does not exhaust an event's attempts
+PAYMENT_EVENT_RETRY_BASE_SECONDS = float(os.environ.get('PAYMENT_EVENT_RETRY_BASE_SECONDS', 30))
+PAYMENT_EVENT_RETRY_MAX_SECONDS = float(os.environ.get('PAYMENT_EVENT_RETRY_MAX_SECONDS', 1800))
+PAYMENT_EVENT_CLAIM_TIMEOUT_SECONDS = int(os.environ.get('PAYMENT_EVENT_CLAIM_TIMEOUT_SECONDS', 300))
 
-# Create upload directory
+# Storage directories (created at startup)
 UPLOAD_DIR = Path(os.environ.get('UPLOAD_DIR', '/app/backend/uploads'))
-UPLOAD_DIR.mkdir(exist_ok=True, parents=True)
+UPLOAD_TMP_DIR = UPLOAD_DIR / '.incoming'
+BLOB_DIR = Path(os.environ.get('BLOB_DIR', str(UPLOAD_DIR / 'blobs')))
+
+# Index Settings
+AUTO_CREATE_INDEXES = os.environ.get('AUTO_CREATE_INDEXES', 'true').lower() == 'true'
+
+# Blob Storage Settings
+BLOB_GC_INTERVAL_SECONDS = int(os.environ.get('BLOB_GC_INTERVAL_SECONDS', 3600))
+BLOB_GC_GRACE_SECONDS = int(os.environ.get('BLOB_GC_GRACE_SECONDS', 3600))
+
+# Download Settings
+DOWNLOAD_CHUNK_SIZE = int(os.environ.get('DOWNLOAD_CHUNK_SIZE', 256 * 1024))
+DOWNLOAD_ACCEL_REDIRECT_PREFIX = os.environ.get('DOWNLOAD_ACCEL_REDIRECT_PREFIX')
+
+# Drawing Processing Settings
+DERIVED_DIR = Path(os.environ.get('DERIVED_DIR', str(UPLOAD_DIR / 'derived')))
+PROCESSING_WORKERS = int(os.environ.get('PROCESSING_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+PROCESSING_CONCURRENCY = int(os.environ.get('PROCESSING_CONCURRENCY', PROCESSING_WORKERS))
+# Enforced across every worker from the running jobs in Mongo, not per process
+PROCESSING_MAX_PER_COMPANY = int(os.environ.get('PROCESSING_MAX_PER_COMPANY', max(1, PROCESSING_CONCURRENCY // 2)))
+PROCESSING_MAX_ATTEMPTS = int(os.environ.get('PROCESSING_MAX_ATTEMPTS', 3))
+PROCESSING_MAX_POOL_CRASHES = int(os.environ.get('PROCESSING_MAX_POOL_CRASHES', 5))
+PROCESSING_RETRY_BASE_SECONDS = int(os.environ.get('PROCESSING_RETRY_BASE_SECONDS', 30))
+PROCESSING_LEASE_SECONDS = int(os.environ.get('PROCESSING_LEASE_SECONDS', 600))
+PROCESSING_HEARTBEAT_SECONDS = float(os.environ.get('PROCESSING_HEARTBEAT_SECONDS', PROCESSING_LEASE_SECONDS / 3))
+PROCESSING_POLL_SECONDS = float(os.environ.get('PROCESSING_POLL_SECONDS', 5))
+PREVIEW_RENDER_TIMEOUT_SECONDS = int(os.environ.get('PREVIEW_RENDER_TIMEOUT_SECONDS', 120))
+
+# Preview Settings
+PREVIEW_DIR = DERIVED_DIR / 'previews'
+PREVIEW_STORE_MAX_MB = int(os.environ.get('PREVIEW_STORE_MAX_MB', 2048))
+PREVIEW_STORE_GC_INTERVAL_SECONDS = int(os.environ.get('PREVIEW_STORE_GC_INTERVAL_SECONDS', 600))
+PREVIEW_PRERENDER_SIZES = [size.strip() for size in os.environ.get('PREVIEW_PRERENDER_SIZES', 'thumb').split(',') if size.strip() in ('thumb', 'medium', 'large')]
+PREVIEW_ALL_PAGES = os.environ.get('PREVIEW_ALL_PAGES', 'false').lower() == 'true'
+PREVIEW_RENDER_CONCURRENCY = int(os.environ.get('PREVIEW_RENDER_CONCURRENCY', 2))
+PREVIEW_CACHE_MAX_AGE_SECONDS = 365 * 24 * 3600
+
+# Bulk Import Settings
+BULK_IMPORT_MAX_ROWS = int(os.environ.get('BULK_IMPORT_MAX_ROWS', 500))
+
+# Pagination Settings
+DEFAULT_PAGE_SIZE = int(os.environ.get('DEFAULT_PAGE_SIZE', 50))
+MAX_PAGE_SIZE = int(os.environ.get('MAX_PAGE_SIZE', 200))
+DASHBOARD_LIST_LIMIT = int(os.environ.get('DASHBOARD_LIST_LIMIT', 50))
+
+# Export Settings
+EXPORT_BATCH_SIZE = int(os.environ.get('EXPORT_BATCH_SIZE', 500))
+MAX_EXPORT_BATCH_SIZE = int(os.environ.get('MAX_EXPORT_BATCH_SIZE', 5000))
+
+# Platform Stats Settings
+STATS_RECONCILE_INTERVAL_SECONDS = int(os.environ.get('STATS_RECONCILE_INTERVAL_SECONDS', 3600))
+STATS_RECONCILE_LEASE_SECONDS = int(os.environ.get('STATS_RECONCILE_LEASE_SECONDS', STATS_RECONCILE_INTERVAL_SECONDS * 2))
+
+# Subscription Lifecycle Settings
+SUBSCRIPTION_GRACE_DAYS = float(os.environ.get('SUBSCRIPTION_GRACE_DAYS', 7))
+SUBSCRIPTION_SWEEP_INTERVAL_SECONDS = int(os.environ.get('SUBSCRIPTION_SWEEP_INTERVAL_SECONDS', 60))
+SUBSCRIPTION_SWEEP_BATCH_SIZE = int(os.environ.get('SUBSCRIPTION_SWEEP_BATCH_SIZE', 500))
+SUBSCRIPTION_SWEEP_LEASE_SECONDS = int(os.environ.get('SUBSCRIPTION_SWEEP_LEASE_SECONDS', 120))
+
+# Upload Settings
+UPLOAD_CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', 1024 * 1024))
+MAX_UPLOAD_SIZE_MB = int(os.environ.get('MAX_UPLOAD_SIZE_MB', 500))
+ALLOWED_DRAWING_EXTENSIONS = ['pdf', 'dwg']
+UPLOAD_SESSION_CHUNK_SIZE_MB = int(os.environ.get('UPLOAD_SESSION_CHUNK_SIZE_MB', 8))
+UPLOAD_SESSION_TTL_HOURS = int(os.environ.get('UPLOAD_SESSION_TTL_HOURS', 24))
+UPLOAD_SESSION_GC_INTERVAL_SECONDS = int(os.environ.get('UPLOAD_SESSION_GC_INTERVAL_SECONDS', 900))
 
 # JWT Settings
 JWT_SECRET = os.environ['JWT_SECRET']
 JWT_ALGORITHM = "HS256"
 JWT_EXPIRATION_HOURS = 72
+# "session" issues long-lived tokens resolved against the users collection; "stateless" issues short-lived
+# access tokens carrying the claims handlers need, renewed through a refresh token
+AUTH_MODE = os.environ.get('AUTH_MODE', 'session')
+ACCESS_TOKEN_TTL_MINUTES = int(os.environ.get('ACCESS_TOKEN_TTL_MINUTES', 10))
+REFRESH_TOKEN_TTL_DAYS = int(os.environ.get('REFRESH_TOKEN_TTL_DAYS', 14))
+REVOCATION_SYNC_INTERVAL_SECONDS = int(os.environ.get('REVOCATION_SYNC_INTERVAL_SECONDS', 15))
+
+# Auth Cache Settings
+USER_CACHE_TTL_SECONDS = int(os.environ.get('USER_CACHE_TTL_SECONDS', 30))
+USER_CACHE_MAX_ENTRIES = int(os.environ.get('USER_CACHE_MAX_ENTRIES', 10000))
+TOKEN_CACHE_TTL_SECONDS = int(os.environ.get('TOKEN_CACHE_TTL_SECONDS', 300))
+TOKEN_CACHE_MAX_ENTRIES = int(os.environ.get('TOKEN_CACHE_MAX_ENTRIES', 10000))
+SUBSCRIPTION_CACHE_TTL_SECONDS = int(os.environ.get('SUBSCRIPTION_CACHE_TTL_SECONDS', 300))
+SUBSCRIPTION_CACHE_MAX_ENTRIES = int(os.environ.get('SUBSCRIPTION_CACHE_MAX_ENTRIES', 10000))
+PROJECT_ACCESS_CACHE_TTL_SECONDS = int(os.environ.get('PROJECT_ACCESS_CACHE_TTL_SECONDS', 300))
+PROJECT_ACCESS_CACHE_MAX_ENTRIES = int(os.environ.get('PROJECT_ACCESS_CACHE_MAX_ENTRIES', 10000))
+# Mutations invalidate the local worker immediately; the TTL bounds staleness in the other workers
+PLAN_CACHE_TTL_SECONDS = int(os.environ.get('PLAN_CACHE_TTL_SECONDS', 60))
+PLAN_CACHE_MAX_AGE_SECONDS = int(os.environ.get('PLAN_CACHE_MAX_AGE_SECONDS', 0))
+
+# Password Hashing Settings
+BCRYPT_ROUNDS = int(os.environ.get('BCRYPT_ROUNDS', 12))
+PASSWORD_HASH_EXECUTOR = os.environ.get('PASSWORD_HASH_EXECUTOR', 'thread')
+PASSWORD_HASH_WORKERS = int(os.environ.get('PASSWORD_HASH_WORKERS', os.cpu_count() or 2))
+PASSWORD_HASH_QUEUE_SIZE = int(os.environ.get('PASSWORD_HASH_QUEUE_SIZE', 32))
+PASSWORD_HASH_RETRY_AFTER_SECONDS = int(os.environ.get('PASSWORD_HASH_RETRY_AFTER_SECONDS', 2))
+
+# Rate Limit Settings
+# Limits are "requests per minute, burst"; a rate of 0 disables that bucket
+RATE_LIMIT_BACKEND = os.environ.get('RATE_LIMIT_BACKEND', 'memory')
+RATE_LIMIT_MAX_KEYS = int(os.environ.get('RATE_LIMIT_MAX_KEYS', 100000))
+# Number of reverse proxies in front of the app that append to X-Forwarded-For; 0 ignores the header
+RATE_LIMIT_TRUSTED_PROXY_HOPS = int(os.environ.get('RATE_LIMIT_TRUSTED_PROXY_HOPS', 0))
+LOGIN_RATE_PER_IP = (float(os.environ.get('LOGIN_RATE_PER_IP_PER_MINUTE', 30)), int(os.environ.get('LOGIN_BURST_PER_IP', 10)))
+LOGIN_RATE_PER_EMAIL = (float(os.environ.get('LOGIN_RATE_PER_EMAIL_PER_MINUTE', 5)), int(os.environ.get('LOGIN_BURST_PER_EMAIL', 5)))
+FORGOT_PASSWORD_RATE_PER_IP = (float(os.environ.get('FORGOT_PASSWORD_RATE_PER_IP_PER_MINUTE', 5)), int(os.environ.get('FORGOT_PASSWORD_BURST_PER_IP', 5)))
+FORGOT_PASSWORD_RATE_PER_EMAIL = (float(os.environ.get('FORGOT_PASSWORD_RATE_PER_EMAIL_PER_MINUTE', 1)), int(os.environ.get('FORGOT_PASSWORD_BURST_PER_EMAIL', 3)))
+# Logins may only occupy part of the bcrypt pool so onboarding and imports keep making progress
+LOGIN_VERIFY_CONCURRENCY = int(os.environ.get('LOGIN_VERIFY_CONCURRENCY', max(1, PASSWORD_HASH_WORKERS * 3 // 4)))
 
 # Create the main app
 app = FastAPI(title="AiBuild X API")
@@ -57,16 +303,48 @@ class ProjectStatus(str, Enum):
     UPLOADED = "Uploaded"
     PROCESSING = "Processing"
     COMPLETED = "Completed"
+    FAILED = "Failed"
+
+class PreviewSize(str, Enum):
+    THUMB = "thumb"
+    MEDIUM = "medium"
+    LARGE = "large"
+
+class JobStatus(str, Enum):
+    QUEUED = "Queued"
+    RUNNING = "Running"
+    SUCCEEDED = "Succeeded"
+    FAILED = "Failed"
 
 class TransactionStatus(str, Enum):
     CREATED = "Created"
     PAID = "Paid"
     FAILED = "Failed"
 
+class SortOrder(str, Enum):
+    ASC = "asc"
+    DESC = "desc"
+
+class ExportFormat(str, Enum):
+    NDJSON = "ndjson"
+    CSV = "csv"
+
+class PaymentEventStatus(str, Enum):
+    PENDING = "Pending"
+    PROCESSING = "Processing"
+    PROCESSED = "Processed"
+    IGNORED = "Ignored"
+    FAILED = "Failed"
+
 class DrawingType(str, Enum):
     PDF = "PDF"
     DWG = "DWG"
 
+class UploadSessionStatus(str, Enum):
+    OPEN = "Open"
+    ASSEMBLING = "Assembling"
+    COMPLETED = "Completed"
+
 # Pydantic Models
 class User(BaseModel):
     model_config = ConfigDict(extra="ignore")
@@ -84,6 +362,11 @@ class UserCreate(BaseModel):
     role: UserRole
     companyId: Optional[str] = None
 
+class BulkUserRow(BaseModel):
+    name: str = Field(min_length=1)
+    email: EmailStr
+    password: str = Field(min_length=1)
+
 class UserLogin(BaseModel):
     email: EmailStr
     password: str
@@ -138,7 +421,15 @@ class Project(BaseModel):
     drawingType: DrawingType
     fileName: str
     filePath: str
+    fileSize: Optional[int] = None
+    checksum: Optional[str] = None
+    blobId: Optional[str] = None
     status: ProjectStatus = ProjectStatus.UPLOADED
+    processingStage: Optional[str] = None
+    processingProgress: int = 0
+    processingError: Optional[str] = None
+    metadata: Optional[dict] = None
+    hasPreview: bool = False
     createdBy: str
     companyId: str
     createdAt: datetime
@@ -148,6 +439,14 @@ class ProjectCreate(BaseModel):
     location: str
     drawingType: DrawingType
 
+class UploadSessionCreate(BaseModel):
+    title: str
+    location: str
+    drawingType: DrawingType
+    fileName: str
+    totalSize: int = Field(gt=0)
+    sha256: Optional[str] = None
+
 class Transaction(BaseModel):
     model_config = ConfigDict(extra="ignore")
     id: str
@@ -160,6 +459,7 @@ class Transaction(BaseModel):
     razorpaySignature: Optional[str] = None
     planSnapshot: dict
     date: datetime
+    paidAt: Optional[datetime] = None
 
 class OrderCreate(BaseModel):
     planId: str
@@ -177,12 +477,229 @@ class PasswordResetConfirm(BaseModel):
     newPassword: str
 
 # Helper Functions
-def hash_password(password: str) -> str:
-    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt()).decode('utf-8')
+def _bcrypt_hash(password: str, rounds: int) -> str:
+    return bcrypt.hashpw(password.encode('utf-8'), bcrypt.gensalt(rounds=rounds)).decode('utf-8')
 
-def verify_password(password: str, hashed: str) -> bool:
+def _bcrypt_check(password: str, hashed: str) -> bool:
     return bcrypt.checkpw(password.encode('utf-8'), hashed.encode('utf-8'))
 
+class PasswordHasher:
+    # Runs bcrypt on a worker pool and rejects work once the pool and its queue are full
+    def __init__(self, rounds: int, executor_kind: str, max_workers: int, queue_size: int, retry_after: int):
+        self.rounds = rounds
+        self.max_workers = max_workers
+        self.max_pending = max_workers + queue_size
+        self.retry_after = retry_after
+        self.pending = 0
+        if executor_kind == 'process':
+            self.executor = ProcessPoolExecutor(max_workers=max_workers)
+        else:
+            self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+    
+    async def run(self, fn, *args):
+        if self.pending >= self.max_pending:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy. Please retry shortly.",
+                headers={"Retry-After": str(self.retry_after)}
+            )
+        self.pending += 1
+        try:
+            return await asyncio.get_running_loop().run_in_executor(self.executor, fn, *args)
+        finally:
+            self.pending -= 1
+    
+    async def hash(self, password: str) -> str:
+        return await self.run(_bcrypt_hash, password, self.rounds)
+    
+    async def hash_many(self, passwords: List[str]) -> List[str]:
+        # Waves of pool size keep bulk work from monopolising the queue that interactive logins share
+        hashes = []
+        for start in range(0, len(passwords), self.max_workers):
+            wave = passwords[start:start + self.max_workers]
+            hashes.extend(await asyncio.gather(*(self.hash(password) for password in wave)))
+        return hashes
+    
+    async def verify(self, password: str, hashed: str) -> bool:
+        return await self.run(_bcrypt_check, password, hashed)
+    
+    def needs_rehash(self, hashed: str) -> bool:
+        try:
+            return int(hashed.split('$')[2]) != self.rounds
+        except (IndexError, ValueError):
+            return True
+    
+    def shutdown(self):
+        self.executor.shutdown(wait=False)
+
+password_hasher = PasswordHasher(
+    BCRYPT_ROUNDS,
+    PASSWORD_HASH_EXECUTOR,
+    PASSWORD_HASH_WORKERS,
+    PASSWORD_HASH_QUEUE_SIZE,
+    PASSWORD_HASH_RETRY_AFTER_SECONDS
+)
+
+async def hash_password(password: str) -> str:
+    return await password_hasher.hash(password)
+
+async def verify_password(password: str, hashed: str) -> bool:
+    return await password_hasher.verify(password, hashed)
+
+class TTLCache:
+    # Bounded LRU with per-entry expiry; only touched from the event loop, so no locking
+    def __init__(self, name: str, max_entries: int, ttl_seconds: float):
+        self.name = name
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+    
+    def get(self, key):
+        entry = self.entries.get(key)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self.entries[key]
+            self.misses += 1
+            return None
+        self.entries.move_to_end(key)
+        self.hits += 1
+        return entry[1]
+    
+    def set(self, key, value, ttl_seconds: Optional[float] = None):
+        ttl = self.ttl_seconds if ttl_seconds is None else min(ttl_seconds, self.ttl_seconds)
+        if ttl <= 0:
+            return
+        self.entries[key] = (time.monotonic() + ttl, value)
+        self.entries.move_to_end(key)
+        while len(self.entries) > self.max_entries:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+    
+    def invalidate(self, key):
+        self.entries.pop(key, None)
+    
+    def clear(self):
+        self.entries.clear()
+    
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.entries),
+            "maxEntries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+user_cache = TTLCache("users", USER_CACHE_MAX_ENTRIES, USER_CACHE_TTL_SECONDS)
+token_cache = TTLCache("tokens", TOKEN_CACHE_MAX_ENTRIES, TOKEN_CACHE_TTL_SECONDS)
+subscription_cache = TTLCache("subscriptions", SUBSCRIPTION_CACHE_MAX_ENTRIES, SUBSCRIPTION_CACHE_TTL_SECONDS)
+project_access_cache = TTLCache("projectAccess", PROJECT_ACCESS_CACHE_MAX_ENTRIES, PROJECT_ACCESS_CACHE_TTL_SECONDS)
+caches = {cache.name: cache for cache in (user_cache, token_cache, subscription_cache, project_access_cache)}
+
+def invalidate_user(user_id: str):
+    user_cache.invalidate(user_id)
+
+# Rate Limiting
+class RateLimitBackend(ABC):
+    # Shared-state hook: a Redis or Mongo implementation only needs take()
+    @abstractmethod
+    async def take(self, key: str, rate_per_second: float, burst: int) -> float:
+        """Spend one token from the bucket; returns 0 when allowed, otherwise seconds until a token is available."""
+    
+    def stats(self) -> dict:
+        return {}
+
+class MemoryRateLimitBackend(RateLimitBackend):
+    # Token buckets keyed by an 8-byte digest and stored as (tokens, updated) tuples, evicted least recently used
+    def __init__(self, max_keys: int):
+        self.max_keys = max_keys
+        self.buckets = OrderedDict()
+        self.evictions = 0
+        self.rejections = 0
+    
+    async def take(self, key: str, rate_per_second: float, burst: int) -> float:
+        digest = hashlib.blake2b(key.encode(), digest_size=8).digest()
+        now = time.monotonic()
+        tokens, updated = self.buckets.get(digest, (burst, now))
+        tokens = min(burst, tokens + (now - updated) * rate_per_second)
+        if tokens >= 1:
+            retry_after = 0.0
+            tokens -= 1
+        else:
+            retry_after = (1 - tokens) / rate_per_second
+            self.rejections += 1
+        
+        self.buckets[digest] = (tokens, now)
+        self.buckets.move_to_end(digest)
+        while len(self.buckets) > self.max_keys:
+            self.buckets.popitem(last=False)
+            self.evictions += 1
+        return retry_after
+    
+    def stats(self) -> dict:
+        return {"size": len(self.buckets), "maxKeys": self.max_keys, "evictions": self.evictions, "rejections": self.rejections}
+
+def create_rate_limit_backend(kind: str) -> RateLimitBackend:
+    if kind == 'memory':
+        return MemoryRateLimitBackend(RATE_LIMIT_MAX_KEYS)
+    raise RuntimeError(f"Unknown RATE_LIMIT_BACKEND '{kind}'")
+
+rate_limit_backend = create_rate_limit_backend(RATE_LIMIT_BACKEND)
+
+def client_ip(request: Request) -> str:
+    # Clients can write anything into the left of X-Forwarded-For; only entries appended by our own
+    # proxies are trusted, so the client address is the one the outermost trusted hop recorded
+    if RATE_LIMIT_TRUSTED_PROXY_HOPS:
+        forwarded = [entry.strip() for entry in request.headers.get("x-forwarded-for", "").split(",") if entry.strip()]
+        if forwarded:
+            return forwarded[-min(RATE_LIMIT_TRUSTED_PROXY_HOPS, len(forwarded))]
+    return request.client.host if request.client else "unknown"
+
+async def enforce_rate_limits(action: str, limits: List[tuple]):
+    # limits: (dimension, value, (per_minute, burst)); every bucket is charged so an attacker cannot probe one at a time
+    retry_after = 0.0
+    for dimension, value, (per_minute, burst) in limits:
+        if per_minute <= 0 or not value:
+            continue
+        wait = await rate_limit_backend.take(f"{action}:{dimension}:{value}", per_minute / 60, burst)
+        if wait:
+            metrics.inc("rate_limited_total", (("action", action), ("dimension", dimension)))
+            retry_after = max(retry_after, wait)
+    
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="Too many attempts. Please try again later.",
+            headers={"Retry-After": str(max(1, int(retry_after + 0.999)))}
+        )
+
+class ConcurrencyLimit:
+    # Non-blocking admission gate: callers beyond the limit get a 503 instead of queueing
+    def __init__(self, limit: int, retry_after: int):
+        self.limit = limit
+        self.retry_after = retry_after
+        self.active = 0
+    
+    async def __aenter__(self):
+        if self.active >= self.limit:
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Server is busy. Please retry shortly.",
+                headers={"Retry-After": str(self.retry_after)}
+            )
+        self.active += 1
+        return self
+    
+    async def __aexit__(self, *exc):
+        self.active -= 1
+
+login_verify_limit = ConcurrencyLimit(LOGIN_VERIFY_CONCURRENCY, PASSWORD_HASH_RETRY_AFTER_SECONDS)
+
 def create_token(user_id: str, email: str, role: str) -> str:
     payload = {
         "user_id": user_id,
@@ -200,47 +717,987 @@ def decode_token(token: str) -> dict:
     except jwt.InvalidTokenError:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
 
+def decode_token_cached(token: str) -> dict:
+    payload = token_cache.get(token)
+    if payload is None:
+        payload = decode_token(token)
+        token_cache.set(token, payload, payload["exp"] - time.time())
+    return payload
+
+def create_access_token(user: dict, subscription: Optional[dict]) -> str:
+    now = time.time()
+    payload = {
+        "typ": "access",
+        "jti": secrets.token_urlsafe(12),
+        "user_id": user["id"],
+        "email": user["email"],
+        "role": user["role"],
+        "name": user["name"],
+        "companyId": user.get("companyId"),
+        "iat": now,
+        "exp": int(now + ACCESS_TOKEN_TTL_MINUTES * 60)
+    }
+    if subscription:
+        expires_at = subscription["expiresAt"]
+        payload["sub_status"] = subscription["status"]
+        payload["sub_expires"] = expires_at.timestamp() if expires_at else None
+    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+def create_refresh_token(user_id: str) -> str:
+    now = time.time()
+    payload = {
+        "typ": "refresh",
+        "jti": secrets.token_urlsafe(12),
+        "user_id": user_id,
+        "iat": now,
+        "exp": int(now + REFRESH_TOKEN_TTL_DAYS * 86400)
+    }
+    return jwt.encode(payload, JWT_SECRET, algorithm=JWT_ALGORITHM)
+
+def user_from_claims(payload: dict) -> dict:
+    user = {
+        "id": payload["user_id"],
+        "email": payload["email"],
+        "role": payload["role"],
+        "name": payload["name"],
+        "companyId": payload.get("companyId")
+    }
+    if "sub_status" in payload:
+        expires = payload["sub_expires"]
+        user["subscription"] = {
+            "status": payload["sub_status"],
+            "expiresAt": datetime.fromtimestamp(expires, timezone.utc) if expires is not None else None
+        }
+    return user
+
+class RevocationSet:
+    # subject ("user:<id>" or "token:<jti>") -> revocation time; tokens issued before it are rejected.
+    # Entries outlive every token they could match by REFRESH_TOKEN_TTL_DAYS, then drop out.
+    def __init__(self):
+        self.revoked = {}
+        self.synced_until = None
+    
+    def is_revoked(self, payload: dict) -> bool:
+        issued_at = payload.get("iat", 0)
+        for subject in (f"user:{payload['user_id']}", f"token:{payload.get('jti')}"):
+            revoked_at = self.revoked.get(subject)
+            if revoked_at is not None and issued_at <= revoked_at:
+                return True
+        return False
+    
+    async def revoke(self, subject: str):
+        now = datetime.now(timezone.utc)
+        self.revoked[subject] = now.timestamp()
+        await db.revocations.update_one(
+            {"subject": subject},
+            {"$set": {"revokedAt": now, "expiresAt": now + timedelta(days=REFRESH_TOKEN_TTL_DAYS)}},
+            upsert=True
+        )
+    
+    async def sync(self):
+        # Incremental: only revocations newer than the last sync, with an overlap for clock skew between workers
+        query = {"revokedAt": {"$gt": self.synced_until - timedelta(seconds=REVOCATION_SYNC_INTERVAL_SECONDS)}} if self.synced_until else {}
+        async for entry in db.revocations.find(query, {"_id": 0, "subject": 1, "revokedAt": 1}):
+            revoked_at = as_utc(entry["revokedAt"])
+            # Mongo truncates to milliseconds; round up so a token issued earlier in that millisecond stays revoked
+            self.revoked[entry["subject"]] = max(self.revoked.get(entry["subject"], 0), revoked_at.timestamp() + 0.001)
+            self.synced_until = max(self.synced_until or revoked_at, revoked_at)
+        
+        horizon = time.time() - REFRESH_TOKEN_TTL_DAYS * 86400
+        self.revoked = {subject: revoked_at for subject, revoked_at in self.revoked.items() if revoked_at > horizon}
+
+revocations = RevocationSet()
+
+async def revocation_sync_loop():
+    while True:
+        try:
+            await revocations.sync()
+        except Exception:
+            logger.exception("Revocation sync failed")
+        await asyncio.sleep(REVOCATION_SYNC_INTERVAL_SECONDS)
+
+async def load_user(user_id: str) -> Optional[dict]:
+    user = user_cache.get(user_id)
+    if user is None:
+        user = await db.users.find_one({"id": user_id})
+        if not user:
+            return None
+        user_cache.set(user_id, user)
+    return dict(user)
+
 async def get_current_user(request: Request):
     token = request.cookies.get("token")
     if not token:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
     
-    payload = decode_token(token)
-    user = await db.users.find_one({"id": payload["user_id"]})
+    payload = decode_token_cached(token)
+    if payload.get("typ") == "access":
+        # Fast path: the claims are the user, so authorization needs no database round trip
+        if revocations.is_revoked(payload):
+            raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Token revoked")
+        return user_from_claims(payload)
+    if payload.get("typ") == "refresh":
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    
+    user = await load_user(payload["user_id"])
     if not user:
         raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
     return user
 
+async def iter_upload_file(file: UploadFile):
+    while True:
+        chunk = await file.read(UPLOAD_CHUNK_SIZE)
+        if not chunk:
+            break
+        yield chunk
+
+async def write_stream_atomically(chunks, destination: Path, max_bytes: int) -> dict:
+    # Copy the stream in pieces so memory stays flat regardless of file size
+    checksum = hashlib.sha256()
+    size = 0
+    tmp_path = UPLOAD_TMP_DIR / f"{destination.name}.{secrets.token_hex(8)}.part"
+    try:
+        async with aiofiles.open(tmp_path, 'wb') as f:
+            async for chunk in chunks:
+                size += len(chunk)
+                if size > max_bytes:
+                    raise HTTPException(status_code=413, detail=f"Upload exceeds maximum size of {max_bytes} bytes")
+                checksum.update(chunk)
+                await f.write(chunk)
+        os.replace(tmp_path, destination)
+    except BaseException:
+        tmp_path.unlink(missing_ok=True)
+        raise
+    
+    return {"size": size, "sha256": checksum.hexdigest()}
+
+# Blob Storage
+# Drawings are stored once per content hash. Each blob document owns a generation-suffixed path, so a
+# GC pass deleting an orphaned blob can never unlink a file that a concurrent upload just re-created.
+def blob_path(sha256: str, generation: str) -> Path:
+    return BLOB_DIR / sha256[:2] / f"{sha256}-{generation}"
+
+async def reference_blob(sha256: str) -> Optional[dict]:
+    return await db.blobs.find_one_and_update(
+        {"id": sha256},
+        {"$inc": {"refCount": 1}, "$set": {"lastReferencedAt": datetime.now(timezone.utc)}},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+
+async def release_blob(sha256: str):
+    await db.blobs.update_one(
+        {"id": sha256},
+        {"$inc": {"refCount": -1}, "$set": {"lastReferencedAt": datetime.now(timezone.utc)}}
+    )
+
+async def store_blob(chunks, max_bytes: int) -> dict:
+    staged = UPLOAD_TMP_DIR / f"blob-{secrets.token_hex(8)}"
+    stored = await write_stream_atomically(chunks, staged, max_bytes)
+    try:
+        for _ in range(3):
+            existing = await reference_blob(stored["sha256"])
+            if existing:
+                return {**stored, "blobId": existing["id"], "path": existing["path"], "deduplicated": True}
+            
+            path = blob_path(stored["sha256"], secrets.token_hex(4))
+            path.parent.mkdir(parents=True, exist_ok=True)
+            os.replace(staged, path)
+            now = datetime.now(timezone.utc)
+            try:
+                await db.blobs.insert_one({
+                    "id": stored["sha256"],
+                    "path": str(path),
+                    "size": stored["size"],
+                    "refCount": 1,
+                    "createdAt": now,
+                    "lastReferencedAt": now
+                })
+                return {**stored, "blobId": stored["sha256"], "path": str(path), "deduplicated": False}
+            except DuplicateKeyError:
+                # Another upload of the same content won the insert; reuse its blob
+                os.replace(path, staged)
+        raise HTTPException(status_code=503, detail="Could not store file, please retry")
+    finally:
+        staged.unlink(missing_ok=True)
+
+async def stream_upload_to_disk(file: UploadFile) -> dict:
+    return await store_blob(iter_upload_file(file), MAX_UPLOAD_SIZE_MB * 1024 * 1024)
+
+async def release_project_file(project: dict):
+    if project.get("blobId"):
+        await release_blob(project["blobId"])
+    else:
+        Path(project["filePath"]).unlink(missing_ok=True)
+
+async def purge_orphaned_blobs() -> int:
+    purged = 0
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=BLOB_GC_GRACE_SECONDS)
+    orphans = db.blobs.find({"refCount": {"$lte": 0}, "lastReferencedAt": {"$lt": cutoff}}, {"_id": 0, "id": 1, "path": 1})
+    async for blob in orphans:
+        result = await db.blobs.delete_one({"id": blob["id"], "path": blob["path"], "refCount": {"$lte": 0}})
+        if result.deleted_count:
+            Path(blob["path"]).unlink(missing_ok=True)
+            purged += 1
+    return purged
+
+async def reconcile_blob_refcounts(batch_size: int = 500) -> int:
+    # A crash between deleting a project and releasing its blob leaves the count high and the file on disk
+    # forever, so recount from the projects. Recently touched blobs may have an upload between reference_blob
+    # and insert_project and are skipped; the compare-and-set drops the fix if the blob is touched meanwhile.
+    fixed = 0
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=BLOB_GC_GRACE_SECONDS)
+    blobs = db.blobs.find({"lastReferencedAt": {"$lt": cutoff}}, {"_id": 0, "id": 1, "refCount": 1, "lastReferencedAt": 1})
+    batch = []
+    async for blob in blobs:
+        batch.append(blob)
+        if len(batch) >= batch_size:
+            fixed += await reconcile_blob_batch(batch)
+            batch = []
+    if batch:
+        fixed += await reconcile_blob_batch(batch)
+    return fixed
+
+async def reconcile_blob_batch(blobs: List[dict]) -> int:
+    counts = {
+        entry["_id"]: entry["count"]
+        async for entry in db.projects.aggregate([
+            {"$match": {"blobId": {"$in": [blob["id"] for blob in blobs]}}},
+            {"$group": {"_id": "$blobId", "count": {"$sum": 1}}}
+        ])
+    }
+    fixed = 0
+    for blob in blobs:
+        count = counts.get(blob["id"], 0)
+        if blob["refCount"] == count:
+            continue
+        result = await db.blobs.update_one(
+            {"id": blob["id"], "refCount": blob["refCount"], "lastReferencedAt": blob["lastReferencedAt"]},
+            {"$set": {"refCount": count}}
+        )
+        if result.modified_count:
+            logger.warning(f"Blob {blob['id']} had refCount {blob['refCount']} but {count} projects; corrected")
+            fixed += 1
+    return fixed
+
+async def blob_gc_loop():
+    while True:
+        await asyncio.sleep(BLOB_GC_INTERVAL_SECONDS)
+        try:
+            await reconcile_blob_refcounts()
+            purged = await purge_orphaned_blobs()
+            if purged:
+                logger.info(f"Purged {purged} orphaned blobs")
+        except Exception:
+            logger.exception("Blob garbage collection failed")
+
+def as_utc(value: Optional[datetime]) -> Optional[datetime]:
+    # Mongo hands back naive datetimes that are already in UTC
+    if value is not None and value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+def cache_subscription_state(company_id: str, subscription_status: str, expiry_date: Optional[datetime]) -> dict:
+    state = {"status": subscription_status, "expiresAt": as_utc(expiry_date)}
+    subscription_cache.set(company_id, state)
+    return state
+
+async def refresh_subscription_states(company_ids: List[str]):
+    # Reload from Mongo instead of caching what this worker meant to write: another worker may have settled first
+    async for company in db.companies.find({"id": {"$in": company_ids}}, {"_id": 0, "id": 1, "subscriptionStatus": 1, "subscriptionExpiryDate": 1}):
+        cache_subscription_state(company["id"], company["subscriptionStatus"], company.get("subscriptionExpiryDate"))
+
+async def get_subscription_state(company_id: str) -> Optional[dict]:
+    state = subscription_cache.get(company_id)
+    if state is None:
+        company = await db.companies.find_one(
+            {"id": company_id},
+            {"_id": 0, "subscriptionStatus": 1, "subscriptionExpiryDate": 1}
+        )
+        if not company:
+            return None
+        state = cache_subscription_state(company_id, company["subscriptionStatus"], company.get("subscriptionExpiryDate"))
+    
+    return effective_subscription_state(state)
+
+def effective_subscription_state(state: dict) -> dict:
+    # Derive the status from the expiry so access is right even between lifecycle sweeps
+    if state["status"] != SubscriptionStatus.EXPIRED and state["expiresAt"]:
+        now = datetime.now(timezone.utc)
+        if state["expiresAt"] + timedelta(days=SUBSCRIPTION_GRACE_DAYS) <= now:
+            return {**state, "status": SubscriptionStatus.EXPIRED}
+        if state["expiresAt"] <= now:
+            return {**state, "status": SubscriptionStatus.GRACE_PERIOD}
+    return state
+
 async def check_subscription_status(user: dict):
     if user["role"] in ["SuperAdmin", "Marketing"]:
         return True
     
-    company = await db.companies.find_one({"id": user["companyId"]})
-    if not company:
+    # Trust a token snapshot that grants access; one that refuses may predate a renewal, so confirm it
+    snapshot = user.get("subscription")
+    if snapshot and effective_subscription_state(snapshot)["status"] != SubscriptionStatus.EXPIRED:
+        return True
+    
+    state = await get_subscription_state(user["companyId"])
+    if not state:
         raise HTTPException(status_code=404, detail="Company not found")
     
-    if company["subscriptionStatus"] == SubscriptionStatus.EXPIRED:
+    if state["status"] == SubscriptionStatus.EXPIRED:
         raise HTTPException(status_code=403, detail="Subscription expired. Please contact admin to renew.")
     
     return True
 
+# Index Registry
+# The registry lives in indexes.py so it can be inspected without configuring or connecting the app
+async def ensure_indexes(create_missing: bool = True):
+    errors = []
+    by_collection = {}
+    for spec in INDEX_REGISTRY:
+        by_collection.setdefault(spec["collection"], []).append(spec)
+    
+    for collection_name, specs in by_collection.items():
+        collection = db[collection_name]
+        existing = await collection.index_information()
+        expected_names = {index_name(spec) for spec in specs}
+        
+        for spec in specs:
+            name = index_name(spec)
+            if name in existing:
+                conflicts = index_conflicts(spec, existing[name])
+                if conflicts:
+                    errors.append(f"{collection_name}.{name}: " + "; ".join(conflicts))
+                continue
+            
+            logger.warning(f"Missing index {collection_name}.{name}")
+            if create_missing:
+                options = {option: spec[option] for option in INDEX_OPTIONS if option in spec}
+                await collection.create_index(spec["keys"], name=name, **options)
+                logger.info(f"Created index {collection_name}.{name}")
+        
+        for name in existing:
+            if name != "_id_" and name not in expected_names:
+                logger.warning(f"Unregistered index {collection_name}.{name}")
+    
+    if errors:
+        raise RuntimeError("Index definitions conflict with the database: " + " | ".join(errors))
+
+# Pagination
+def encode_cursor(document: dict, sort_field: str) -> str:
+    raw = json.dumps([document[sort_field].isoformat(), document["id"]])
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+def decode_cursor(cursor: str):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value, doc_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return datetime.fromisoformat(value), str(doc_id)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
+
+async def paginate(collection, query: dict, sort_field: str, cursor: Optional[str], limit: int, order: SortOrder, projection: dict) -> dict:
+    # Keyset pagination on (sort_field, id) so every page is an index range scan
+    direction = -1 if order == SortOrder.DESC else 1
+    if cursor:
+        value, doc_id = decode_cursor(cursor)
+        op = "$lt" if direction == -1 else "$gt"
+        query = {"$and": [query, {"$or": [
+            {sort_field: {op: value}},
+            {sort_field: value, "id": {op: doc_id}}
+        ]}]}
+    
+    documents = await collection.find(query, projection).sort([(sort_field, direction), ("id", direction)]).limit(limit + 1).to_list(limit + 1)
+    has_more = len(documents) > limit
+    items = documents[:limit]
+    return {
+        "items": items,
+        "nextCursor": encode_cursor(items[-1], sort_field) if has_more else None
+    }
+
+# Exports
+EXPORT_FIELDS = {
+    "transactions": ["id", "companyId", "amount", "currency", "status", "razorpayOrderId", "razorpayPaymentId", "planSnapshot", "date", "paidAt"],
+    "projects": ["id", "title", "location", "drawingType", "fileName", "fileSize", "status", "createdBy", "companyId", "createdAt"],
+    "companies": ["id", "name", "subscriptionTier", "subscriptionStatus", "maxUsers", "storageLimit", "subscriptionExpiryDate", "createdAt"],
+}
+
+def export_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+# Spreadsheets evaluate cells starting with these as formulas
+CSV_FORMULA_PREFIXES = ("=", "+", "-", "@", "\t", "\r")
+
+def export_cell(value):
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        value = json.dumps(value, default=export_default)
+    if isinstance(value, str) and value.startswith(CSV_FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+async def iter_export_rows(cursor, fields: List[str], export_format: ExportFormat):
+    # Rows are encoded one at a time straight off the Motor cursor; only one batch is ever held in memory
+    if export_format == ExportFormat.CSV:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(fields)
+        async for document in cursor:
+            writer.writerow([export_cell(document.get(field)) for field in fields])
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate(0)
+        if buffer.tell():
+            yield buffer.getvalue()
+    else:
+        async for document in cursor:
+            yield json.dumps({field: document.get(field) for field in fields}, default=export_default) + "\n"
+
+def export_response(collection_name: str, query: dict, sort_field: str, export_format: ExportFormat, batch_size: int) -> StreamingResponse:
+    fields = EXPORT_FIELDS[collection_name]
+    projection = {"_id": 0, **{field: 1 for field in fields}}
+    cursor = db[collection_name].find(query, projection, batch_size=batch_size).sort([(sort_field, 1), ("id", 1)])
+    media_type = "text/csv" if export_format == ExportFormat.CSV else "application/x-ndjson"
+    file_name = f"{collection_name}-{datetime.now(timezone.utc).strftime('%Y%m%d%H%M%S')}.{export_format.value}"
+    return StreamingResponse(
+        iter_export_rows(cursor, fields, export_format),
+        media_type=media_type,
+        headers={"Content-Disposition": f'attachment; filename="{file_name}"'}
+    )
+
+# Platform Stats
+# Counters live in one document updated with $inc, so every worker can apply deltas without coordination
+PLATFORM_STATS_ID = "platform"
+STAT_FIELDS = ("totalCompanies", "activeSubscriptions", "totalRevenue")
+
+def revenue_bucket_keys(paid_at: datetime) -> List[tuple]:
+    return [("day", paid_at.strftime("%Y-%m-%d")), ("month", paid_at.strftime("%Y-%m"))]
+
+async def increment_platform_stats(**deltas):
+    deltas = {field: value for field, value in deltas.items() if value}
+    if not deltas:
+        return
+    await db.platform_stats.update_one(
+        {"_id": PLATFORM_STATS_ID},
+        {"$inc": deltas, "$set": {"updatedAt": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+
+async def record_company_created(subscription_status: str):
+    await increment_platform_stats(
+        totalCompanies=1,
+        activeSubscriptions=1 if subscription_status == SubscriptionStatus.ACTIVE else 0
+    )
+
+async def record_subscription_transition(old_status: Optional[str], new_status: str):
+    was_active = old_status == SubscriptionStatus.ACTIVE
+    is_active = new_status == SubscriptionStatus.ACTIVE
+    if was_active != is_active:
+        await increment_platform_stats(activeSubscriptions=1 if is_active else -1)
+
+async def record_payments(payments: List[tuple]):
+    # payments is a list of (amount, paid_at); deltas are folded per bucket before writing
+    if not payments:
+        return
+    await increment_platform_stats(totalRevenue=sum(amount for amount, _ in payments))
+    deltas = {}
+    for amount, paid_at in payments:
+        for key in revenue_bucket_keys(paid_at):
+            revenue, count = deltas.get(key, (0, 0))
+            deltas[key] = (revenue + amount, count + 1)
+    await db.revenue_buckets.bulk_write([
+        UpdateOne(
+            {"period": period, "bucket": bucket},
+            {"$inc": {"revenue": revenue, "transactions": count}},
+            upsert=True
+        )
+        for (period, bucket), (revenue, count) in deltas.items()
+    ], ordered=False)
+
+async def get_revenue_buckets(period: str, limit: int) -> List[dict]:
+    buckets = await db.revenue_buckets.find({"period": period}, {"_id": 0}).sort("bucket", -1).limit(limit).to_list(limit)
+    return list(reversed(buckets))
+
+async def reconcile_platform_stats() -> dict:
+    # Recompute everything from source collections, report drift and overwrite the counters
+    total_companies = await db.companies.count_documents({})
+    active_subscriptions = await db.companies.count_documents({"subscriptionStatus": SubscriptionStatus.ACTIVE})
+    daily = await db.transactions.aggregate([
+        {"$match": {"status": TransactionStatus.PAID}},
+        {"$group": {
+            "_id": {"$dateToString": {"format": "%Y-%m-%d", "date": {"$ifNull": ["$paidAt", "$date"]}}},
+            "revenue": {"$sum": "$amount"},
+            "transactions": {"$sum": 1}
+        }}
+    ]).to_list(None)
+    
+    buckets = {}
+    for row in daily:
+        for period, bucket in (("day", row["_id"]), ("month", row["_id"][:7])):
+            entry = buckets.setdefault((period, bucket), {"period": period, "bucket": bucket, "revenue": 0, "transactions": 0})
+            entry["revenue"] += row["revenue"]
+            entry["transactions"] += row["transactions"]
+    
+    expected = {
+        "totalCompanies": total_companies,
+        "activeSubscriptions": active_subscriptions,
+        "totalRevenue": sum(row["revenue"] for row in daily)
+    }
+    current = await db.platform_stats.find_one({"_id": PLATFORM_STATS_ID}) or {}
+    drift = {
+        field: {"stored": current.get(field, 0), "actual": expected[field]}
+        for field in STAT_FIELDS
+        if current.get(field, 0) != expected[field]
+    }
+    if drift:
+        logger.warning(f"Platform stats drift corrected: {drift}")
+    
+    await db.platform_stats.update_one(
+        {"_id": PLATFORM_STATS_ID},
+        {"$set": {**expected, "updatedAt": datetime.now(timezone.utc), "reconciledAt": datetime.now(timezone.utc)}},
+        upsert=True
+    )
+    if buckets:
+        await db.revenue_buckets.bulk_write([
+            ReplaceOne({"period": entry["period"], "bucket": entry["bucket"]}, entry, upsert=True)
+            for entry in buckets.values()
+        ], ordered=False)
+    await db.revenue_buckets.delete_many({"$nor": [
+        {"period": period, "bucket": bucket} for period, bucket in buckets
+    ]} if buckets else {})
+    
+    return {"stats": expected, "drift": drift}
+
+async def get_platform_stats() -> dict:
+    stats = await db.platform_stats.find_one({"_id": PLATFORM_STATS_ID}, {"_id": 0})
+    if not stats:
+        stats = (await reconcile_platform_stats())["stats"]
+    return stats
+
+async def stats_reconcile_loop():
+    while True:
+        await asyncio.sleep(STATS_RECONCILE_INTERVAL_SECONDS)
+        try:
+            # One worker recounts per interval; the full scans are too heavy to repeat on every replica
+            if await acquire_lease("stats-reconcile", STATS_RECONCILE_LEASE_SECONDS):
+                await reconcile_platform_stats()
+        except Exception:
+            logger.exception("Platform stats reconciliation failed")
+
+# Subscription Lifecycle
+# Owner of leases and processing-job claims; the random suffix keeps it unique when containers reuse PIDs
+WORKER_ID = f"{os.uname().nodename}:{os.getpid()}:{secrets.token_hex(4)}"
+
+async def acquire_lease(name: str, ttl_seconds: float) -> bool:
+    # Take or renew a named lease; the upsert collides on the unique id while another worker holds it
+    now = datetime.now(timezone.utc)
+    try:
+        await db.leases.find_one_and_update(
+            {"id": name, "$or": [{"owner": WORKER_ID}, {"expiresAt": {"$lte": now}}]},
+            {"$set": {"owner": WORKER_ID, "expiresAt": now + timedelta(seconds=ttl_seconds)}},
+            upsert=True
+        )
+    except DuplicateKeyError:
+        return False
+    return True
+
+async def transition_subscriptions(from_status: SubscriptionStatus, to_status: SubscriptionStatus, cutoff: datetime) -> int:
+    # Range scan on (subscriptionStatus, subscriptionExpiryDate); renewals move a company out of the range
+    transitioned = 0
+    while True:
+        due = await db.companies.find(
+            {"subscriptionStatus": from_status, "subscriptionExpiryDate": {"$lte": cutoff}},
+            {"_id": 0, "id": 1}
+        ).sort("subscriptionExpiryDate", 1).limit(SUBSCRIPTION_SWEEP_BATCH_SIZE).to_list(SUBSCRIPTION_SWEEP_BATCH_SIZE)
+        if not due:
+            break
+        
+        # Repeating the guard in each filter keeps a payment that lands mid-sweep from being overwritten
+        result = await db.companies.bulk_write([
+            UpdateOne(
+                {"id": company["id"], "subscriptionStatus": from_status, "subscriptionExpiryDate": {"$lte": cutoff}},
+                {"$set": {"subscriptionStatus": to_status, "subscriptionUpdatedAt": datetime.now(timezone.utc)}}
+            )
+            for company in due
+        ], ordered=False)
+        for company in due:
+            subscription_cache.invalidate(company["id"])
+        
+        transitioned += result.modified_count
+        if from_status == SubscriptionStatus.ACTIVE and result.modified_count:
+            await increment_platform_stats(activeSubscriptions=-result.modified_count)
+        if len(due) < SUBSCRIPTION_SWEEP_BATCH_SIZE:
+            break
+    return transitioned
+
+async def sweep_subscriptions() -> dict:
+    now = datetime.now(timezone.utc)
+    grace_started = await transition_subscriptions(SubscriptionStatus.ACTIVE, SubscriptionStatus.GRACE_PERIOD, now)
+    expired = await transition_subscriptions(SubscriptionStatus.GRACE_PERIOD, SubscriptionStatus.EXPIRED, now - timedelta(days=SUBSCRIPTION_GRACE_DAYS))
+    if grace_started or expired:
+        logger.info(f"Subscription sweep: {grace_started} entered grace period, {expired} expired")
+    return {"gracePeriod": grace_started, "expired": expired}
+
+async def subscription_lifecycle_loop():
+    while True:
+        try:
+            if await acquire_lease("subscription-lifecycle", SUBSCRIPTION_SWEEP_LEASE_SECONDS):
+                await sweep_subscriptions()
+        except Exception:
+            logger.exception("Subscription lifecycle sweep failed")
+        await asyncio.sleep(SUBSCRIPTION_SWEEP_INTERVAL_SECONDS)
+
+# Payment Gateway
+class PaymentGatewayError(Exception):
+    pass
+
+class PaymentGatewayUnavailable(PaymentGatewayError):
+    pass
+
+class CircuitBreaker:
+    def __init__(self, failure_threshold: int, reset_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.reset_seconds = reset_seconds
+        self.failures = 0
+        self.opened_at = None
+    
+    def allow(self) -> bool:
+        # Once the reset window passes a single trial call is let through (half-open)
+        if self.opened_at is None:
+            return True
+        if time.monotonic() - self.opened_at >= self.reset_seconds:
+            self.opened_at = time.monotonic()
+            return True
+        return False
+    
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+    
+    def record_failure(self):
+        self.failures += 1
+        if self.failures >= self.failure_threshold:
+            self.opened_at = time.monotonic()
+
+def razorpay_signature(secret: str, message: str) -> str:
+    return hmac.new(secret.encode('utf-8'), message.encode('utf-8'), hashlib.sha256).hexdigest()
+
+class RazorpayGateway:
+    RETRYABLE_STATUS = {429, 500, 502, 503, 504}
+    
+    def __init__(self, key_id: str, key_secret: str, webhook_secret: Optional[str]):
+        self.key_id = key_id
+        self.key_secret = key_secret
+        self.webhook_secret = webhook_secret
+        self.breaker = CircuitBreaker(PAYMENT_BREAKER_FAILURES, PAYMENT_BREAKER_RESET_SECONDS)
+        self.client = httpx.AsyncClient(
+            base_url=RAZORPAY_API_URL,
+            auth=(key_id, key_secret),
+            timeout=httpx.Timeout(PAYMENT_TIMEOUT_SECONDS),
+            limits=httpx.Limits(max_connections=PAYMENT_POOL_SIZE, max_keepalive_connections=PAYMENT_POOL_SIZE)
+        )
+    
+    async def request(self, method: str, path: str, idempotent: bool, **kwargs) -> dict:
+        if not self.breaker.allow():
+            raise PaymentGatewayUnavailable("Payment provider circuit is open")
+        
+        for attempt in range(PAYMENT_MAX_RETRIES + 1):
+            try:
+                response = await self.client.request(method, path, **kwargs)
+            except (httpx.ConnectError, httpx.ConnectTimeout) as exc:
+                # The request never reached Razorpay, so retrying is safe for any method
+                error = exc
+            except httpx.TransportError as exc:
+                if not idempotent:
+                    self.breaker.record_failure()
+                    raise PaymentGatewayError(f"Razorpay request failed: {exc}") from exc
+                error = exc
+            else:
+                # Any answer below 500 means Razorpay is up; this also closes a half-open breaker on a 4xx trial
+                if response.status_code < 500:
+                    self.breaker.record_success()
+                if response.status_code < 400:
+                    return response.json()
+                if response.status_code not in self.RETRYABLE_STATUS or not idempotent:
+                    if response.status_code >= 500:
+                        self.breaker.record_failure()
+                    raise PaymentGatewayError(f"Razorpay returned {response.status_code}: {response.text}")
+                error = PaymentGatewayError(f"Razorpay returned {response.status_code}")
+            
+            if attempt < PAYMENT_MAX_RETRIES:
+                await asyncio.sleep(random.uniform(0, 0.2 * 2 ** attempt))
+        
+        self.breaker.record_failure()
+        raise PaymentGatewayError(f"Razorpay request failed after retries: {error}")
+    
+    async def create_order(self, amount: int, currency: str, receipt: Optional[str] = None) -> dict:
+        payload = {"amount": amount, "currency": currency, "payment_capture": 1}
+        if receipt:
+            payload["receipt"] = receipt
+        return await self.request("POST", "/orders", idempotent=False, json=payload)
+    
+    async def fetch_payment(self, payment_id: str) -> dict:
+        return await self.request("GET", f"/payments/{payment_id}", idempotent=True)
+    
+    def verify_payment_signature(self, order_id: str, payment_id: str, signature: str) -> bool:
+        expected = razorpay_signature(self.key_secret, f"{order_id}|{payment_id}")
+        return hmac.compare_digest(expected, signature)
+    
+    def verify_webhook_signature(self, body: bytes, signature: str) -> bool:
+        if not self.webhook_secret:
+            return False
+        expected = hmac.new(self.webhook_secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, signature)
+    
+    async def close(self):
+        await self.client.aclose()
+
+class FakePaymentGateway:
+    # In-process stand-in with the same interface, for load tests and local development
+    def __init__(self, key_id: str = "rzp_test_fake", key_secret: str = "fake_secret", webhook_secret: str = "fake_webhook_secret"):
+        self.key_id = key_id
+        self.key_secret = key_secret
+        self.webhook_secret = webhook_secret
+        self.orders = {}
+    
+    async def simulate_latency(self):
+        if FAKE_PAYMENT_LATENCY_MS:
+            await asyncio.sleep(FAKE_PAYMENT_LATENCY_MS / 1000)
+    
+    async def create_order(self, amount: int, currency: str, receipt: Optional[str] = None) -> dict:
+        await self.simulate_latency()
+        order = {"id": f"order_fake_{secrets.token_hex(8)}", "amount": amount, "currency": currency, "receipt": receipt, "status": "created"}
+        self.orders[order["id"]] = order
+        return order
+    
+    async def fetch_payment(self, payment_id: str) -> dict:
+        await self.simulate_latency()
+        return {"id": payment_id, "status": "captured"}
+    
+    def sign(self, order_id: str, payment_id: str) -> str:
+        return razorpay_signature(self.key_secret, f"{order_id}|{payment_id}")
+    
+    def verify_payment_signature(self, order_id: str, payment_id: str, signature: str) -> bool:
+        return hmac.compare_digest(self.sign(order_id, payment_id), signature)
+    
+    def sign_webhook(self, body: bytes) -> str:
+        return hmac.new(self.webhook_secret.encode('utf-8'), body, hashlib.sha256).hexdigest()
+    
+    def verify_webhook_signature(self, body: bytes, signature: str) -> bool:
+        return hmac.compare_digest(self.sign_webhook(body), signature)
+    
+    async def close(self):
+        pass
+
+if PAYMENT_GATEWAY == 'fake':
+    payment_gateway = FakePaymentGateway()
+else:
+    payment_gateway = RazorpayGateway(
+        os.environ['RAZORPAY_KEY_ID'],
+        os.environ['RAZORPAY_KEY_SECRET'],
+        os.environ.get('RAZORPAY_WEBHOOK_SECRET')
+    )
+
+# Payment Settlement
+# A settlement is a chain of steps: flip the transaction to Paid, activate the company, book revenue.
+# The flip leaves pending markers on the transaction and each later step clears its own, so a caller
+# that dies midway leaves work that the next retry, or the recovery sweep, finishes instead of losing it.
+SETTLEMENT_RECOVERY_AGE_SECONDS = 60
+
+async def apply_settlements(settlements: List[dict]) -> List[str]:
+    # Each settlement is {"transaction", "paymentId", "signature"}; returns the ids this call flipped to Paid
+    if not settlements:
+        return []
+    
+    claim_token = secrets.token_hex(8)
+    operations = []
+    for settlement in settlements:
+        fields = {
+            "status": TransactionStatus.PAID,
+            "razorpayPaymentId": settlement["paymentId"],
+            "paidAt": datetime.now(timezone.utc),
+            "settlementToken": claim_token,
+            "settlementPending": True,
+            "activationPending": True,
+            "revenuePending": True
+        }
+        if settlement.get("signature"):
+            fields["razorpaySignature"] = settlement["signature"]
+        operations.append(UpdateOne({"id": settlement["transaction"]["id"], "status": {"$ne": TransactionStatus.PAID}}, {"$set": fields}))
+    await db.transactions.bulk_write(operations, ordered=False)
+    
+    # Finish the whole batch, including transactions an earlier attempt flipped but never completed
+    transaction_ids = [settlement["transaction"]["id"] for settlement in settlements]
+    await finish_settlements({"id": {"$in": transaction_ids}})
+    
+    return [
+        transaction["id"]
+        async for transaction in db.transactions.find({"settlementToken": claim_token}, {"_id": 0, "id": 1})
+    ]
+
+async def finish_settlements(query: dict):
+    pending = await db.transactions.find(
+        {**query, "status": TransactionStatus.PAID, "settlementPending": True},
+        {"_id": 0, "id": 1, "companyId": 1, "amount": 1, "planSnapshot": 1, "paidAt": 1, "activationPending": 1, "revenuePending": 1}
+    ).to_list(None)
+    if not pending:
+        return
+    
+    to_activate = [transaction for transaction in pending if transaction.get("activationPending")]
+    if to_activate:
+        await activate_subscriptions(to_activate)
+        await db.transactions.update_many(
+            {"id": {"$in": [transaction["id"] for transaction in to_activate]}},
+            {"$unset": {"activationPending": ""}}
+        )
+    
+    # Revenue is claimed before it is booked, so a retry can never count it twice. A crash in between
+    # under-counts instead, which reconcile_platform_stats repairs from the Paid transactions.
+    if any(transaction.get("revenuePending") for transaction in pending):
+        revenue_token = secrets.token_hex(8)
+        await db.transactions.update_many(
+            {"id": {"$in": [transaction["id"] for transaction in pending]}, "revenuePending": True},
+            {"$unset": {"revenuePending": ""}, "$set": {"revenueToken": revenue_token}}
+        )
+        claimed = await db.transactions.find({"revenueToken": revenue_token}, {"_id": 0, "amount": 1, "paidAt": 1}).to_list(None)
+        await record_payments([(transaction["amount"], as_utc(transaction["paidAt"])) for transaction in claimed])
+    
+    await db.transactions.update_many(
+        {"id": {"$in": [transaction["id"] for transaction in pending]}, "activationPending": {"$exists": False}, "revenuePending": {"$exists": False}},
+        {"$unset": {"settlementPending": ""}}
+    )
+
+async def activate_subscriptions(transactions: List[dict]):
+    # Activation is idempotent: it is keyed on the payment time, so replays and out-of-order retries
+    # can never roll a company back to an older payment
+    latest = {}
+    for transaction in transactions:
+        current = latest.get(transaction["companyId"])
+        if current is None or as_utc(transaction["paidAt"]) > as_utc(current["paidAt"]):
+            latest[transaction["companyId"]] = transaction
+    
+    previous = {
+        company["id"]: company.get("subscriptionStatus")
+        async for company in db.companies.find({"id": {"$in": list(latest)}}, {"_id": 0, "id": 1, "subscriptionStatus": 1})
+    }
+    activations = {}
+    for company_id, transaction in latest.items():
+        paid_at = as_utc(transaction["paidAt"])
+        plan_snapshot = transaction["planSnapshot"]
+        activations[company_id] = (paid_at, {
+            "subscriptionStatus": SubscriptionStatus.ACTIVE,
+            "subscriptionTier": plan_snapshot["name"],
+            "maxUsers": plan_snapshot["maxUsers"],
+            "storageLimit": plan_snapshot["storageLimitGB"],
+            "subscriptionExpiryDate": paid_at + timedelta(days=30),
+            "subscriptionPaidAt": paid_at,
+            "activatedByTransactionId": transaction["id"]
+        })
+    await db.companies.bulk_write([
+        UpdateOne(
+            {"id": company_id, "$or": [{"subscriptionPaidAt": {"$exists": False}}, {"subscriptionPaidAt": {"$lt": paid_at}}]},
+            {"$set": fields}
+        )
+        for company_id, (paid_at, fields) in activations.items()
+    ], ordered=False)
+    
+    await refresh_subscription_states(list(activations))
+    for company_id in activations:
+        if company_id in previous:
+            await record_subscription_transition(previous[company_id], SubscriptionStatus.ACTIVE)
+
+async def recover_settlements():
+    # Completes settlements whose caller crashed and will never retry (e.g. a browser verify that died)
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=SETTLEMENT_RECOVERY_AGE_SECONDS)
+    await finish_settlements({"paidAt": {"$lt": cutoff}})
+
 # Authentication Routes
 @api_router.post("/auth/login")
-async def login(credentials: UserLogin, response: Response):
+async def login(credentials: UserLogin, request: Request, response: Response):
+    await enforce_rate_limits("login", [
+        ("ip", client_ip(request), LOGIN_RATE_PER_IP),
+        ("email", credentials.email.lower(), LOGIN_RATE_PER_EMAIL)
+    ])
+    
     user = await db.users.find_one({"email": credentials.email})
-    if not user or not verify_password(credentials.password, user["passwordHash"]):
+    if not user:
         raise HTTPException(status_code=401, detail="Invalid credentials")
+    async with login_verify_limit:
+        if not await verify_password(credentials.password, user["passwordHash"]):
+            raise HTTPException(status_code=401, detail="Invalid credentials")
+    
+    # Upgrade hashes created with a different cost factor while we have the plaintext
+    if password_hasher.needs_rehash(user["passwordHash"]):
+        try:
+            rehashed = await hash_password(credentials.password)
+            await db.users.update_one({"id": user["id"]}, {"$set": {"passwordHash": rehashed}})
+            invalidate_user(user["id"])
+        except HTTPException:
+            logger.info(f"Skipped password rehash for user {user['id']}: hasher saturated")
+    
+    if AUTH_MODE == 'stateless':
+        await issue_access_token(response, user)
+        response.set_cookie(
+            key="refresh_token",
+            value=create_refresh_token(user["id"]),
+            httponly=True,
+            secure=True,
+            samesite="strict",
+            path="/api/auth",
+            max_age=REFRESH_TOKEN_TTL_DAYS * 86400
+        )
+    else:
+        token = create_token(user["id"], user["email"], user["role"])
+        response.set_cookie(
+            key="token",
+            value=token,
+            httponly=True,
+            secure=True,
+            samesite="lax",
+            max_age=JWT_EXPIRATION_HOURS * 3600
+        )
     
-    token = create_token(user["id"], user["email"], user["role"])
+    return {
+        "user": {
+            "id": user["id"],
+            "name": user["name"],
+            "email": user["email"],
+            "role": user["role"],
+            "companyId": user.get("companyId")
+        }
+    }
+
+async def issue_access_token(response: Response, user: dict):
+    subscription = await get_subscription_state(user["companyId"]) if user.get("companyId") else None
     response.set_cookie(
         key="token",
-        value=token,
+        value=create_access_token(user, subscription),
         httponly=True,
         secure=True,
         samesite="lax",
-        max_age=JWT_EXPIRATION_HOURS * 3600
+        max_age=ACCESS_TOKEN_TTL_MINUTES * 60
     )
+
+@api_router.post("/auth/refresh")
+async def refresh_session(request: Request, response: Response):
+    token = request.cookies.get("refresh_token")
+    if not token:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Not authenticated")
     
+    payload = decode_token(token)
+    if payload.get("typ") != "refresh" or revocations.is_revoked(payload):
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="Invalid token")
+    
+    # The one place the stateless mode reads the user, so role, company and subscription changes land here
+    user = await load_user(payload["user_id"])
+    if not user:
+        raise HTTPException(status_code=status.HTTP_401_UNAUTHORIZED, detail="User not found")
+    
+    await issue_access_token(response, user)
     return {
         "user": {
             "id": user["id"],
@@ -252,8 +1709,20 @@ async def login(credentials: UserLogin, response: Response):
     }
 
 @api_router.post("/auth/logout")
-async def logout(response: Response):
+async def logout(request: Request, response: Response):
+    for cookie in ("token", "refresh_token"):
+        token = request.cookies.get(cookie)
+        if not token:
+            continue
+        try:
+            payload = jwt.decode(token, JWT_SECRET, algorithms=[JWT_ALGORITHM])
+        except jwt.InvalidTokenError:
+            continue
+        if payload.get("jti"):
+            await revocations.revoke(f"token:{payload['jti']}")
+    
     response.delete_cookie("token")
+    response.delete_cookie("refresh_token", path="/api/auth")
     return {"message": "Logged out successfully"}
 
 @api_router.get("/auth/me")
@@ -267,7 +1736,12 @@ async def get_me(user: dict = Depends(get_current_user)):
     }
 
 @api_router.post("/auth/forgot-password")
-async def forgot_password(data: PasswordReset):
+async def forgot_password(data: PasswordReset, request: Request):
+    await enforce_rate_limits("forgot-password", [
+        ("ip", client_ip(request), FORGOT_PASSWORD_RATE_PER_IP),
+        ("email", data.email.lower(), FORGOT_PASSWORD_RATE_PER_EMAIL)
+    ])
+    
     user = await db.users.find_one({"email": data.email})
     if not user:
         return {"message": "If email exists, reset link has been sent"}
@@ -294,11 +1768,13 @@ async def reset_password(data: PasswordResetConfirm):
     if not user:
         raise HTTPException(status_code=400, detail="Invalid or expired reset token")
     
-    hashed = hash_password(data.newPassword)
+    hashed = await hash_password(data.newPassword)
     await db.users.update_one(
         {"id": user["id"]},
         {"$set": {"passwordHash": hashed}, "$unset": {"resetPasswordToken": "", "resetPasswordExpires": ""}}
     )
+    invalidate_user(user["id"])
+    await revocations.revoke(f"user:{user['id']}")
     
     return {"message": "Password reset successfully"}
 
@@ -308,20 +1784,30 @@ async def admin_dashboard(user: dict = Depends(get_current_user)):
     if user["role"] != UserRole.SUPER_ADMIN:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    total_companies = await db.companies.count_documents({})
-    total_revenue = await db.transactions.aggregate([
-        {"$match": {"status": TransactionStatus.PAID}},
-        {"$group": {"_id": None, "total": {"$sum": "$amount"}}}
-    ]).to_list(1)
-    
-    active_subscriptions = await db.companies.count_documents({"subscriptionStatus": SubscriptionStatus.ACTIVE})
+    return await platform_dashboard_stats()
+
+async def platform_dashboard_stats() -> dict:
+    stats, revenue_by_day, revenue_by_month = await asyncio.gather(
+        get_platform_stats(),
+        get_revenue_buckets("day", 30),
+        get_revenue_buckets("month", 12)
+    )
     
     return {
-        "totalCompanies": total_companies,
-        "totalRevenue": total_revenue[0]["total"] if total_revenue else 0,
-        "activeSubscriptions": active_subscriptions
+        "totalCompanies": stats.get("totalCompanies", 0),
+        "totalRevenue": stats.get("totalRevenue", 0),
+        "activeSubscriptions": stats.get("activeSubscriptions", 0),
+        "revenueByDay": revenue_by_day,
+        "revenueByMonth": revenue_by_month
     }
 
+@api_router.post("/admin/stats/reconcile")
+async def reconcile_stats(user: dict = Depends(get_current_user)):
+    if user["role"] != UserRole.SUPER_ADMIN:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    return await reconcile_platform_stats()
+
 @api_router.post("/admin/users")
 async def create_marketing_user(user_data: UserCreate, user: dict = Depends(get_current_user)):
     if user["role"] != UserRole.SUPER_ADMIN:
@@ -339,7 +1825,7 @@ async def create_marketing_user(user_data: UserCreate, user: dict = Depends(get_
         "id": user_id,
         "name": user_data.name,
         "email": user_data.email,
-        "passwordHash": hash_password(user_data.password),
+        "passwordHash": await hash_password(user_data.password),
         "role": user_data.role,
         "createdAt": datetime.now(timezone.utc)
     }
@@ -348,12 +1834,18 @@ async def create_marketing_user(user_data: UserCreate, user: dict = Depends(get_
     return {"id": user_id, "message": "User created successfully"}
 
 @api_router.get("/admin/users")
-async def get_all_users(user: dict = Depends(get_current_user)):
+async def get_all_users(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    order: SortOrder = SortOrder.DESC,
+    role: Optional[List[UserRole]] = Query(None),
+    user: dict = Depends(get_current_user)
+):
     if user["role"] != UserRole.SUPER_ADMIN:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    users = await db.users.find({}, {"_id": 0, "passwordHash": 0}).to_list(1000)
-    return users
+    query = {"role": {"$in": role}} if role else {}
+    return await paginate(db.users, query, "createdAt", cursor, limit, order, {"_id": 0, "passwordHash": 0})
 
 @api_router.delete("/admin/users/{user_id}")
 async def delete_user(user_id: str, user: dict = Depends(get_current_user)):
@@ -361,12 +1853,83 @@ async def delete_user(user_id: str, user: dict = Depends(get_current_user)):
         raise HTTPException(status_code=403, detail="Access denied")
     
     result = await db.users.delete_one({"id": user_id})
+    invalidate_user(user_id)
+    await revocations.revoke(f"user:{user_id}")
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="User not found")
     
     return {"message": "User deleted successfully"}
 
+@api_router.get("/admin/cache-stats")
+async def get_cache_stats(user: dict = Depends(get_current_user)):
+    if user["role"] != UserRole.SUPER_ADMIN:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    return {**{name: cache.stats() for name, cache in caches.items()}, "rateLimits": rate_limit_backend.stats()}
+
 # Plan Management
+class PlanCatalog:
+    # Pre-serialized plan listings keyed by view; a version counter discards loads that raced a mutation
+    def __init__(self, name: str, ttl_seconds: float):
+        self.name = name
+        self.ttl_seconds = ttl_seconds
+        self.version = 0
+        self.snapshots = {}
+        self.locks = {}
+        self.hits = 0
+        self.misses = 0
+    
+    def invalidate(self):
+        self.version += 1
+        self.snapshots.clear()
+    
+    async def get(self, view: str, query: dict) -> dict:
+        snapshot = self.snapshots.get(view)
+        if snapshot and snapshot["expiresAt"] > time.monotonic():
+            self.hits += 1
+            return snapshot
+        
+        lock = self.locks.setdefault(view, asyncio.Lock())
+        async with lock:
+            snapshot = self.snapshots.get(view)
+            if snapshot and snapshot["expiresAt"] > time.monotonic():
+                self.hits += 1
+                return snapshot
+            
+            self.misses += 1
+            version = self.version
+            plans = await db.plans.find(query, {"_id": 0}).to_list(100)
+            body = json.dumps(plans, separators=(",", ":"), default=str).encode()
+            snapshot = {
+                "plans": plans,
+                "body": body,
+                "etag": f'"{hashlib.sha256(body).hexdigest()[:32]}"',
+                "expiresAt": time.monotonic() + self.ttl_seconds
+            }
+            if version == self.version and self.ttl_seconds > 0:
+                self.snapshots[view] = snapshot
+            return snapshot
+    
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self.snapshots),
+            "version": self.version,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hitRate": round(self.hits / lookups, 4) if lookups else 0.0
+        }
+
+plan_catalog = PlanCatalog("planCatalog", PLAN_CACHE_TTL_SECONDS)
+caches[plan_catalog.name] = plan_catalog
+
+def plan_catalog_response(request: Request, snapshot: dict, cache_control: str) -> Response:
+    # The ETag hashes the body rather than the version, so it agrees across workers
+    headers = {"ETag": snapshot["etag"], "Cache-Control": cache_control}
+    if etag_matches(request.headers.get("if-none-match", ""), snapshot["etag"]):
+        return Response(status_code=304, headers=headers)
+    return Response(content=snapshot["body"], media_type="application/json", headers=headers)
+
 @api_router.post("/admin/plans")
 async def create_plan(plan_data: PlanCreate, user: dict = Depends(get_current_user)):
     if user["role"] != UserRole.SUPER_ADMIN:
@@ -380,20 +1943,21 @@ async def create_plan(plan_data: PlanCreate, user: dict = Depends(get_current_us
     }
     
     await db.plans.insert_one(new_plan)
+    plan_catalog.invalidate()
     return {"id": plan_id, "message": "Plan created successfully"}
 
 @api_router.get("/plans")
-async def get_plans():
-    plans = await db.plans.find({"isActive": True}, {"_id": 0}).to_list(100)
-    return plans
+async def get_plans(request: Request):
+    snapshot = await plan_catalog.get("active", {"isActive": True})
+    return plan_catalog_response(request, snapshot, f"public, max-age={PLAN_CACHE_MAX_AGE_SECONDS}, must-revalidate")
 
 @api_router.get("/admin/plans")
-async def get_all_plans(user: dict = Depends(get_current_user)):
+async def get_all_plans(request: Request, user: dict = Depends(get_current_user)):
     if user["role"] != UserRole.SUPER_ADMIN:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    plans = await db.plans.find({}, {"_id": 0}).to_list(100)
-    return plans
+    snapshot = await plan_catalog.get("all", {})
+    return plan_catalog_response(request, snapshot, "private, no-cache")
 
 @api_router.patch("/admin/plans/{plan_id}")
 async def update_plan(plan_id: str, plan_update: PlanUpdate, user: dict = Depends(get_current_user)):
@@ -405,29 +1969,15 @@ async def update_plan(plan_id: str, plan_update: PlanUpdate, user: dict = Depend
         raise HTTPException(status_code=400, detail="No fields to update")
     
     result = await db.plans.update_one({"id": plan_id}, {"$set": update_data})
+    plan_catalog.invalidate()
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Plan not found")
     
     return {"message": "Plan updated successfully"}
 
 # Marketing Routes
-@api_router.post("/marketing/companies")
-async def onboard_company(company_data: CompanyCreate, user: dict = Depends(get_current_user)):
-    if user["role"] not in [UserRole.SUPER_ADMIN, UserRole.MARKETING]:
-        raise HTTPException(status_code=403, detail="Access denied")
-    
-    # Check if admin email already exists
-    existing = await db.users.find_one({"email": company_data.adminEmail})
-    if existing:
-        raise HTTPException(status_code=400, detail="Admin email already exists")
-    
+def build_company_onboarding(company_data: CompanyCreate, plan: Optional[dict], admin_password_hash: str) -> tuple:
     company_id = secrets.token_urlsafe(16)
-    user_id = secrets.token_urlsafe(16)
-    
-    # Get plan details if provided
-    plan = None
-    if company_data.planId:
-        plan = await db.plans.find_one({"id": company_data.planId})
     
     # Create company
     new_company = {
@@ -443,27 +1993,158 @@ async def onboard_company(company_data: CompanyCreate, user: dict = Depends(get_
     
     # Create admin user
     new_admin = {
-        "id": user_id,
+        "id": secrets.token_urlsafe(16),
         "name": company_data.adminName,
         "email": company_data.adminEmail,
-        "passwordHash": hash_password(company_data.adminPassword),
+        "passwordHash": admin_password_hash,
         "role": UserRole.CLIENT_ADMIN,
         "companyId": company_id,
         "createdAt": datetime.now(timezone.utc)
     }
     
+    return new_company, new_admin
+
+@api_router.post("/marketing/companies")
+async def onboard_company(company_data: CompanyCreate, user: dict = Depends(get_current_user)):
+    if user["role"] not in [UserRole.SUPER_ADMIN, UserRole.MARKETING]:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    # Check if admin email already exists
+    existing = await db.users.find_one({"email": company_data.adminEmail})
+    if existing:
+        raise HTTPException(status_code=400, detail="Admin email already exists")
+    
+    # Get plan details if provided
+    plan = None
+    if company_data.planId:
+        plan = await db.plans.find_one({"id": company_data.planId})
+    
+    new_company, new_admin = build_company_onboarding(company_data, plan, await hash_password(company_data.adminPassword))
+    company_id, user_id = new_company["id"], new_admin["id"]
+    
     await db.companies.insert_one(new_company)
-    await db.users.insert_one(new_admin)
+    try:
+        await db.users.insert_one(new_admin)
+    except DuplicateKeyError:
+        # Never leave a company behind without its admin
+        await db.companies.delete_one({"id": company_id})
+        raise HTTPException(status_code=400, detail="Admin email already exists")
+    cache_subscription_state(company_id, new_company["subscriptionStatus"], new_company["subscriptionExpiryDate"])
+    await record_company_created(new_company["subscriptionStatus"])
     
     return {"companyId": company_id, "adminId": user_id, "message": "Company onboarded successfully"}
 
+@api_router.post("/marketing/companies/bulk")
+async def bulk_onboard_companies(request: Request, user: dict = Depends(get_current_user)):
+    if user["role"] not in [UserRole.SUPER_ADMIN, UserRole.MARKETING]:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    rows = await parse_bulk_rows(request, "companies")
+    results = [{"row": index + 1, "name": (row.get("name") if isinstance(row, dict) else None)} for index, row in enumerate(rows)]
+    valid = []
+    seen_emails = set()
+    for result, row in zip(results, rows):
+        if isinstance(row, dict) and not row.get("planId"):
+            row = {**row, "planId": None}
+        try:
+            data = CompanyCreate.model_validate(row)
+        except ValidationError as exc:
+            result.update(status="error", error=validation_message(exc))
+            continue
+        if data.adminEmail in seen_emails:
+            result.update(status="error", error="Duplicate admin email in import")
+            continue
+        seen_emails.add(data.adminEmail)
+        valid.append((result, data))
+    
+    # Every referenced plan and every admin email is resolved in one query each
+    plan_ids = list({data.planId for _, data in valid if data.planId})
+    plans, existing = await asyncio.gather(
+        db.plans.find({"id": {"$in": plan_ids}}, {"_id": 0}).to_list(len(plan_ids) or 1),
+        db.users.find({"email": {"$in": [data.adminEmail for _, data in valid]}}, {"_id": 0, "email": 1}).to_list(len(valid) or 1)
+    )
+    plans = {plan["id"]: plan for plan in plans}
+    existing = {existing_user["email"] for existing_user in existing}
+    
+    accepted = []
+    for result, data in valid:
+        if data.adminEmail in existing:
+            result.update(status="error", error="Admin email already exists")
+        elif data.planId and data.planId not in plans:
+            result.update(status="error", error="Plan not found")
+        else:
+            accepted.append((result, data))
+    
+    hashes = await password_hasher.hash_many([data.adminPassword for _, data in accepted])
+    onboarded = []
+    for (result, data), password_hash in zip(accepted, hashes):
+        new_company, new_admin = build_company_onboarding(data, plans.get(data.planId), password_hash)
+        onboarded.append((result, new_company, new_admin))
+    
+    # Companies first; admins only for companies that landed; companies whose admin failed are rolled back
+    batch_company_ids = [company["id"] for _, company, _ in onboarded]
+    try:
+        company_errors = {}
+        if onboarded:
+            try:
+                await db.companies.insert_many([company for _, company, _ in onboarded], ordered=False)
+            except BulkWriteError as exc:
+                company_errors = bulk_write_errors(exc)
+        for index in company_errors:
+            onboarded[index][0].update(status="error", error="Failed to create company")
+        onboarded = [entry for index, entry in enumerate(onboarded) if index not in company_errors]
+        
+        admin_errors = {}
+        if onboarded:
+            try:
+                await db.users.insert_many([admin for _, _, admin in onboarded], ordered=False)
+            except BulkWriteError as exc:
+                admin_errors = bulk_write_errors(exc)
+        if admin_errors:
+            await db.companies.delete_many({"id": {"$in": [onboarded[index][1]["id"] for index in admin_errors]}})
+            for index, error in admin_errors.items():
+                onboarded[index][0].update(status="error", error="Admin email already exists" if error.get("code") == 11000 else "Failed to create admin")
+        onboarded = [entry for index, entry in enumerate(onboarded) if index not in admin_errors]
+    except Exception:
+        # Timeouts and dropped connections leave the batch half-written: keep only companies whose admin landed
+        with_admin = await db.users.distinct("companyId", {"companyId": {"$in": batch_company_ids}})
+        await db.companies.delete_many({"id": {"$in": [company_id for company_id in batch_company_ids if company_id not in with_admin]}})
+        raise
+    
+    for result, company, admin in onboarded:
+        result.update(status="created", companyId=company["id"], adminId=admin["id"])
+        cache_subscription_state(company["id"], company["subscriptionStatus"], company["subscriptionExpiryDate"])
+    await increment_platform_stats(
+        totalCompanies=len(onboarded),
+        activeSubscriptions=sum(1 for _, company, _ in onboarded if company["subscriptionStatus"] == SubscriptionStatus.ACTIVE)
+    )
+    
+    return {"created": len(onboarded), "failed": len(results) - len(onboarded), "results": results}
+
 @api_router.get("/marketing/companies")
-async def get_companies(user: dict = Depends(get_current_user)):
+async def get_companies(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    order: SortOrder = SortOrder.DESC,
+    subscription_status: Optional[SubscriptionStatus] = Query(None, alias="subscriptionStatus"),
+    user: dict = Depends(get_current_user)
+):
     if user["role"] not in [UserRole.SUPER_ADMIN, UserRole.MARKETING]:
         raise HTTPException(status_code=403, detail="Access denied")
     
-    companies = await db.companies.find({}, {"_id": 0}).to_list(1000)
-    return companies
+    query = {"subscriptionStatus": subscription_status} if subscription_status else {}
+    return await paginate(db.companies, query, "createdAt", cursor, limit, order, {"_id": 0})
+
+@api_router.get("/marketing/companies/export")
+async def export_companies(
+    export_format: ExportFormat = Query(ExportFormat.NDJSON, alias="format"),
+    batch_size: int = Query(EXPORT_BATCH_SIZE, alias="batchSize", ge=1, le=MAX_EXPORT_BATCH_SIZE),
+    user: dict = Depends(get_current_user)
+):
+    if user["role"] not in [UserRole.SUPER_ADMIN, UserRole.MARKETING]:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    return export_response("companies", {}, "createdAt", export_format, batch_size)
 
 # Company & User Management
 @api_router.get("/companies/{company_id}")
@@ -504,7 +2185,7 @@ async def add_company_user(company_id: str, user_data: UserCreate, user: dict =
         "id": user_id,
         "name": user_data.name,
         "email": user_data.email,
-        "passwordHash": hash_password(user_data.password),
+        "passwordHash": await hash_password(user_data.password),
         "role": UserRole.CLIENT_ENGINEER,
         "companyId": company_id,
         "createdAt": datetime.now(timezone.utc)
@@ -513,17 +2194,148 @@ async def add_company_user(company_id: str, user_data: UserCreate, user: dict =
     await db.users.insert_one(new_user)
     return {"id": user_id, "message": "User added successfully"}
 
+async def parse_bulk_rows(request: Request, key: str) -> List[dict]:
+    # Accepts a CSV body with a header row, a JSON array, or a JSON object wrapping the array under key
+    body = await request.body()
+    content_type = request.headers.get("content-type", "")
+    try:
+        if "csv" in content_type:
+            rows = list(csv.DictReader(io.StringIO(body.decode('utf-8-sig'))))
+        else:
+            payload = json.loads(body)
+            rows = payload.get(key) if isinstance(payload, dict) else payload
+    except (ValueError, UnicodeDecodeError):
+        raise HTTPException(status_code=400, detail="Could not parse import file")
+    
+    if not isinstance(rows, list) or not rows:
+        raise HTTPException(status_code=400, detail="No rows to import")
+    if len(rows) > BULK_IMPORT_MAX_ROWS:
+        raise HTTPException(status_code=400, detail=f"At most {BULK_IMPORT_MAX_ROWS} rows can be imported at once")
+    return rows
+
+def bulk_write_errors(exc: BulkWriteError) -> dict:
+    return {error["index"]: error for error in exc.details.get("writeErrors", [])}
+
+def validation_message(error: ValidationError) -> str:
+    return "; ".join(f"{'.'.join(str(part) for part in item['loc'])}: {item['msg']}" for item in error.errors())
+
+@api_router.post("/companies/{company_id}/users/bulk")
+async def bulk_add_company_users(company_id: str, request: Request, user: dict = Depends(get_current_user)):
+    # Only ClientAdmin can add users to their company
+    if user["role"] != UserRole.CLIENT_ADMIN or user.get("companyId") != company_id:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    rows = await parse_bulk_rows(request, "users")
+    company, current_users = await asyncio.gather(
+        db.companies.find_one({"id": company_id}, {"_id": 0, "maxUsers": 1}),
+        db.users.count_documents({"companyId": company_id})
+    )
+    if not company:
+        raise HTTPException(status_code=404, detail="Company not found")
+    
+    results = [{"row": index + 1, "email": (row.get("email") if isinstance(row, dict) else None)} for index, row in enumerate(rows)]
+    valid = []
+    seen_emails = set()
+    for result, row in zip(results, rows):
+        try:
+            data = BulkUserRow.model_validate(row)
+        except ValidationError as exc:
+            result.update(status="error", error=validation_message(exc))
+            continue
+        if data.email in seen_emails:
+            result.update(status="error", error="Duplicate email in import")
+            continue
+        seen_emails.add(data.email)
+        valid.append((result, data))
+    
+    # One round trip for every email in the file
+    existing = {
+        existing_user["email"]
+        async for existing_user in db.users.find({"email": {"$in": [data.email for _, data in valid]}}, {"_id": 0, "email": 1})
+    }
+    seats = max(0, company["maxUsers"] - current_users)
+    accepted = []
+    for result, data in valid:
+        if data.email in existing:
+            result.update(status="error", error="Email already exists")
+        elif len(accepted) >= seats:
+            result.update(status="error", error="User limit reached. Please upgrade your plan.")
+        else:
+            accepted.append((result, data))
+    
+    hashes = await password_hasher.hash_many([data.password for _, data in accepted])
+    now = datetime.now(timezone.utc)
+    new_users = []
+    for (result, data), password_hash in zip(accepted, hashes):
+        new_users.append({
+            "id": secrets.token_urlsafe(16),
+            "name": data.name,
+            "email": data.email,
+            "passwordHash": password_hash,
+            "role": UserRole.CLIENT_ENGINEER,
+            "companyId": company_id,
+            "createdAt": now
+        })
+        result.update(status="created", id=new_users[-1]["id"])
+    
+    if new_users:
+        try:
+            await db.users.insert_many(new_users, ordered=False)
+        except BulkWriteError as exc:
+            # Emails registered concurrently trip the unique index; the rest of the batch still lands
+            for error in exc.details.get("writeErrors", []):
+                result = accepted[error["index"]][0]
+                result.pop("id", None)
+                result.update(status="error", error="Email already exists" if error.get("code") == 11000 else error.get("errmsg", "Insert failed"))
+    
+    created = sum(1 for result in results if result["status"] == "created")
+    return {"created": created, "failed": len(results) - created, "results": results}
+
 @api_router.get("/companies/{company_id}/users")
-async def get_company_users(company_id: str, user: dict = Depends(get_current_user)):
+async def get_company_users(
+    company_id: str,
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    order: SortOrder = SortOrder.DESC,
+    role: Optional[UserRole] = None,
+    user: dict = Depends(get_current_user)
+):
     # Users can only see users in their company
     if user["role"] not in [UserRole.SUPER_ADMIN, UserRole.MARKETING]:
         if user.get("companyId") != company_id:
             raise HTTPException(status_code=403, detail="Access denied")
     
-    users = await db.users.find({"companyId": company_id}, {"_id": 0, "passwordHash": 0}).to_list(1000)
-    return users
+    query = {"companyId": company_id}
+    if role:
+        query["role"] = role
+    return await paginate(db.users, query, "createdAt", cursor, limit, order, {"_id": 0, "passwordHash": 0})
 
 # Project Management
+async def insert_project(project_id: str, title: str, location: str, drawing_type: DrawingType, file_name: str, stored: dict, user: dict):
+    new_project = {
+        "id": project_id,
+        "title": title,
+        "location": location,
+        "drawingType": drawing_type,
+        "fileName": file_name,
+        "filePath": stored["path"],
+        "fileSize": stored["size"],
+        "checksum": stored["sha256"],
+        "blobId": stored["blobId"],
+        "status": ProjectStatus.UPLOADED,
+        "createdBy": user["id"],
+        "companyId": user["companyId"],
+        "createdAt": datetime.now(timezone.utc)
+    }
+    
+    try:
+        await db.projects.insert_one(new_project)
+    except Exception:
+        await release_blob(stored["blobId"])
+        raise
+    await enqueue_processing_job(new_project)
+    return new_project
+
 @api_router.post("/projects")
 async def create_project(project: ProjectCreate, file: UploadFile = File(...), user: dict = Depends(get_current_user)):
     # Check subscription
@@ -534,46 +2346,47 @@ async def create_project(project: ProjectCreate, file: UploadFile = File(...), u
     
     # Save file
     file_extension = file.filename.split('.')[-1].lower()
-    if file_extension not in ['pdf', 'dwg']:
+    if file_extension not in ALLOWED_DRAWING_EXTENSIONS:
         raise HTTPException(status_code=400, detail="Only PDF and DWG files are allowed")
     
     project_id = secrets.token_urlsafe(16)
-    file_name = f"{project_id}.{file_extension}"
-    file_path = UPLOAD_DIR / file_name
-    
-    async with aiofiles.open(file_path, 'wb') as f:
-        content = await file.read()
-        await f.write(content)
-    
-    # Create project
-    new_project = {
-        "id": project_id,
-        "title": project.title,
-        "location": project.location,
-        "drawingType": project.drawingType,
-        "fileName": file.filename,
-        "filePath": str(file_path),
-        "status": ProjectStatus.UPLOADED,
-        "createdBy": user["id"],
-        "companyId": user["companyId"],
-        "createdAt": datetime.now(timezone.utc)
-    }
-    
-    await db.projects.insert_one(new_project)
+    stored = await stream_upload_to_disk(file)
+    await insert_project(project_id, project.title, project.location, project.drawingType, file.filename, stored, user)
     return {"id": project_id, "message": "Project created successfully"}
 
 @api_router.get("/projects")
-async def get_projects(user: dict = Depends(get_current_user)):
+async def get_projects(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    order: SortOrder = SortOrder.DESC,
+    project_status: Optional[ProjectStatus] = Query(None, alias="status"),
+    drawing_type: Optional[DrawingType] = Query(None, alias="drawingType"),
+    user: dict = Depends(get_current_user)
+):
     if not user.get("companyId"):
         raise HTTPException(status_code=400, detail="User not associated with any company")
     
     # All users in a company can see all projects
-    projects = await db.projects.find({"companyId": user["companyId"]}, {"_id": 0}).to_list(1000)
-    return projects
+    query = {"companyId": user["companyId"]}
+    if project_status:
+        query["status"] = project_status
+    if drawing_type:
+        query["drawingType"] = drawing_type
+    return await paginate(db.projects, query, "createdAt", cursor, limit, order, {"_id": 0})
 
-@api_router.get("/projects/{project_id}")
-async def get_project(project_id: str, user: dict = Depends(get_current_user)):
-    project = await db.projects.find_one({"id": project_id}, {"_id": 0})
+@api_router.get("/projects/export")
+async def export_projects(
+    export_format: ExportFormat = Query(ExportFormat.NDJSON, alias="format"),
+    batch_size: int = Query(EXPORT_BATCH_SIZE, alias="batchSize", ge=1, le=MAX_EXPORT_BATCH_SIZE),
+    user: dict = Depends(get_current_user)
+):
+    if not user.get("companyId"):
+        raise HTTPException(status_code=400, detail="User not associated with any company")
+    
+    return export_response("projects", {"companyId": user["companyId"]}, "createdAt", export_format, batch_size)
+
+async def load_project_for_user(project_id: str, user: dict, projection: Optional[dict] = None) -> dict:
+    project = await db.projects.find_one({"id": project_id}, projection or {"_id": 0})
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     
@@ -584,6 +2397,753 @@ async def get_project(project_id: str, user: dict = Depends(get_current_user)):
     
     return project
 
+@api_router.get("/projects/{project_id}")
+async def get_project(project_id: str, user: dict = Depends(get_current_user)):
+    return await load_project_for_user(project_id, user)
+
+@api_router.delete("/projects/{project_id}")
+async def delete_project(project_id: str, user: dict = Depends(get_current_user)):
+    project = await load_project_for_user(project_id, user, {"_id": 0, "id": 1, "companyId": 1, "createdBy": 1, "blobId": 1, "filePath": 1})
+    if user["role"] not in [UserRole.SUPER_ADMIN, UserRole.CLIENT_ADMIN] and project["createdBy"] != user["id"]:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    result = await db.projects.delete_one({"id": project_id})
+    if result.deleted_count == 0:
+        raise HTTPException(status_code=404, detail="Project not found")
+    
+    # The blob itself is only removed by the GC pass once nothing references it
+    await release_project_file(project)
+    await db.processing_jobs.update_many(
+        {"projectId": project_id, "status": JobStatus.QUEUED},
+        {"$set": {"status": JobStatus.FAILED, "error": "Project deleted"}}
+    )
+    project_access_cache.invalidate(project_id)
+    
+    return {"message": "Project deleted successfully"}
+
+# Drawing Downloads
+DRAWING_MEDIA_TYPES = {
+    DrawingType.PDF: "application/pdf",
+    DrawingType.DWG: "image/vnd.dwg",
+}
+
+class FileRangeResponse(Response):
+    # Serves a byte range of a file, handing the descriptor to the server when it supports zero-copy send
+    def __init__(self, path: Path, offset: int, length: int, status_code: int, headers: dict, media_type: str):
+        self.path = path
+        self.offset = offset
+        self.length = length
+        self.status_code = status_code
+        self.media_type = media_type
+        self.background = None
+        self.init_headers({**headers, "content-length": str(length)})
+    
+    async def __call__(self, scope, receive, send):
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if scope["method"] == "HEAD" or self.length == 0:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+        
+        if "http.response.zerocopysend" in scope.get("extensions", {}):
+            with open(self.path, 'rb') as f:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": f.fileno(),
+                    "offset": self.offset,
+                    "count": self.length,
+                    "more_body": False
+                })
+            return
+        
+        async with aiofiles.open(self.path, 'rb') as f:
+            await f.seek(self.offset)
+            remaining = self.length
+            while remaining > 0:
+                chunk = await f.read(min(DOWNLOAD_CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+            if remaining > 0:
+                await send({"type": "http.response.body", "body": b"", "more_body": False})
+
+def file_etag(project: dict, stat_result: os.stat_result) -> str:
+    if project.get("checksum"):
+        return f'"{project["checksum"]}"'
+    return f'"{stat_result.st_size:x}-{stat_result.st_mtime_ns:x}"'
+
+def etag_matches(header: str, etag: str) -> bool:
+    candidates = [candidate.strip() for candidate in header.split(',')]
+    return "*" in candidates or etag in candidates
+
+def parse_byte_range(header: str, size: int) -> Optional[tuple]:
+    # Only single ranges are served; anything unparseable falls back to the full body per RFC 9110
+    match = re.fullmatch(r"bytes=(\d*)-(\d*)", header.strip())
+    if not match or not (match.group(1) or match.group(2)):
+        return None
+    
+    start, end = match.group(1), match.group(2)
+    if not start:
+        suffix = int(end)
+        start, end = max(0, size - suffix), size - 1
+        if suffix == 0:
+            start = size
+    else:
+        start = int(start)
+        if end and int(end) < start:
+            # A last position before the first makes the range invalid, which is ignored rather than refused
+            return None
+        end = min(int(end), size - 1) if end else size - 1
+    
+    if start >= size or start > end:
+        raise HTTPException(
+            status_code=status.HTTP_416_REQUESTED_RANGE_NOT_SATISFIABLE,
+            detail="Requested range not satisfiable",
+            headers={"Content-Range": f"bytes */{size}"}
+        )
+    return start, end
+
+def content_disposition(file_name: str, inline: bool) -> str:
+    disposition = "inline" if inline else "attachment"
+    return f"{disposition}; filename*=UTF-8''{quote(file_name)}"
+
+@api_router.api_route("/projects/{project_id}/file", methods=["GET", "HEAD"])
+async def download_project_file(project_id: str, request: Request, inline: bool = False, user: dict = Depends(get_current_user)):
+    project = await load_project_for_user(
+        project_id,
+        user,
+        {"_id": 0, "companyId": 1, "filePath": 1, "fileName": 1, "drawingType": 1, "checksum": 1}
+    )
+    path = Path(project["filePath"])
+    try:
+        stat_result = os.stat(path)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Drawing file not found")
+    
+    etag = file_etag(project, stat_result)
+    headers = {
+        "ETag": etag,
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, no-cache",
+        "Content-Disposition": content_disposition(project["fileName"], inline)
+    }
+    
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={k: v for k, v in headers.items() if k != "Content-Disposition"})
+    
+    media_type = DRAWING_MEDIA_TYPES.get(project["drawingType"], "application/octet-stream")
+    if DOWNLOAD_ACCEL_REDIRECT_PREFIX:
+        # Let the fronting nginx serve the bytes with sendfile and its own Range handling
+        relative = path.relative_to(UPLOAD_DIR).as_posix()
+        return Response(headers={**headers, "X-Accel-Redirect": DOWNLOAD_ACCEL_REDIRECT_PREFIX.rstrip('/') + '/' + relative}, media_type=media_type)
+    
+    size = stat_result.st_size
+    byte_range = None
+    range_header = request.headers.get("range")
+    if_range = request.headers.get("if-range")
+    if range_header and (not if_range or if_range.strip() == etag):
+        byte_range = parse_byte_range(range_header, size)
+    
+    if byte_range:
+        start, end = byte_range
+        headers["Content-Range"] = f"bytes {start}-{end}/{size}"
+        return FileRangeResponse(path, start, end - start + 1, status.HTTP_206_PARTIAL_CONTENT, headers, media_type)
+    
+    return FileRangeResponse(path, 0, size, status.HTTP_200_OK, headers, media_type)
+
+# Drawing Previews
+class PreviewStore:
+    # Size-capped LRU over the preview directory. File mtimes are the recency clock, so every worker
+    # sharing the disk sees the same order without a coordination service.
+    def __init__(self, root: Path, max_bytes: int):
+        self.root = root
+        self.max_bytes = max_bytes
+        self.touch_interval = 600
+    
+    def get(self, path: Path) -> Optional[Path]:
+        try:
+            mtime = path.stat().st_mtime
+        except FileNotFoundError:
+            return None
+        if time.time() - mtime > self.touch_interval:
+            try:
+                os.utime(path)
+            except FileNotFoundError:
+                # Evicted by another worker between the stat and the touch
+                return None
+        return path
+    
+    def evict(self) -> int:
+        files = []
+        for directory in self.root.glob("*"):
+            if not directory.is_dir():
+                continue
+            for entry in os.scandir(directory):
+                if entry.is_file() and not entry.name.startswith("."):
+                    stat_result = entry.stat()
+                    files.append((stat_result.st_mtime, stat_result.st_size, entry.path))
+        
+        total = sum(size for _, size, _ in files)
+        if total <= self.max_bytes:
+            return 0
+        
+        # Evict down to 90% of the cap so we do not thrash right at the limit
+        evicted = 0
+        target = self.max_bytes * 0.9
+        for _, size, path in sorted(files):
+            if total <= target:
+                break
+            Path(path).unlink(missing_ok=True)
+            total -= size
+            evicted += 1
+        return evicted
+
+preview_store = PreviewStore(PREVIEW_DIR, PREVIEW_STORE_MAX_MB * 1024 * 1024)
+preview_renders = {}
+preview_render_slots = asyncio.Semaphore(PREVIEW_RENDER_CONCURRENCY)
+
+async def load_project_access(project_id: str, user: dict) -> dict:
+    # A project's file never changes after upload, so its access facts are safe to cache
+    project = project_access_cache.get(project_id)
+    if project is None:
+        project = await load_project_for_user(project_id, user, {"_id": 0, "companyId": 1, "filePath": 1, "drawingType": 1, "checksum": 1})
+        project_access_cache.set(project_id, project)
+    elif user["role"] not in [UserRole.SUPER_ADMIN, UserRole.MARKETING] and project["companyId"] != user.get("companyId"):
+        raise HTTPException(status_code=403, detail="Access denied")
+    return project
+
+async def render_preview(project: dict, page: int, size: PreviewSize) -> Optional[Path]:
+    output_path = preview_artifact_path(project["checksum"], page, size)
+    cached = preview_store.get(output_path)
+    if cached:
+        return cached
+    
+    # Single-flight: concurrent requests for the same artifact share one render
+    key = str(output_path)
+    if key not in preview_renders:
+        async def run():
+            async with preview_render_slots:
+                try:
+                    return await run_in_processing_pool(render_pdf_page, project["filePath"], output_path, page, size)
+                except BrokenProcessPool:
+                    # The render shared a pool with a child that died; the pool is fresh now, so try once more
+                    return await run_in_processing_pool(render_pdf_page, project["filePath"], output_path, page, size)
+        preview_renders[key] = asyncio.ensure_future(run())
+        preview_renders[key].add_done_callback(lambda _: preview_renders.pop(key, None))
+    
+    rendered = await asyncio.shield(preview_renders[key])
+    return output_path if rendered else None
+
+@api_router.get("/projects/{project_id}/preview")
+async def get_project_preview(
+    project_id: str,
+    request: Request,
+    page: int = Query(1, ge=1, le=10000),
+    size: PreviewSize = PreviewSize.THUMB,
+    user: dict = Depends(get_current_user)
+):
+    project = await load_project_access(project_id, user)
+    if project["drawingType"] != DrawingType.PDF or not project.get("checksum"):
+        raise HTTPException(status_code=404, detail="Preview not available")
+    
+    etag = f'"{project["checksum"]}-p{page}-{size.value}"'
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={PREVIEW_CACHE_MAX_AGE_SECONDS}, immutable"}
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match and etag_matches(if_none_match, etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    path = await render_preview(project, page, size)
+    if not path:
+        raise HTTPException(status_code=404, detail="Preview not available")
+    
+    return FileResponse(path, media_type="image/png", headers=headers)
+
+async def preview_store_gc_loop():
+    while True:
+        await asyncio.sleep(PREVIEW_STORE_GC_INTERVAL_SECONDS)
+        try:
+            evicted = await asyncio.to_thread(preview_store.evict)
+            if evicted:
+                logger.info(f"Evicted {evicted} preview artifacts")
+        except Exception:
+            logger.exception("Preview store eviction failed")
+
+# Resumable Uploads
+def upload_session_dir(upload_id: str) -> Path:
+    return UPLOAD_TMP_DIR / upload_id
+
+def upload_chunk_path(upload_id: str, index: int) -> Path:
+    return upload_session_dir(upload_id) / f"{index:06d}.chunk"
+
+def expected_chunk_size(session: dict, index: int) -> int:
+    if index == session["totalChunks"] - 1:
+        return session["totalSize"] - index * session["chunkSize"]
+    return session["chunkSize"]
+
+def received_ranges(session: dict) -> List[List[int]]:
+    ranges = []
+    for index in sorted(session.get("receivedChunks", [])):
+        start = index * session["chunkSize"]
+        end = start + expected_chunk_size(session, index)
+        if ranges and ranges[-1][1] == start:
+            ranges[-1][1] = end
+        else:
+            ranges.append([start, end])
+    return ranges
+
+def upload_session_summary(session: dict) -> dict:
+    received = sorted(session.get("receivedChunks", []))
+    received_set = set(received)
+    return {
+        "uploadId": session["id"],
+        "status": session["status"],
+        "fileName": session["fileName"],
+        "totalSize": session["totalSize"],
+        "chunkSize": session["chunkSize"],
+        "totalChunks": session["totalChunks"],
+        "receivedChunks": received,
+        "receivedRanges": received_ranges(session),
+        "missingChunks": [i for i in range(session["totalChunks"]) if i not in received_set],
+        "projectId": session.get("projectId"),
+        "expiresAt": session["expiresAt"]
+    }
+
+async def get_upload_session(upload_id: str, user: dict) -> dict:
+    session = await db.upload_sessions.find_one(
+        {"id": upload_id, "expiresAt": {"$gt": datetime.now(timezone.utc)}},
+        {"_id": 0}
+    )
+    if not session:
+        raise HTTPException(status_code=404, detail="Upload session not found or expired")
+    
+    if session["createdBy"] != user["id"]:
+        raise HTTPException(status_code=403, detail="Access denied")
+    
+    return session
+
+@api_router.post("/uploads")
+async def create_upload_session(data: UploadSessionCreate, user: dict = Depends(get_current_user)):
+    await check_subscription_status(user)
+    
+    if not user.get("companyId"):
+        raise HTTPException(status_code=400, detail="User not associated with any company")
+    
+    file_extension = data.fileName.split('.')[-1].lower()
+    if file_extension not in ALLOWED_DRAWING_EXTENSIONS:
+        raise HTTPException(status_code=400, detail="Only PDF and DWG files are allowed")
+    
+    if data.totalSize > MAX_UPLOAD_SIZE_MB * 1024 * 1024:
+        raise HTTPException(status_code=413, detail=f"File exceeds maximum size of {MAX_UPLOAD_SIZE_MB} MB")
+    
+    upload_id = secrets.token_urlsafe(16)
+    chunk_size = UPLOAD_SESSION_CHUNK_SIZE_MB * 1024 * 1024
+    now = datetime.now(timezone.utc)
+    session = {
+        "id": upload_id,
+        "title": data.title,
+        "location": data.location,
+        "drawingType": data.drawingType,
+        "fileName": data.fileName,
+        "fileExtension": file_extension,
+        "totalSize": data.totalSize,
+        "chunkSize": chunk_size,
+        "totalChunks": -(-data.totalSize // chunk_size),
+        "receivedChunks": [],
+        "status": UploadSessionStatus.OPEN,
+        "createdBy": user["id"],
+        "companyId": user["companyId"],
+        "createdAt": now,
+        "expiresAt": now + timedelta(hours=UPLOAD_SESSION_TTL_HOURS)
+    }
+    
+    # A client that already knows the hash can skip the transfer entirely when its own company holds the
+    # same content; limiting this to the company stops a bare hash from granting access to another tenant's file
+    if data.sha256 and await db.projects.find_one({"companyId": user["companyId"], "blobId": data.sha256}, {"_id": 1}):
+        blob = await reference_blob(data.sha256)
+        if blob and blob["size"] == data.totalSize:
+            project_id = secrets.token_urlsafe(16)
+            stored = {"size": blob["size"], "sha256": blob["id"], "blobId": blob["id"], "path": blob["path"]}
+            await insert_project(project_id, data.title, data.location, data.drawingType, data.fileName, stored, user)
+            session.update({"status": UploadSessionStatus.COMPLETED, "projectId": project_id, "receivedChunks": list(range(session["totalChunks"]))})
+            await db.upload_sessions.insert_one(session)
+            return upload_session_summary(session)
+        if blob:
+            await release_blob(data.sha256)
+    
+    upload_session_dir(upload_id).mkdir(parents=True, exist_ok=True)
+    await db.upload_sessions.insert_one(session)
+    return upload_session_summary(session)
+
+@api_router.get("/uploads/{upload_id}")
+async def get_upload_status(upload_id: str, user: dict = Depends(get_current_user)):
+    session = await get_upload_session(upload_id, user)
+    return upload_session_summary(session)
+
+@api_router.put("/uploads/{upload_id}/chunks/{index}")
+async def upload_chunk(upload_id: str, index: int, request: Request, user: dict = Depends(get_current_user)):
+    session = await get_upload_session(upload_id, user)
+    if session["status"] != UploadSessionStatus.OPEN:
+        raise HTTPException(status_code=409, detail="Upload session is no longer accepting chunks")
+    
+    if index < 0 or index >= session["totalChunks"]:
+        raise HTTPException(status_code=400, detail="Chunk index out of range")
+    
+    # Chunks are written to their own file, so retries and parallel PUTs never interleave
+    expected_size = expected_chunk_size(session, index)
+    chunk_path = upload_chunk_path(upload_id, index)
+    stored = await write_stream_atomically(request.stream(), chunk_path, expected_size)
+    if stored["size"] != expected_size:
+        chunk_path.unlink(missing_ok=True)
+        raise HTTPException(status_code=400, detail=f"Chunk {index} must be exactly {expected_size} bytes")
+    
+    await db.upload_sessions.update_one({"id": upload_id}, {"$addToSet": {"receivedChunks": index}})
+    return {"index": index, "size": stored["size"], "sha256": stored["sha256"]}
+
+async def iter_session_chunks(session: dict):
+    for index in range(session["totalChunks"]):
+        async with aiofiles.open(upload_chunk_path(session["id"], index), 'rb') as f:
+            while True:
+                chunk = await f.read(UPLOAD_CHUNK_SIZE)
+                if not chunk:
+                    break
+                yield chunk
+
+@api_router.post("/uploads/{upload_id}/complete")
+async def complete_upload_session(upload_id: str, user: dict = Depends(get_current_user)):
+    session = await get_upload_session(upload_id, user)
+    if session["status"] == UploadSessionStatus.COMPLETED:
+        return {"id": session["projectId"], "message": "Project created successfully"}
+    
+    await check_subscription_status(user)
+    
+    if len(session["receivedChunks"]) != session["totalChunks"]:
+        raise HTTPException(status_code=409, detail="Upload is incomplete")
+    
+    # Claim the session so a duplicate finalize cannot assemble the file twice
+    claimed = await db.upload_sessions.find_one_and_update(
+        {"id": upload_id, "status": UploadSessionStatus.OPEN},
+        {"$set": {"status": UploadSessionStatus.ASSEMBLING}}
+    )
+    if not claimed:
+        raise HTTPException(status_code=409, detail="Upload is already being finalized")
+    
+    project_id = secrets.token_urlsafe(16)
+    try:
+        stored = await store_blob(iter_session_chunks(session), session["totalSize"])
+        if stored["size"] != session["totalSize"]:
+            await release_blob(stored["blobId"])
+            raise HTTPException(status_code=400, detail="Assembled file size does not match the declared size")
+        await insert_project(project_id, session["title"], session["location"], session["drawingType"], session["fileName"], stored, user)
+    except BaseException:
+        await db.upload_sessions.update_one({"id": upload_id}, {"$set": {"status": UploadSessionStatus.OPEN}})
+        raise
+    
+    await db.upload_sessions.update_one(
+        {"id": upload_id},
+        {"$set": {"status": UploadSessionStatus.COMPLETED, "projectId": project_id}}
+    )
+    await asyncio.to_thread(shutil.rmtree, upload_session_dir(upload_id), True)
+    
+    return {"id": project_id, "message": "Project created successfully"}
+
+@api_router.delete("/uploads/{upload_id}")
+async def abort_upload_session(upload_id: str, user: dict = Depends(get_current_user)):
+    await get_upload_session(upload_id, user)
+    await db.upload_sessions.delete_one({"id": upload_id})
+    await asyncio.to_thread(shutil.rmtree, upload_session_dir(upload_id), True)
+    return {"message": "Upload cancelled"}
+
+async def purge_expired_upload_sessions() -> int:
+    purged = 0
+    expired = db.upload_sessions.find({"expiresAt": {"$lte": datetime.now(timezone.utc)}}, {"_id": 0, "id": 1})
+    async for session in expired:
+        await asyncio.to_thread(shutil.rmtree, upload_session_dir(session["id"]), True)
+        await db.upload_sessions.delete_one({"id": session["id"]})
+        purged += 1
+    return purged
+
+async def upload_session_gc_loop():
+    while True:
+        try:
+            purged = await purge_expired_upload_sessions()
+            if purged:
+                logger.info(f"Purged {purged} expired upload sessions")
+        except Exception:
+            logger.exception("Upload session cleanup failed")
+        await asyncio.sleep(UPLOAD_SESSION_GC_INTERVAL_SECONDS)
+
+# Drawing Processing
+# Stage functions run in a process pool, so they must stay module-level and only touch the filesystem
+class InvalidDrawingError(Exception):
+    pass
+
+DWG_VERSIONS = {
+    b"AC1012": "R13", b"AC1014": "R14", b"AC1015": "2000", b"AC1018": "2004",
+    b"AC1021": "2007", b"AC1024": "2010", b"AC1027": "2013", b"AC1032": "2018",
+}
+
+def validate_drawing(project: dict) -> dict:
+    drawing_type = project["drawingType"]
+    with open(project["filePath"], 'rb') as f:
+        header = f.read(8)
+    if drawing_type == DrawingType.PDF and not header.startswith(b"%PDF-"):
+        raise InvalidDrawingError("File is not a valid PDF")
+    if drawing_type == DrawingType.DWG and header[:6] not in DWG_VERSIONS:
+        raise InvalidDrawingError("File is not a supported DWG drawing")
+    return {}
+
+def extract_drawing_metadata(project: dict) -> dict:
+    drawing_type = project["drawingType"]
+    metadata = {"sizeBytes": os.path.getsize(project["filePath"])}
+    with open(project["filePath"], 'rb') as f:
+        header = f.read(16)
+        if drawing_type == DrawingType.DWG:
+            metadata["dwgVersion"] = DWG_VERSIONS.get(header[:6])
+            return {"metadata": metadata}
+        
+        metadata["pdfVersion"] = header[5:8].decode('ascii', 'replace')
+        # Count page objects in overlapping windows so memory stays bounded on large files
+        page_pattern = re.compile(rb"/Type\s*/Page(?![s\w])")
+        pages, tail = 0, b""
+        f.seek(0)
+        while True:
+            block = f.read(UPLOAD_CHUNK_SIZE)
+            if not block:
+                break
+            window = tail + block
+            pages += len(page_pattern.findall(window)) - len(page_pattern.findall(tail))
+            tail = window[-64:]
+        metadata["pageCount"] = pages or None
+    return {"metadata": metadata}
+
+# Longest edge in pixels for each preview size
+PREVIEW_SIZE_PIXELS = {
+    PreviewSize.THUMB.value: 256,
+    PreviewSize.MEDIUM.value: 1024,
+    PreviewSize.LARGE.value: 2048,
+}
+
+def preview_artifact_path(checksum: str, page: int, size: str) -> Path:
+    # Keyed by content hash, so deduplicated drawings share previews and artifacts never go stale
+    return PREVIEW_DIR / checksum[:2] / f"{checksum}-p{page}-{PreviewSize(size).value}.png"
+
+def render_pdf_page(file_path: str, output_path: Path, page: int, size: str) -> bool:
+    if not shutil.which("pdftoppm"):
+        return False
+    output_path.parent.mkdir(parents=True, exist_ok=True)
+    prefix = output_path.parent / f".{output_path.stem}.{secrets.token_hex(4)}"
+    rendered = prefix.with_suffix(".png")
+    try:
+        result = subprocess.run(
+            ["pdftoppm", "-png", "-scale-to", str(PREVIEW_SIZE_PIXELS[PreviewSize(size).value]), "-f", str(page), "-l", str(page), "-singlefile", file_path, str(prefix)],
+            capture_output=True,
+            timeout=PREVIEW_RENDER_TIMEOUT_SECONDS
+        )
+        if result.returncode != 0 or not rendered.exists():
+            return False
+        os.replace(rendered, output_path)
+        return True
+    finally:
+        rendered.unlink(missing_ok=True)
+
+def generate_drawing_preview(project: dict) -> dict:
+    # DWG previews need a CAD renderer that is not available here; those projects complete without one
+    if project["drawingType"] != DrawingType.PDF or not project.get("checksum"):
+        return {}
+    page_count = (project.get("metadata") or {}).get("pageCount") or 1
+    pages = range(1, page_count + 1) if PREVIEW_ALL_PAGES else [1]
+    rendered = False
+    for page in pages:
+        for size in PREVIEW_PRERENDER_SIZES:
+            output_path = preview_artifact_path(project["checksum"], page, size)
+            rendered = output_path.exists() or render_pdf_page(project["filePath"], output_path, page, size) or rendered
+    return {"hasPreview": rendered}
+
+PROCESSING_STAGES = [
+    ("validation", validate_drawing),
+    ("metadata", extract_drawing_metadata),
+    ("preview", generate_drawing_preview),
+]
+
+processing_executor: Optional[ProcessPoolExecutor] = None
+processing_jobs_ready = asyncio.Event()
+running_job_tasks = set()
+
+def replace_processing_executor(broken: Optional[ProcessPoolExecutor]):
+    # Only the first caller to see the broken pool swaps it; later callers already find the new one
+    global processing_executor
+    if processing_executor is not broken:
+        return
+    logger.warning("Processing pool lost a child process; starting a new pool")
+    if broken:
+        broken.shutdown(wait=False, cancel_futures=True)
+    processing_executor = ProcessPoolExecutor(max_workers=PROCESSING_WORKERS)
+
+async def run_in_processing_pool(fn, *args):
+    # A child killed mid-task (OOM killer, a crashing parser) breaks the whole pool for every later submission
+    executor = processing_executor
+    try:
+        return await asyncio.get_running_loop().run_in_executor(executor, fn, *args)
+    except BrokenProcessPool:
+        replace_processing_executor(executor)
+        raise
+
+async def enqueue_processing_job(project: dict):
+    now = datetime.now(timezone.utc)
+    await db.processing_jobs.insert_one({
+        "id": secrets.token_urlsafe(16),
+        "projectId": project["id"],
+        "companyId": project["companyId"],
+        "status": JobStatus.QUEUED,
+        "attempts": 0,
+        "nextAttemptAt": now,
+        "createdAt": now
+    })
+    processing_jobs_ready.set()
+
+def ready_jobs_query(now: datetime) -> dict:
+    return {"$or": [
+        {"status": JobStatus.QUEUED, "nextAttemptAt": {"$lte": now}},
+        {"status": JobStatus.RUNNING, "leaseExpiresAt": {"$lt": now}}
+    ]}
+
+async def claim_next_processing_job() -> Optional[dict]:
+    # Fair share: prefer the companies with the fewest jobs running on any worker, oldest backlog first
+    now = datetime.now(timezone.utc)
+    companies = await db.processing_jobs.aggregate([
+        {"$match": ready_jobs_query(now)},
+        {"$group": {"_id": "$companyId", "oldest": {"$min": "$createdAt"}}},
+        {"$sort": {"oldest": 1}},
+        {"$limit": 100}
+    ]).to_list(100)
+    if not companies:
+        return None
+    
+    # Two workers can pass the cap check at the same moment, so a company may briefly run one job over it
+    running = {
+        entry["_id"]: entry["running"]
+        async for entry in db.processing_jobs.aggregate([
+            {"$match": {
+                "status": JobStatus.RUNNING,
+                "leaseExpiresAt": {"$gte": now},
+                "companyId": {"$in": [company["_id"] for company in companies]}
+            }},
+            {"$group": {"_id": "$companyId", "running": {"$sum": 1}}}
+        ])
+    }
+    companies.sort(key=lambda company: running.get(company["_id"], 0))
+    
+    for company in companies:
+        if running.get(company["_id"], 0) >= PROCESSING_MAX_PER_COMPANY:
+            continue
+        job = await db.processing_jobs.find_one_and_update(
+            {**ready_jobs_query(now), "companyId": company["_id"]},
+            {
+                "$set": {
+                    "status": JobStatus.RUNNING,
+                    "claimedBy": WORKER_ID,
+                    "startedAt": now,
+                    "leaseExpiresAt": now + timedelta(seconds=PROCESSING_LEASE_SECONDS)
+                },
+                "$inc": {"attempts": 1}
+            },
+            sort=[("createdAt", 1)],
+            projection={"_id": 0},
+            return_document=ReturnDocument.AFTER
+        )
+        if job:
+            return job
+    return None
+
+async def update_project_processing(project_id: str, **fields):
+    await db.projects.update_one({"id": project_id}, {"$set": fields})
+
+async def renew_processing_lease(job_id: str):
+    # Stages can run longer than the lease; keep it alive so no other worker reclaims a job still in progress
+    while True:
+        await asyncio.sleep(PROCESSING_HEARTBEAT_SECONDS)
+        try:
+            await db.processing_jobs.update_one(
+                {"id": job_id, "status": JobStatus.RUNNING, "claimedBy": WORKER_ID},
+                {"$set": {"leaseExpiresAt": datetime.now(timezone.utc) + timedelta(seconds=PROCESSING_LEASE_SECONDS)}}
+            )
+        except Exception:
+            logger.exception(f"Could not renew the lease for processing job {job_id}")
+
+async def run_processing_job(job: dict):
+    project_id = job["projectId"]
+    heartbeat = asyncio.create_task(renew_processing_lease(job["id"]))
+    try:
+        project = await db.projects.find_one({"id": project_id}, {"_id": 0, "id": 1, "filePath": 1, "drawingType": 1, "checksum": 1})
+        if not project:
+            await db.processing_jobs.update_one({"id": job["id"]}, {"$set": {"status": JobStatus.FAILED, "error": "Project not found"}})
+            return
+        
+        results = {}
+        for index, (stage, fn) in enumerate(PROCESSING_STAGES):
+            await update_project_processing(
+                project_id,
+                status=ProjectStatus.PROCESSING,
+                processingStage=stage,
+                processingProgress=int(index * 100 / len(PROCESSING_STAGES)),
+                processingError=None
+            )
+            # Later stages see earlier results, e.g. the preview stage reads the page count
+            result = await run_in_processing_pool(fn, project)
+            results.update(result)
+            project.update(result)
+            await db.processing_jobs.update_one({"id": job["id"]}, {"$set": {"stage": stage}})
+        
+        await update_project_processing(project_id, status=ProjectStatus.COMPLETED, processingStage=None, processingProgress=100, **results)
+        await db.processing_jobs.update_one({"id": job["id"]}, {"$set": {"status": JobStatus.SUCCEEDED, "finishedAt": datetime.now(timezone.utc)}})
+    except BrokenProcessPool as exc:
+        # Every job in flight fails when one child dies, so this attempt is not charged; a job that keeps
+        # killing the pool is the likely culprit and fails once it has done so too often
+        crashes = job.get("poolCrashes", 0) + 1
+        logger.warning(f"Processing job {job['id']} for project {project_id} lost its worker process")
+        if crashes < PROCESSING_MAX_POOL_CRASHES:
+            await db.processing_jobs.update_one(
+                {"id": job["id"]},
+                {"$set": {"status": JobStatus.QUEUED, "nextAttemptAt": datetime.now(timezone.utc), "error": "Worker process died"}, "$inc": {"attempts": -1, "poolCrashes": 1}}
+            )
+        else:
+            await db.processing_jobs.update_one({"id": job["id"]}, {"$set": {"status": JobStatus.FAILED, "error": "Worker process died", "finishedAt": datetime.now(timezone.utc)}, "$inc": {"poolCrashes": 1}})
+            await update_project_processing(project_id, status=ProjectStatus.FAILED, processingStage=None, processingError="Worker process died")
+    except Exception as exc:
+        retryable = not isinstance(exc, InvalidDrawingError) and job["attempts"] < PROCESSING_MAX_ATTEMPTS
+        if not isinstance(exc, InvalidDrawingError):
+            logger.exception(f"Processing job {job['id']} for project {project_id} failed")
+        if retryable:
+            next_attempt = datetime.now(timezone.utc) + timedelta(seconds=PROCESSING_RETRY_BASE_SECONDS * 2 ** (job["attempts"] - 1))
+            await db.processing_jobs.update_one({"id": job["id"]}, {"$set": {"status": JobStatus.QUEUED, "nextAttemptAt": next_attempt, "error": str(exc)}})
+            await update_project_processing(project_id, processingError=str(exc))
+        else:
+            await db.processing_jobs.update_one({"id": job["id"]}, {"$set": {"status": JobStatus.FAILED, "error": str(exc), "finishedAt": datetime.now(timezone.utc)}})
+            await update_project_processing(project_id, status=ProjectStatus.FAILED, processingStage=None, processingError=str(exc))
+    finally:
+        heartbeat.cancel()
+        processing_jobs_ready.set()
+
+async def processing_scheduler_loop():
+    while True:
+        try:
+            while len(running_job_tasks) < PROCESSING_CONCURRENCY:
+                job = await claim_next_processing_job()
+                if not job:
+                    break
+                task = asyncio.create_task(run_processing_job(job))
+                running_job_tasks.add(task)
+                task.add_done_callback(running_job_tasks.discard)
+        except Exception:
+            logger.exception("Processing scheduler failed to claim jobs")
+        
+        processing_jobs_ready.clear()
+        try:
+            await asyncio.wait_for(processing_jobs_ready.wait(), timeout=PROCESSING_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
 # Subscription & Payments
 @api_router.post("/subscriptions/create-order")
 async def create_order(order_data: OrderCreate, user: dict = Depends(get_current_user)):
@@ -599,14 +3159,16 @@ async def create_order(order_data: OrderCreate, user: dict = Depends(get_current
     
     # Create Razorpay order
     amount = int(plan["price"] * 100)  # Convert to paise
-    razorpay_order = razorpay_client.order.create({
-        "amount": amount,
-        "currency": plan["currency"],
-        "payment_capture": 1
-    })
+    transaction_id = secrets.token_urlsafe(16)
+    try:
+        razorpay_order = await payment_gateway.create_order(amount, plan["currency"], receipt=transaction_id)
+    except PaymentGatewayUnavailable:
+        raise HTTPException(status_code=503, detail="Payment provider temporarily unavailable", headers={"Retry-After": str(int(PAYMENT_BREAKER_RESET_SECONDS))})
+    except PaymentGatewayError:
+        logger.exception("Razorpay order creation failed")
+        raise HTTPException(status_code=502, detail="Failed to create payment order")
     
     # Create transaction
-    transaction_id = secrets.token_urlsafe(16)
     transaction = {
         "id": transaction_id,
         "companyId": user["companyId"],
@@ -629,22 +3191,20 @@ async def create_order(order_data: OrderCreate, user: dict = Depends(get_current
         "orderId": razorpay_order["id"],
         "amount": amount,
         "currency": plan["currency"],
-        "keyId": os.environ['RAZORPAY_KEY_ID']
+        "keyId": payment_gateway.key_id
     }
 
 @api_router.post("/subscriptions/verify-payment")
-async def verify_payment(payment_data: PaymentVerify, user: dict = Depends(get_current_user)):
+async def verify_payment(payment_data: PaymentVerify, response: Response, user: dict = Depends(get_current_user)):
     if user["role"] != UserRole.CLIENT_ADMIN:
         raise HTTPException(status_code=403, detail="Access denied")
     
     # Verify signature
-    try:
-        razorpay_client.utility.verify_payment_signature({
-            'razorpay_order_id': payment_data.razorpayOrderId,
-            'razorpay_payment_id': payment_data.razorpayPaymentId,
-            'razorpay_signature': payment_data.razorpaySignature
-        })
-    except:
+    if not payment_gateway.verify_payment_signature(
+        payment_data.razorpayOrderId,
+        payment_data.razorpayPaymentId,
+        payment_data.razorpaySignature
+    ):
         raise HTTPException(status_code=400, detail="Payment verification failed")
     
     # Update transaction
@@ -652,37 +3212,354 @@ async def verify_payment(payment_data: PaymentVerify, user: dict = Depends(get_c
     if not transaction:
         raise HTTPException(status_code=404, detail="Transaction not found")
     
-    await db.transactions.update_one(
-        {"id": transaction["id"]},
-        {"$set": {
-            "status": TransactionStatus.PAID,
-            "razorpayPaymentId": payment_data.razorpayPaymentId,
-            "razorpaySignature": payment_data.razorpaySignature
-        }}
-    )
+    await apply_settlements([{
+        "transaction": transaction,
+        "paymentId": payment_data.razorpayPaymentId,
+        "signature": payment_data.razorpaySignature
+    }])
+    # The webhook may already have settled this payment on another worker, leaving this one's cache stale
+    await refresh_subscription_states([transaction["companyId"]])
     
-    # Update company subscription
-    plan_snapshot = transaction["planSnapshot"]
-    await db.companies.update_one(
-        {"id": transaction["companyId"]},
-        {"$set": {
-            "subscriptionStatus": SubscriptionStatus.ACTIVE,
-            "subscriptionTier": plan_snapshot["name"],
-            "maxUsers": plan_snapshot["maxUsers"],
-            "storageLimit": plan_snapshot["storageLimitGB"],
-            "subscriptionExpiryDate": datetime.now(timezone.utc) + timedelta(days=30)
-        }}
-    )
+    # Swap the payer's subscription snapshot for the renewed one straight away
+    if AUTH_MODE == 'stateless':
+        await issue_access_token(response, user)
     
     return {"message": "Payment verified and subscription activated"}
 
 @api_router.get("/transactions")
-async def get_transactions(user: dict = Depends(get_current_user)):
+async def get_transactions(
+    cursor: Optional[str] = None,
+    limit: int = Query(DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    order: SortOrder = SortOrder.DESC,
+    transaction_status: Optional[TransactionStatus] = Query(None, alias="status"),
+    user: dict = Depends(get_current_user)
+):
     if not user.get("companyId"):
         raise HTTPException(status_code=400, detail="User not associated with any company")
     
-    transactions = await db.transactions.find({"companyId": user["companyId"]}, {"_id": 0}).to_list(1000)
-    return transactions
+    query = {"companyId": user["companyId"]}
+    if transaction_status:
+        query["status"] = transaction_status
+    return await paginate(db.transactions, query, "date", cursor, limit, order, {"_id": 0})
+
+@api_router.get("/transactions/export")
+async def export_transactions(
+    export_format: ExportFormat = Query(ExportFormat.NDJSON, alias="format"),
+    batch_size: int = Query(EXPORT_BATCH_SIZE, alias="batchSize", ge=1, le=MAX_EXPORT_BATCH_SIZE),
+    user: dict = Depends(get_current_user)
+):
+    if not user.get("companyId"):
+        raise HTTPException(status_code=400, detail="User not associated with any company")
+    
+    return export_response("transactions", {"companyId": user["companyId"]}, "date", export_format, batch_size)
+
+# Payment Webhooks
+payment_events_ready = asyncio.Event()
+
+def payment_event_fields(event: dict) -> dict:
+    payment = event.get("payload", {}).get("payment", {}).get("entity", {})
+    order = event.get("payload", {}).get("order", {}).get("entity", {})
+    return {
+        "paymentId": payment.get("id"),
+        "orderId": payment.get("order_id") or order.get("id"),
+        "amount": payment.get("amount")
+    }
+
+@api_router.post("/webhooks/razorpay")
+async def razorpay_webhook(request: Request):
+    body = await request.body()
+    signature = request.headers.get("X-Razorpay-Signature", "")
+    if not payment_gateway.verify_webhook_signature(body, signature):
+        raise HTTPException(status_code=400, detail="Invalid webhook signature")
+    
+    try:
+        event = json.loads(body)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid webhook payload")
+    
+    fields = payment_event_fields(event)
+    event_id = request.headers.get("X-Razorpay-Event-Id") or f"{event.get('event')}:{fields['paymentId']}"
+    received_at = datetime.now(timezone.utc)
+    try:
+        await db.payment_events.insert_one({
+            "id": event_id,
+            "eventType": event.get("event"),
+            **fields,
+            "payload": event,
+            "status": PaymentEventStatus.PENDING,
+            "attempts": 0,
+            "receivedAt": received_at,
+            "nextAttemptAt": received_at
+        })
+    except DuplicateKeyError:
+        return {"status": "duplicate"}
+    
+    payment_events_ready.set()
+    return {"status": "accepted"}
+
+def ready_payment_events_query(now: datetime) -> dict:
+    # Events stored before nextAttemptAt existed have no backoff to wait out
+    return {"$or": [
+        {"status": PaymentEventStatus.PENDING, "nextAttemptAt": {"$lte": now}},
+        {"status": PaymentEventStatus.PENDING, "nextAttemptAt": {"$exists": False}},
+        {"status": PaymentEventStatus.PROCESSING, "claimedAt": {"$lt": now - timedelta(seconds=PAYMENT_EVENT_CLAIM_TIMEOUT_SECONDS)}}
+    ]}
+
+async def claim_payment_events() -> List[dict]:
+    now = datetime.now(timezone.utc)
+    candidates = await db.payment_events.find(
+        ready_payment_events_query(now),
+        {"_id": 0, "id": 1, "status": 1}
+    ).sort("receivedAt", 1).limit(PAYMENT_EVENT_BATCH_SIZE).to_list(PAYMENT_EVENT_BATCH_SIZE)
+    if not candidates:
+        return []
+    
+    # Claim with a token so concurrent workers never process the same event
+    claim_token = secrets.token_hex(8)
+    await db.payment_events.update_many(
+        {"id": {"$in": [event["id"] for event in candidates]}, **ready_payment_events_query(now)},
+        {"$set": {"status": PaymentEventStatus.PROCESSING, "claimToken": claim_token, "claimedAt": now}, "$inc": {"attempts": 1}}
+    )
+    return await db.payment_events.find({"claimToken": claim_token}, {"_id": 0, "payload": 0}).to_list(PAYMENT_EVENT_BATCH_SIZE)
+
+async def fetch_payment_status(event: dict) -> Optional[str]:
+    # Webhook bodies are signed, but the payment is confirmed with Razorpay before money is credited.
+    # None means "could not confirm right now" and sends the event back for a retry.
+    try:
+        payment = await payment_gateway.fetch_payment(event["paymentId"])
+    except PaymentGatewayError:
+        logger.warning(f"Could not confirm payment {event['paymentId']}; will retry")
+        return None
+    if payment.get("order_id") not in (None, event.get("orderId")):
+        logger.warning(f"Payment {event['paymentId']} belongs to order {payment.get('order_id')}, not {event.get('orderId')}")
+        return "mismatch"
+    return payment.get("status")
+
+async def process_payment_events(events: List[dict]):
+    order_ids = list({event["orderId"] for event in events if event.get("orderId")})
+    transactions = {
+        transaction["razorpayOrderId"]: transaction
+        async for transaction in db.transactions.find({"razorpayOrderId": {"$in": order_ids}}, {"_id": 0})
+    }
+    
+    to_confirm = [
+        event for event in events
+        if event["eventType"] in ("payment.captured", "order.paid") and event.get("paymentId") and transactions.get(event.get("orderId"))
+    ]
+    payment_statuses = dict(zip(
+        [event["id"] for event in to_confirm],
+        await asyncio.gather(*(fetch_payment_status(event) for event in to_confirm))
+    ))
+    
+    settlements, failed_orders, processed, ignored, retry = [], [], [], [], []
+    for event in events:
+        transaction = transactions.get(event.get("orderId"))
+        if event["id"] in payment_statuses:
+            payment_status = payment_statuses[event["id"]]
+            if payment_status == "captured":
+                settlements.append({"transaction": transaction, "paymentId": event["paymentId"]})
+                processed.append(event["id"])
+            elif payment_status in ("failed", "mismatch"):
+                ignored.append(event["id"])
+            else:
+                # Gateway unreachable, or the payment is still only authorized
+                retry.append(event)
+        elif event["eventType"] == "payment.failed" and transaction:
+            failed_orders.append(transaction["id"])
+            processed.append(event["id"])
+        elif event["eventType"] in ("payment.captured", "order.paid", "payment.failed"):
+            # The order may not be committed yet; retry until attempts run out
+            retry.append(event)
+        else:
+            ignored.append(event["id"])
+    
+    await apply_settlements(settlements)
+    if failed_orders:
+        await db.transactions.update_many(
+            {"id": {"$in": failed_orders}, "status": TransactionStatus.CREATED},
+            {"$set": {"status": TransactionStatus.FAILED}}
+        )
+    
+    now = datetime.now(timezone.utc)
+    if processed:
+        await db.payment_events.update_many({"id": {"$in": processed}}, {"$set": {"status": PaymentEventStatus.PROCESSED, "processedAt": now}})
+    if ignored:
+        await db.payment_events.update_many({"id": {"$in": ignored}}, {"$set": {"status": PaymentEventStatus.IGNORED, "processedAt": now}})
+    exhausted = [event["id"] for event in retry if event["attempts"] >= PAYMENT_EVENT_MAX_ATTEMPTS]
+    if exhausted:
+        await db.payment_events.update_many({"id": {"$in": exhausted}}, {"$set": {"status": PaymentEventStatus.FAILED, "processedAt": now}})
+    pending = [event for event in retry if event["attempts"] < PAYMENT_EVENT_MAX_ATTEMPTS]
+    if pending:
+        await db.payment_events.bulk_write([
+            UpdateOne({"id": event["id"]}, {"$set": {"status": PaymentEventStatus.PENDING, "nextAttemptAt": now + payment_event_backoff(event["attempts"])}})
+            for event in pending
+        ], ordered=False)
+
+def payment_event_backoff(attempts: int) -> timedelta:
+    # Jitter keeps events that failed together during an outage from all retrying in the same instant
+    ceiling = min(PAYMENT_EVENT_RETRY_MAX_SECONDS, PAYMENT_EVENT_RETRY_BASE_SECONDS * 2 ** (attempts - 1))
+    return timedelta(seconds=random.uniform(ceiling / 2, ceiling))
+
+async def payment_event_worker_loop():
+    while True:
+        try:
+            await recover_settlements()
+            events = await claim_payment_events()
+            if events:
+                await process_payment_events(events)
+                continue
+        except Exception:
+            logger.exception("Payment event processing failed")
+        
+        payment_events_ready.clear()
+        try:
+            await asyncio.wait_for(payment_events_ready.wait(), timeout=PAYMENT_EVENT_POLL_SECONDS)
+        except asyncio.TimeoutError:
+            pass
+
+# Role Dashboards
+# One request per dashboard: authenticate once, run every query concurrently and return only what the page renders
+# Lists carry the first page plus a real count; the page follows nextCursor against the matching list route
+DASHBOARD_USER_FIELDS = {"_id": 0, "id": 1, "name": 1, "email": 1, "role": 1, "createdAt": 1}
+DASHBOARD_PROJECT_FIELDS = {"_id": 0, "id": 1, "title": 1, "location": 1, "drawingType": 1, "status": 1, "hasPreview": 1, "createdAt": 1}
+DASHBOARD_TRANSACTION_FIELDS = {"_id": 0, "id": 1, "amount": 1, "currency": 1, "status": 1, "planSnapshot.name": 1, "date": 1}
+DASHBOARD_COMPANY_FIELDS = {"_id": 0, "id": 1, "name": 1, "subscriptionStatus": 1, "subscriptionTier": 1, "maxUsers": 1, "storageLimit": 1, "subscriptionExpiryDate": 1, "createdAt": 1}
+
+def require_role(user: dict, *roles: UserRole):
+    if user["role"] not in roles:
+        raise HTTPException(status_code=403, detail="Access denied")
+    if user["role"] in (UserRole.CLIENT_ADMIN, UserRole.CLIENT_ENGINEER) and not user.get("companyId"):
+        raise HTTPException(status_code=400, detail="User not associated with any company")
+
+async def load_dashboard_company(company_id: str) -> dict:
+    company = await db.companies.find_one({"id": company_id}, DASHBOARD_COMPANY_FIELDS)
+    if not company:
+        raise HTTPException(status_code=404, detail="Company not found")
+    return company
+
+async def count_projects_by_status(company_id: str) -> dict:
+    counts = {status.value: 0 for status in ProjectStatus}
+    async for row in db.projects.aggregate([
+        {"$match": {"companyId": company_id}},
+        {"$group": {"_id": "$status", "count": {"$sum": 1}}}
+    ]):
+        counts[row["_id"]] = row["count"]
+    counts["total"] = sum(counts.values())
+    return counts
+
+@api_router.get("/dashboard/super-admin")
+async def super_admin_dashboard(user: dict = Depends(get_current_user)):
+    require_role(user, UserRole.SUPER_ADMIN)
+    
+    staff_query = {"role": {"$in": [UserRole.SUPER_ADMIN, UserRole.MARKETING]}}
+    stats, plans, staff, staff_count = await asyncio.gather(
+        platform_dashboard_stats(),
+        plan_catalog.get("all", {}),
+        paginate(db.users, staff_query, "createdAt", None, DASHBOARD_LIST_LIMIT, SortOrder.DESC, DASHBOARD_USER_FIELDS),
+        db.users.count_documents(staff_query)
+    )
+    return {"stats": stats, "plans": plans["plans"], "users": staff, "userCount": staff_count}
+
+@api_router.get("/dashboard/marketing")
+async def marketing_dashboard(user: dict = Depends(get_current_user)):
+    require_role(user, UserRole.SUPER_ADMIN, UserRole.MARKETING)
+    
+    companies, company_count, plans = await asyncio.gather(
+        paginate(db.companies, {}, "createdAt", None, DASHBOARD_LIST_LIMIT, SortOrder.DESC, DASHBOARD_COMPANY_FIELDS),
+        db.companies.estimated_document_count(),
+        plan_catalog.get("active", {"isActive": True})
+    )
+    return {"companies": companies, "companyCount": company_count, "plans": plans["plans"]}
+
+@api_router.get("/dashboard/client-admin")
+async def client_admin_dashboard(user: dict = Depends(get_current_user)):
+    require_role(user, UserRole.CLIENT_ADMIN)
+    
+    company_id = user["companyId"]
+    company, users, user_count, projects, project_counts, transactions, transaction_count, plans = await asyncio.gather(
+        load_dashboard_company(company_id),
+        paginate(db.users, {"companyId": company_id}, "createdAt", None, DASHBOARD_LIST_LIMIT, SortOrder.DESC, DASHBOARD_USER_FIELDS),
+        db.users.count_documents({"companyId": company_id}),
+        paginate(db.projects, {"companyId": company_id}, "createdAt", None, DASHBOARD_LIST_LIMIT, SortOrder.DESC, DASHBOARD_PROJECT_FIELDS),
+        count_projects_by_status(company_id),
+        paginate(db.transactions, {"companyId": company_id}, "date", None, DASHBOARD_LIST_LIMIT, SortOrder.DESC, DASHBOARD_TRANSACTION_FIELDS),
+        db.transactions.count_documents({"companyId": company_id}),
+        plan_catalog.get("active", {"isActive": True})
+    )
+    return {
+        "company": company,
+        "users": users,
+        "userCount": user_count,
+        "projects": projects,
+        "projectCounts": project_counts,
+        "transactions": transactions,
+        "transactionCount": transaction_count,
+        "plans": plans["plans"]
+    }
+
+@api_router.get("/dashboard/client-engineer")
+async def client_engineer_dashboard(user: dict = Depends(get_current_user)):
+    require_role(user, UserRole.CLIENT_ENGINEER, UserRole.CLIENT_ADMIN)
+    
+    company_id = user["companyId"]
+    company, projects, project_counts = await asyncio.gather(
+        load_dashboard_company(company_id),
+        paginate(db.projects, {"companyId": company_id}, "createdAt", None, DASHBOARD_LIST_LIMIT, SortOrder.DESC, DASHBOARD_PROJECT_FIELDS),
+        count_projects_by_status(company_id)
+    )
+    return {"company": company, "projects": projects, "projectCounts": project_counts}
+
+# Metrics Middleware
+class MetricsMiddleware:
+    # Plain ASGI middleware: no request/response object wrapping, just a counting send()
+    def __init__(self, app):
+        self.app = app
+    
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        
+        tally = {"mongoCommands": 0, "mongoSeconds": 0.0, "status": 500, "responseBytes": 0}
+        token = request_metrics.set(tally)
+        
+        async def counting_send(message):
+            if message["type"] == "http.response.start":
+                tally["status"] = message["status"]
+            elif message["type"] == "http.response.body":
+                tally["responseBytes"] += len(message.get("body", b""))
+            elif message["type"] == "http.response.zerocopysend":
+                tally["responseBytes"] += message.get("count") or 0
+            await send(message)
+        
+        method = scope["method"]
+        metrics.inc("http_requests_in_flight", (("method", method),))
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, counting_send)
+        finally:
+            elapsed = time.perf_counter() - started
+            request_metrics.reset(token)
+            metrics.inc("http_requests_in_flight", (("method", method),), -1)
+            
+            route = scope.get("route")
+            labels = (("method", method), ("route", route.path if route else "unmatched"))
+            request_bytes = next((int(value) for key, value in scope["headers"] if key == b"content-length" and value.isdigit()), 0)
+            metrics.inc("http_requests_total", labels + (("status", tally["status"]),))
+            metrics.observe("http_request_duration_seconds", labels, elapsed)
+            metrics.inc("http_request_bytes_total", labels, request_bytes)
+            metrics.inc("http_response_bytes_total", labels, tally["responseBytes"])
+            metrics.inc("http_request_mongo_commands_total", labels, tally["mongoCommands"])
+            metrics.inc("http_request_mongo_seconds_total", labels, tally["mongoSeconds"])
+
+@api_router.get("/metrics")
+async def get_metrics(request: Request):
+    if not METRICS_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not hmac.compare_digest(request.headers.get("authorization", ""), f"Bearer {METRICS_TOKEN}"):
+        raise HTTPException(status_code=401, detail="Not authenticated")
+    
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4")
 
 # Include router
 app.include_router(api_router)
@@ -695,12 +3572,47 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 logging.basicConfig(
     level=logging.INFO,
     format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
 )
 logger = logging.getLogger(__name__)
 
+background_tasks: List[asyncio.Task] = []
+
+@app.on_event("startup")
+async def prepare_storage():
+    for directory in (UPLOAD_DIR, UPLOAD_TMP_DIR, BLOB_DIR, DERIVED_DIR, PREVIEW_DIR):
+        directory.mkdir(exist_ok=True, parents=True)
+
+@app.on_event("startup")
+async def bootstrap_indexes():
+    await ensure_indexes(create_missing=AUTO_CREATE_INDEXES)
+
+@app.on_event("startup")
+async def start_background_tasks():
+    global processing_executor
+    processing_executor = ProcessPoolExecutor(max_workers=PROCESSING_WORKERS)
+    background_tasks.append(asyncio.create_task(upload_session_gc_loop()))
+    background_tasks.append(asyncio.create_task(blob_gc_loop()))
+    background_tasks.append(asyncio.create_task(preview_store_gc_loop()))
+    background_tasks.append(asyncio.create_task(processing_scheduler_loop()))
+    background_tasks.append(asyncio.create_task(payment_event_worker_loop()))
+    if STATS_RECONCILE_INTERVAL_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(stats_reconcile_loop()))
+    if SUBSCRIPTION_SWEEP_INTERVAL_SECONDS > 0:
+        background_tasks.append(asyncio.create_task(subscription_lifecycle_loop()))
+    background_tasks.append(asyncio.create_task(revocation_sync_loop()))
+
 @app.on_event("shutdown")
 async def shutdown_db_client():
-    client.close()
\ No newline at end of file
+    for task in background_tasks:
+        task.cancel()
+    password_hasher.shutdown()
+    if processing_executor:
+        processing_executor.shutdown(wait=False, cancel_futures=True)
+    await payment_gateway.close()
+    client.close()
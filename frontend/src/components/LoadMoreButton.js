@@ -0,0 +1,27 @@
+import React from 'react';
+import { Button } from './ui/button';
+
+const LoadMoreButton = ({
+  list,
+  label = 'Load more',
+  testId,
+  className = 'border-slate-700 text-slate-300 hover:bg-slate-700/50',
+}) => {
+  if (!list.hasMore) return null;
+
+  return (
+    <div className="flex justify-center mt-4">
+      <Button
+        variant="outline"
+        onClick={list.loadMore}
+        disabled={list.loadingMore}
+        data-testid={testId}
+        className={className}
+      >
+        {list.loadingMore ? 'Loading...' : label}
+      </Button>
+    </div>
+  );
+};
+
+export default LoadMoreButton;
@@ -20,7 +20,12 @@ export const AuthProvider = ({ children }) => {
       });
       setUser(response.data);
     } catch (error) {
-      setUser(null);
+      try {
+        const refreshed = await axios.post(`${API}/auth/refresh`, {}, { withCredentials: true });
+        setUser(refreshed.data.user);
+      } catch (refreshError) {
+        setUser(null);
+      }
     } finally {
       setLoading(false);
     }
@@ -23,6 +23,8 @@ import {
 } from '../components/ui/table';
 import { toast } from 'sonner';
 import api from '../utils/axios';
+import { usePaginatedList } from '../utils/pagination';
+import LoadMoreButton from '../components/LoadMoreButton';
 import { useAuth } from '../context/AuthContext';
 import { Users, FolderOpen, CreditCard, Plus, Check, Calendar, FileText } from 'lucide-react';
 import { format } from 'date-fns';
@@ -31,9 +33,12 @@ import { motion } from 'framer-motion';
 const ClientAdminDashboard = () => {
   const { user } = useAuth();
   const [company, setCompany] = useState(null);
-  const [users, setUsers] = useState([]);
-  const [projects, setProjects] = useState([]);
-  const [transactions, setTransactions] = useState([]);
+  const users = usePaginatedList(`/companies/${user?.companyId}/users`);
+  const [userCount, setUserCount] = useState(0);
+  const projects = usePaginatedList('/projects');
+  const [projectCount, setProjectCount] = useState(0);
+  const transactions = usePaginatedList('/transactions');
+  const [transactionCount, setTransactionCount] = useState(0);
   const [plans, setPlans] = useState([]);
   const [loading, setLoading] = useState(true);
   const [showUserDialog, setShowUserDialog] = useState(false);
@@ -61,18 +66,15 @@ const ClientAdminDashboard = () => {
     if (!user?.companyId) return;
 
     try {
-      const [companyRes, usersRes, projectsRes, transactionsRes, plansRes] = await Promise.all([
-        api.get(`/companies/${user.companyId}`),
-        api.get(`/companies/${user.companyId}/users`),
-        api.get('/projects'),
-        api.get('/transactions'),
-        api.get('/plans'),
-      ]);
-      setCompany(companyRes.data);
-      setUsers(usersRes.data);
-      setProjects(projectsRes.data);
-      setTransactions(transactionsRes.data);
-      setPlans(plansRes.data);
+      const { data } = await api.get('/dashboard/client-admin');
+      setCompany(data.company);
+      users.reset(data.users);
+      setUserCount(data.userCount);
+      projects.reset(data.projects);
+      setProjectCount(data.projectCounts.total);
+      transactions.reset(data.transactions);
+      setTransactionCount(data.transactionCount);
+      setPlans(data.plans);
     } catch (error) {
       toast.error('Failed to load dashboard data');
     } finally {
@@ -83,7 +85,7 @@ const ClientAdminDashboard = () => {
   const handleAddUser = async (e) => {
     e.preventDefault();
 
-    if (users.length >= company.maxUsers) {
+    if (userCount >= company.maxUsers) {
       toast.error('User limit reached. Please upgrade your plan.');
       return;
     }
@@ -159,7 +161,7 @@ const ClientAdminDashboard = () => {
   }
 
   const isSubscriptionExpired = company?.subscriptionStatus === 'Expired';
-  const canAddUsers = users.length < company?.maxUsers;
+  const canAddUsers = userCount < company?.maxUsers;
 
   return (
     <DashboardLayout title="Admin Dashboard">
@@ -186,13 +188,13 @@ const ClientAdminDashboard = () => {
           <StatCard
             icon={Users}
             label="Team Members"
-            value={`${users.length}/${company?.maxUsers || 0}`}
+            value={`${userCount}/${company?.maxUsers || 0}`}
             color="blue"
           />
           <StatCard
             icon={FolderOpen}
             label="Total Projects"
-            value={projects.length}
+            value={projectCount}
             color="emerald"
           />
           <StatCard
@@ -242,7 +244,7 @@ const ClientAdminDashboard = () => {
                 <div>
                   <h3 className="text-xl font-bold text-white font-mono tracking-wide uppercase">Team Members</h3>
                   <p className="text-sm text-slate-400 mt-1">
-                    {users.length} of {company?.maxUsers} seats used
+                    {userCount} of {company?.maxUsers} seats used
                   </p>
                 </div>
                 <Dialog open={showUserDialog} onOpenChange={setShowUserDialog}>
@@ -320,7 +322,7 @@ const ClientAdminDashboard = () => {
                   </TableRow>
                 </TableHeader>
                 <TableBody>
-                  {users.map((member) => (
+                  {users.items.map((member) => (
                     <TableRow key={member.id} className="border-slate-700 hover:bg-slate-700/30">
                       <TableCell className="text-white font-medium">{member.name}</TableCell>
                       <TableCell className="text-white font-mono text-sm">{member.email}</TableCell>
@@ -333,6 +335,7 @@ const ClientAdminDashboard = () => {
                   ))}
                 </TableBody>
               </Table>
+              <LoadMoreButton list={users} testId="load-more-users" />
             </div>
           </TabsContent>
 
@@ -425,8 +428,11 @@ const ClientAdminDashboard = () => {
           {/* Projects */}
           <TabsContent value="projects">
             <div className="bg-slate-800/50 backdrop-blur-md border border-slate-700 rounded-sm p-6">
-              <h3 className="text-xl font-bold text-white font-mono tracking-wide uppercase mb-6">Company Projects</h3>
-              {projects.length === 0 ? (
+              <div className="mb-6">
+                <h3 className="text-xl font-bold text-white font-mono tracking-wide uppercase">Company Projects</h3>
+                <p className="text-sm text-slate-400 mt-1">{projectCount} projects</p>
+              </div>
+              {projects.items.length === 0 ? (
                 <div className="text-center py-12">
                   <FolderOpen className="w-16 h-16 text-slate-600 mx-auto mb-4" />
                   <p className="text-slate-400">No projects yet</p>
@@ -443,7 +449,7 @@ const ClientAdminDashboard = () => {
                     </TableRow>
                   </TableHeader>
                   <TableBody>
-                    {projects.map((project) => (
+                    {projects.items.map((project) => (
                       <TableRow key={project.id} className="border-slate-700 hover:bg-slate-700/30">
                         <TableCell className="text-white font-medium">{project.title}</TableCell>
                         <TableCell className="text-white">{project.location}</TableCell>
@@ -473,14 +479,18 @@ const ClientAdminDashboard = () => {
                   </TableBody>
                 </Table>
               )}
+              <LoadMoreButton list={projects} testId="load-more-projects" />
             </div>
           </TabsContent>
 
           {/* Billing */}
           <TabsContent value="billing">
             <div className="bg-slate-800/50 backdrop-blur-md border border-slate-700 rounded-sm p-6">
-              <h3 className="text-xl font-bold text-white font-mono tracking-wide uppercase mb-6">Invoice History</h3>
-              {transactions.length === 0 ? (
+              <div className="mb-6">
+                <h3 className="text-xl font-bold text-white font-mono tracking-wide uppercase">Invoice History</h3>
+                <p className="text-sm text-slate-400 mt-1">{transactionCount} transactions</p>
+              </div>
+              {transactions.items.length === 0 ? (
                 <div className="text-center py-12">
                   <FileText className="w-16 h-16 text-slate-600 mx-auto mb-4" />
                   <p className="text-slate-400">No transactions yet</p>
@@ -496,7 +506,7 @@ const ClientAdminDashboard = () => {
                     </TableRow>
                   </TableHeader>
                   <TableBody>
-                    {transactions.map((txn) => (
+                    {transactions.items.map((txn) => (
                       <TableRow key={txn.id} className="border-slate-700 hover:bg-slate-700/30">
                         <TableCell className="text-white font-mono text-sm">
                           {format(new Date(txn.date), 'MMM dd, yyyy')}
@@ -523,6 +533,7 @@ const ClientAdminDashboard = () => {
                   </TableBody>
                 </Table>
               )}
+              <LoadMoreButton list={transactions} testId="load-more-transactions" />
             </div>
           </TabsContent>
         </Tabs>
@@ -22,6 +22,9 @@ import {
 } from '../components/ui/table';
 import { toast } from 'sonner';
 import api from '../utils/axios';
+import { uploadDrawing } from '../utils/chunkedUpload';
+import { usePaginatedList } from '../utils/pagination';
+import LoadMoreButton from '../components/LoadMoreButton';
 import { useAuth } from '../context/AuthContext';
 import { FolderOpen, Plus, Upload, Calendar, MapPin, FileText } from 'lucide-react';
 import { format } from 'date-fns';
@@ -31,10 +34,12 @@ import { useDropzone } from 'react-dropzone';
 const ClientEngineerDashboard = () => {
   const { user } = useAuth();
   const [company, setCompany] = useState(null);
-  const [projects, setProjects] = useState([]);
+  const projects = usePaginatedList('/projects');
+  const [projectCounts, setProjectCounts] = useState({});
   const [loading, setLoading] = useState(true);
   const [showDialog, setShowDialog] = useState(false);
   const [uploading, setUploading] = useState(false);
+  const [uploadProgress, setUploadProgress] = useState(0);
 
   const [projectForm, setProjectForm] = useState({
     title: '',
@@ -51,12 +56,10 @@ const ClientEngineerDashboard = () => {
     if (!user?.companyId) return;
 
     try {
-      const [companyRes, projectsRes] = await Promise.all([
-        api.get(`/companies/${user.companyId}`),
-        api.get('/projects'),
-      ]);
-      setCompany(companyRes.data);
-      setProjects(projectsRes.data);
+      const { data } = await api.get('/dashboard/client-engineer');
+      setCompany(data.company);
+      projects.reset(data.projects);
+      setProjectCounts(data.projectCounts);
     } catch (error) {
       toast.error('Failed to load data');
     } finally {
@@ -103,18 +106,18 @@ const ClientEngineerDashboard = () => {
     }
 
     setUploading(true);
-    const formData = new FormData();
-    formData.append('file', projectForm.file);
-    formData.append('title', projectForm.title);
-    formData.append('location', projectForm.location);
-    formData.append('drawingType', projectForm.drawingType);
+    setUploadProgress(0);
 
     try {
-      await api.post('/projects', formData, {
-        headers: {
-          'Content-Type': 'multipart/form-data',
+      await uploadDrawing(
+        projectForm.file,
+        {
+          title: projectForm.title,
+          location: projectForm.location,
+          drawingType: projectForm.drawingType,
         },
-      });
+        setUploadProgress
+      );
       toast.success('Project created successfully');
       setShowDialog(false);
       setProjectForm({ title: '', location: '', drawingType: 'PDF', file: null });
@@ -194,19 +197,19 @@ const ClientEngineerDashboard = () => {
           <StatCard
             icon={FolderOpen}
             label="Total Projects"
-            value={projects.length}
+            value={projectCounts.total || 0}
             color="blue"
           />
           <StatCard
             icon={Upload}
             label="Uploaded"
-            value={projects.filter(p => p.status === 'Uploaded').length}
+            value={projectCounts.Uploaded || 0}
             color="emerald"
           />
           <StatCard
             icon={FileText}
             label="Completed"
-            value={projects.filter(p => p.status === 'Completed').length}
+            value={projectCounts.Completed || 0}
             color="amber"
           />
         </div>
@@ -297,14 +300,14 @@ const ClientEngineerDashboard = () => {
                     data-testid="project-submit-button"
                     className="w-full bg-blue-600 hover:bg-blue-700 text-white"
                   >
-                    {uploading ? 'Uploading...' : 'Create Project'}
+                    {uploading ? `Uploading... ${Math.round(uploadProgress * 100)}%` : 'Create Project'}
                   </Button>
                 </form>
               </DialogContent>
             </Dialog>
           </div>
 
-          {projects.length === 0 ? (
+          {projects.items.length === 0 ? (
             <div className="text-center py-16">
               <FolderOpen className="w-20 h-20 text-slate-600 mx-auto mb-4" />
               <p className="text-slate-400 text-lg mb-2">No projects yet</p>
@@ -312,13 +315,21 @@ const ClientEngineerDashboard = () => {
             </div>
           ) : (
             <div className="grid grid-cols-1 gap-4">
-              {projects.map((project) => (
+              {projects.items.map((project) => (
                 <motion.div
                   key={project.id}
                   whileHover={{ scale: 1.01 }}
                   className="bg-slate-900/50 border border-slate-700 rounded-sm p-6 hover:border-blue-600/50 transition-all"
                 >
                   <div className="flex items-start justify-between">
+                    {project.hasPreview && (
+                      <img
+                        src={`${process.env.REACT_APP_BACKEND_URL}/api/projects/${project.id}/preview?size=thumb`}
+                        alt={`${project.title} preview`}
+                        loading="lazy"
+                        className="w-20 h-20 object-contain bg-white rounded-sm mr-4"
+                      />
+                    )}
                     <div className="flex-1">
                       <h4 className="text-lg font-bold text-white mb-2">{project.title}</h4>
                       <div className="flex flex-wrap items-center gap-4 text-sm text-slate-400">
@@ -352,6 +363,7 @@ const ClientEngineerDashboard = () => {
               ))}
             </div>
           )}
+          <LoadMoreButton list={projects} testId="load-more-projects" />
         </div>
       </div>
     </DashboardLayout>
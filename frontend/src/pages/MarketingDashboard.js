@@ -22,11 +22,14 @@ import {
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '../components/ui/select';
 import { toast } from 'sonner';
 import api from '../utils/axios';
+import { usePaginatedList } from '../utils/pagination';
+import LoadMoreButton from '../components/LoadMoreButton';
 import { Building2, Plus, Calendar } from 'lucide-react';
 import { format } from 'date-fns';
 
 const MarketingDashboard = () => {
-  const [companies, setCompanies] = useState([]);
+  const companies = usePaginatedList('/marketing/companies');
+  const [companyCount, setCompanyCount] = useState(0);
   const [plans, setPlans] = useState([]);
   const [loading, setLoading] = useState(true);
   const [showDialog, setShowDialog] = useState(false);
@@ -45,12 +48,10 @@ const MarketingDashboard = () => {
 
   const fetchData = async () => {
     try {
-      const [companiesRes, plansRes] = await Promise.all([
-        api.get('/marketing/companies'),
-        api.get('/plans'),
-      ]);
-      setCompanies(companiesRes.data);
-      setPlans(plansRes.data);
+      const { data } = await api.get('/dashboard/marketing');
+      companies.reset(data.companies);
+      setCompanyCount(data.companyCount);
+      setPlans(data.plans);
     } catch (error) {
       toast.error('Failed to load data');
     } finally {
@@ -91,7 +92,7 @@ const MarketingDashboard = () => {
         <div className="flex items-center justify-between mb-6">
           <div>
             <h3 className="text-xl font-bold text-white font-mono tracking-wide uppercase">Companies</h3>
-            <p className="text-sm text-slate-400 mt-1">Manage client onboarding and subscriptions</p>
+            <p className="text-sm text-slate-400 mt-1">{companyCount} companies · Manage client onboarding and subscriptions</p>
           </div>
           <Dialog open={showDialog} onOpenChange={setShowDialog}>
             <DialogTrigger asChild>
@@ -202,7 +203,7 @@ const MarketingDashboard = () => {
               </TableRow>
             </TableHeader>
             <TableBody>
-              {companies.map((company) => (
+              {companies.items.map((company) => (
                 <TableRow key={company.id} className="border-slate-700 hover:bg-slate-700/30">
                   <TableCell className="text-white font-medium">
                     <div className="flex items-center gap-2">
@@ -242,6 +243,7 @@ const MarketingDashboard = () => {
             </TableBody>
           </Table>
         </div>
+        <LoadMoreButton list={companies} testId="load-more-companies" />
       </div>
     </DashboardLayout>
   );
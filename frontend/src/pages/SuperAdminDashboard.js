@@ -23,13 +23,16 @@ import {
 } from '../components/ui/table';
 import { toast } from 'sonner';
 import api from '../utils/axios';
+import { usePaginatedList } from '../utils/pagination';
+import LoadMoreButton from '../components/LoadMoreButton';
 import { Building2, DollarSign, Users, TrendingUp, Plus, Edit, Trash2 } from 'lucide-react';
 import { motion } from 'framer-motion';
 
 const SuperAdminDashboard = () => {
   const [stats, setStats] = useState(null);
   const [plans, setPlans] = useState([]);
-  const [users, setUsers] = useState([]);
+  const users = usePaginatedList('/admin/users', { role: ['SuperAdmin', 'Marketing'] });
+  const [userCount, setUserCount] = useState(0);
   const [loading, setLoading] = useState(true);
   const [showPlanDialog, setShowPlanDialog] = useState(false);
   const [showUserDialog, setShowUserDialog] = useState(false);
@@ -55,14 +58,11 @@ const SuperAdminDashboard = () => {
 
   const fetchData = async () => {
     try {
-      const [statsRes, plansRes, usersRes] = await Promise.all([
-        api.get('/admin/dashboard'),
-        api.get('/admin/plans'),
-        api.get('/admin/users'),
-      ]);
-      setStats(statsRes.data);
-      setPlans(plansRes.data);
-      setUsers(usersRes.data.filter(u => u.role === 'Marketing' || u.role === 'SuperAdmin'));
+      const { data } = await api.get('/dashboard/super-admin');
+      setStats(data.stats);
+      setPlans(data.plans);
+      users.reset(data.users);
+      setUserCount(data.userCount);
     } catch (error) {
       toast.error('Failed to load dashboard data');
     } finally {
@@ -167,7 +167,7 @@ const SuperAdminDashboard = () => {
         <StatCard
           icon={Users}
           label="Marketing Team"
-          value={users.length}
+          value={userCount}
           color="rose"
         />
       </div>
@@ -409,7 +409,7 @@ const SuperAdminDashboard = () => {
               </TableRow>
             </TableHeader>
             <TableBody>
-              {users.map((user) => (
+              {users.items.map((user) => (
                 <TableRow key={user.id} className="border-gray-200 hover:bg-gray-50">
                   <TableCell className="text-gray-900 font-medium">{user.name}</TableCell>
                   <TableCell className="text-gray-900 font-mono text-sm">{user.email}</TableCell>
@@ -434,6 +434,11 @@ const SuperAdminDashboard = () => {
             </TableBody>
           </Table>
         </div>
+        <LoadMoreButton
+          list={users}
+          testId="load-more-users"
+          className="border-gray-300 text-gray-700 hover:bg-gray-100"
+        />
       </GlassCard>
     </DashboardLayout>
   );
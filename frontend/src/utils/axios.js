@@ -6,11 +6,36 @@ const api = axios.create({
   headers: {
     'Content-Type': 'application/json',
   },
+  // Repeat the key for list params (role=a&role=b), which is what FastAPI parses; axios defaults to role[]=a
+  paramsSerializer: { indexes: null },
 });
 
+// Short-lived access tokens are renewed once per burst of 401s, then the failed request is replayed
+let refreshing = null;
+
+const refreshSession = () => {
+  if (!refreshing) {
+    refreshing = api.post('/auth/refresh').finally(() => {
+      refreshing = null;
+    });
+  }
+  return refreshing;
+};
+
 api.interceptors.response.use(
   (response) => response,
-  (error) => {
+  async (error) => {
+    const request = error.config;
+    if (error.response?.status === 401 && request && !request._retried && !request.url.startsWith('/auth/')) {
+      request._retried = true;
+      try {
+        await refreshSession();
+        return api(request);
+      } catch (refreshError) {
+        window.location.href = '/login';
+        return Promise.reject(error);
+      }
+    }
     if (error.response?.status === 401) {
       window.location.href = '/login';
     }
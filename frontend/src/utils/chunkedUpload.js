@@ -0,0 +1,75 @@
+import api from './axios';
+
+const MAX_PARALLEL_CHUNKS = 4;
+const MAX_CHUNK_ATTEMPTS = 3;
+// crypto.subtle has no streaming digest, so hashing reads the whole file into memory
+const MAX_HASHED_SIZE = 256 * 1024 * 1024;
+
+const wait = (ms) => new Promise((resolve) => setTimeout(resolve, ms));
+
+const putChunk = async (session, file, index) => {
+  const start = index * session.chunkSize;
+  const blob = file.slice(start, Math.min(start + session.chunkSize, file.size));
+
+  for (let attempt = 1; ; attempt += 1) {
+    try {
+      await api.put(`/uploads/${session.uploadId}/chunks/${index}`, blob, {
+        headers: { 'Content-Type': 'application/octet-stream' },
+      });
+      return;
+    } catch (error) {
+      const status = error.response?.status;
+      if (attempt >= MAX_CHUNK_ATTEMPTS || (status && status < 500)) {
+        throw error;
+      }
+      await wait(500 * 2 ** attempt);
+    }
+  }
+};
+
+// Lets the server skip the transfer when the company already holds the same file. Files too large to
+// hash in memory, and pages without crypto.subtle (plain http), are uploaded without a hash.
+const hashFile = async (file) => {
+  if (!window.crypto?.subtle || file.size > MAX_HASHED_SIZE) {
+    return undefined;
+  }
+  try {
+    const digest = await window.crypto.subtle.digest('SHA-256', await file.arrayBuffer());
+    return Array.from(new Uint8Array(digest), (byte) => byte.toString(16).padStart(2, '0')).join('');
+  } catch {
+    return undefined;
+  }
+};
+
+export const uploadDrawing = async (file, metadata, onProgress) => {
+  const { data: session } = await api.post('/uploads', {
+    ...metadata,
+    fileName: file.name,
+    totalSize: file.size,
+    sha256: await hashFile(file),
+  });
+
+  if (session.status === 'Completed') {
+    onProgress?.(1);
+    return { id: session.projectId, message: 'Project created successfully' };
+  }
+
+  const pending = [...session.missingChunks];
+  let completed = session.totalChunks - pending.length;
+
+  const worker = async () => {
+    while (pending.length) {
+      const index = pending.shift();
+      await putChunk(session, file, index);
+      completed += 1;
+      onProgress?.(completed / session.totalChunks);
+    }
+  };
+
+  await Promise.all(
+    Array.from({ length: Math.min(MAX_PARALLEL_CHUNKS, pending.length) }, worker)
+  );
+
+  const { data } = await api.post(`/uploads/${session.uploadId}/complete`);
+  return data;
+};
@@ -0,0 +1,29 @@
+import { useState } from 'react';
+import api from './axios';
+
+// Holds one cursor-paginated list: seed it with the first page, then append pages by following nextCursor
+export const usePaginatedList = (path, params = {}) => {
+  const [items, setItems] = useState([]);
+  const [nextCursor, setNextCursor] = useState(null);
+  const [loadingMore, setLoadingMore] = useState(false);
+
+  const reset = (page) => {
+    setItems(page.items);
+    setNextCursor(page.nextCursor);
+  };
+
+  const loadMore = async () => {
+    if (!nextCursor || loadingMore) return;
+
+    setLoadingMore(true);
+    try {
+      const { data } = await api.get(path, { params: { ...params, cursor: nextCursor } });
+      setItems((current) => [...current, ...data.items]);
+      setNextCursor(data.nextCursor);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
+  return { items, reset, loadMore, loadingMore, hasMore: Boolean(nextCursor) };
+};
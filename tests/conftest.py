@@ -0,0 +1,34 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# server.py reads its configuration at import time; point it at throwaway settings before the first import
+os.environ.setdefault('MONGO_URL', 'mongodb://localhost:27017')
+os.environ.setdefault('DB_NAME', 'aibuildx_test')
+os.environ.setdefault('JWT_SECRET', 'test-secret')
+os.environ.setdefault('PAYMENT_GATEWAY', 'fake')
+os.environ.setdefault('METRICS_TOKEN', 'test-metrics-token')
+os.environ.setdefault('UPLOAD_DIR', tempfile.mkdtemp(prefix='aibuildx-test-'))
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / 'backend'))
+
+import server  # noqa: E402
+from mongomock_motor import AsyncMongoMockClient  # noqa: E402
+
+server.client = AsyncMongoMockClient()
+server.db = server.client[os.environ['DB_NAME']]
+
+@pytest.fixture
+def anyio_backend():
+    return 'asyncio'
+
+@pytest.fixture
+async def db():
+    for name in await server.db.list_collection_names():
+        await server.db.drop_collection(name)
+    for cache in server.caches.values():
+        if hasattr(cache, "clear"):
+            cache.clear()
+    yield server.db
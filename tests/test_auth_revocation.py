@@ -0,0 +1,104 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException, Response
+from starlette.requests import Request
+
+import server
+from server import RevocationSet, create_access_token, create_refresh_token, get_current_user, logout, refresh_session
+
+pytestmark = pytest.mark.anyio
+
+USER = {"id": "user-1", "email": "jane@example.com", "role": server.UserRole.CLIENT_ENGINEER, "name": "Jane", "companyId": "company-1"}
+
+@pytest.fixture
+def revocations(db, monkeypatch):
+    revocations = RevocationSet()
+    monkeypatch.setattr(server, "revocations", revocations)
+    return revocations
+
+def request_with(**cookies) -> Request:
+    cookie = "; ".join(f"{name}={value}" for name, value in cookies.items())
+    return Request({"type": "http", "method": "GET", "headers": [(b"cookie", cookie.encode())] if cookie else []})
+
+async def assert_rejected(token: str, detail: str):
+    with pytest.raises(HTTPException) as rejected:
+        await get_current_user(request_with(token=token))
+    assert rejected.value.status_code == 401
+    assert rejected.value.detail == detail
+
+async def test_access_token_is_trusted_without_a_database_read(revocations):
+    # The user is not in the database; the claims alone identify them
+    user = await get_current_user(request_with(token=create_access_token(USER, None)))
+    
+    assert user == {key: USER[key] for key in ("id", "email", "role", "name", "companyId")}
+
+async def test_refresh_token_is_not_an_access_token(revocations):
+    await assert_rejected(create_refresh_token(USER["id"]), "Invalid token")
+
+async def test_user_revocation_only_rejects_tokens_issued_before_it(revocations):
+    before = create_access_token(USER, None)
+    await revocations.revoke(f"user:{USER['id']}")
+    after = create_access_token(USER, None)
+    
+    await assert_rejected(before, "Token revoked")
+    assert (await get_current_user(request_with(token=after)))["id"] == USER["id"]
+
+async def test_logout_revokes_only_the_presented_tokens(db, revocations):
+    await db.users.insert_one(dict(USER))
+    access, other_session = create_access_token(USER, None), create_access_token(USER, None)
+    refresh = create_refresh_token(USER["id"])
+    
+    await logout(request_with(token=access, refresh_token=refresh), Response())
+    
+    await assert_rejected(access, "Token revoked")
+    with pytest.raises(HTTPException) as refused:
+        await refresh_session(request_with(refresh_token=refresh), Response())
+    assert refused.value.status_code == 401
+    # Another device's session is untouched
+    assert (await get_current_user(request_with(token=other_session)))["id"] == USER["id"]
+    
+    # Revocations written on one worker reach the others on their next sync
+    elsewhere = RevocationSet()
+    await elsewhere.sync()
+    assert elsewhere.is_revoked(server.decode_token(access))
+
+async def test_refresh_rejects_an_access_token(db, revocations):
+    await db.users.insert_one(dict(USER))
+    
+    with pytest.raises(HTTPException) as refused:
+        await refresh_session(request_with(refresh_token=create_access_token(USER, None)), Response())
+    assert refused.value.status_code == 401
+    
+    response = Response()
+    result = await refresh_session(request_with(refresh_token=create_refresh_token(USER["id"])), response)
+    assert result["user"]["id"] == USER["id"]
+    assert "token=" in response.headers["set-cookie"]
+
+async def test_sync_is_incremental_with_an_overlap_window(db, revocations):
+    now = datetime.now(timezone.utc)
+    await db.revocations.insert_one({"subject": "token:first", "revokedAt": now - timedelta(minutes=5)})
+    await revocations.sync()
+    assert "token:first" in revocations.revoked
+    
+    overlap = timedelta(seconds=server.REVOCATION_SYNC_INTERVAL_SECONDS)
+    await db.revocations.insert_many([
+        # Written by a worker whose clock lags, so it lands just behind the last sync point
+        {"subject": "token:skewed", "revokedAt": now - timedelta(minutes=5) - overlap / 2},
+        # Older than the overlap: a previous sync already saw everything this old
+        {"subject": "token:ancient", "revokedAt": now - timedelta(minutes=5) - overlap * 2},
+        {"subject": "token:new", "revokedAt": now}
+    ])
+    await revocations.sync()
+    
+    assert {"token:first", "token:skewed", "token:new"} <= set(revocations.revoked)
+    assert "token:ancient" not in revocations.revoked
+    assert server.as_utc(revocations.synced_until) == now.replace(microsecond=now.microsecond // 1000 * 1000)
+
+async def test_sync_forgets_revocations_older_than_any_live_token(db, revocations):
+    expired = datetime.now(timezone.utc) - timedelta(days=server.REFRESH_TOKEN_TTL_DAYS + 1)
+    await db.revocations.insert_one({"subject": "user:gone", "revokedAt": expired})
+    
+    await revocations.sync()
+    
+    assert "user:gone" not in revocations.revoked
@@ -0,0 +1,37 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import server
+from server import purge_orphaned_blobs, reconcile_blob_refcounts
+
+pytestmark = pytest.mark.anyio
+
+async def insert_blob(db, sha256: str, ref_count: int, age_seconds: float):
+    path = server.blob_path(sha256, "g1")
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_bytes(b"%PDF-1.4")
+    touched = datetime.now(timezone.utc) - timedelta(seconds=age_seconds)
+    await db.blobs.insert_one({"id": sha256, "path": str(path), "size": 8, "refCount": ref_count, "createdAt": touched, "lastReferencedAt": touched})
+    return path
+
+async def test_leaked_reference_is_recounted_and_collected(db):
+    stale = server.BLOB_GC_GRACE_SECONDS + 60
+    # The project was deleted but the worker died before releasing the blob
+    leaked = await insert_blob(db, "a" * 64, 1, stale)
+    shared = await insert_blob(db, "b" * 64, 3, stale)
+    await db.projects.insert_many([{"id": f"project-{i}", "companyId": "company-1", "blobId": "b" * 64} for i in range(2)])
+    
+    assert await reconcile_blob_refcounts(batch_size=1) == 2
+    assert await purge_orphaned_blobs() == 1
+    
+    assert not leaked.exists()
+    assert shared.exists()
+    assert (await db.blobs.find_one({"id": "b" * 64}))["refCount"] == 2
+
+async def test_recently_referenced_blob_is_left_alone(db):
+    # An upload between reference_blob and insert_project has no project yet
+    await insert_blob(db, "c" * 64, 1, 5)
+    
+    assert await reconcile_blob_refcounts() == 0
+    assert (await db.blobs.find_one({"id": "c" * 64}))["refCount"] == 1
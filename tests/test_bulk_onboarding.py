@@ -0,0 +1,56 @@
+import json
+
+import pytest
+from pymongo.errors import AutoReconnect
+from starlette.requests import Request
+
+import server
+from server import UserRole, bulk_onboard_companies
+
+pytestmark = pytest.mark.anyio
+
+MARKETING_USER = {"id": "marketer", "role": UserRole.MARKETING}
+
+def import_request(rows: list) -> Request:
+    body = json.dumps(rows).encode()
+    
+    async def receive():
+        return {"type": "http.request", "body": body, "more_body": False}
+    
+    return Request({"type": "http", "method": "POST", "headers": [(b"content-type", b"application/json")]}, receive)
+
+def company_row(index: int) -> dict:
+    return {"name": f"Company {index}", "adminName": f"Admin {index}", "adminEmail": f"admin{index}@example.com", "adminPassword": "Passw0rd!"}
+
+@pytest.fixture(autouse=True)
+def fast_hashes(monkeypatch):
+    async def hash_many(passwords):
+        return [f"hash:{password}" for password in passwords]
+    
+    monkeypatch.setattr(server.password_hasher, "hash_many", hash_many)
+
+async def test_bulk_onboarding_creates_companies_and_admins(db):
+    response = await bulk_onboard_companies(import_request([company_row(1), company_row(2)]), MARKETING_USER)
+    
+    assert response["created"] == 2
+    assert await db.companies.count_documents({}) == 2
+    assert await db.users.count_documents({"role": UserRole.CLIENT_ADMIN}) == 2
+
+async def test_companies_without_admins_are_rolled_back_on_unexpected_errors(db, monkeypatch):
+    collection_type = type(db.users)
+    original = collection_type.insert_many
+    
+    async def insert_first_then_drop(self, documents, *args, **kwargs):
+        if self.name != "users":
+            return await original(self, documents, *args, **kwargs)
+        await original(self, documents[:1], *args, **kwargs)
+        raise AutoReconnect("connection reset")
+    
+    monkeypatch.setattr(collection_type, "insert_many", insert_first_then_drop)
+    with pytest.raises(AutoReconnect):
+        await bulk_onboard_companies(import_request([company_row(1), company_row(2), company_row(3)]), MARKETING_USER)
+    
+    admins = await db.users.find({}, {"_id": 0, "companyId": 1}).to_list(None)
+    companies = await db.companies.find({}, {"_id": 0, "id": 1}).to_list(None)
+    assert [company["id"] for company in companies] == [admin["companyId"] for admin in admins]
+    assert len(companies) == 1
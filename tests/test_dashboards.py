@@ -0,0 +1,52 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import server
+from server import SortOrder, UserRole, get_all_users, marketing_dashboard, super_admin_dashboard
+
+pytestmark = pytest.mark.anyio
+
+SUPER_ADMIN = {"id": "root", "role": UserRole.SUPER_ADMIN}
+
+@pytest.fixture
+async def staff(db, monkeypatch):
+    monkeypatch.setattr(server, "DASHBOARD_LIST_LIMIT", 2)
+    started = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    roles = [UserRole.MARKETING] * 3 + [UserRole.SUPER_ADMIN] + [UserRole.CLIENT_ENGINEER] * 2
+    await db.users.insert_many([
+        {"id": f"user-{index}", "name": f"User {index}", "email": f"user{index}@example.com", "role": role, "createdAt": started + timedelta(minutes=index)}
+        for index, role in enumerate(roles)
+    ])
+
+async def test_super_admin_dashboard_counts_all_staff(staff):
+    dashboard = await super_admin_dashboard(SUPER_ADMIN)
+    
+    assert dashboard["userCount"] == 4
+    assert len(dashboard["users"]["items"]) == 2
+    assert dashboard["users"]["nextCursor"]
+
+async def test_load_more_follows_the_dashboard_cursor_across_roles(staff):
+    dashboard = await super_admin_dashboard(SUPER_ADMIN)
+    
+    page = await get_all_users(
+        cursor=dashboard["users"]["nextCursor"],
+        limit=50,
+        order=SortOrder.DESC,
+        role=[UserRole.SUPER_ADMIN, UserRole.MARKETING],
+        user=SUPER_ADMIN
+    )
+    
+    ids = [item["id"] for item in dashboard["users"]["items"] + page["items"]]
+    assert ids == ["user-3", "user-2", "user-1", "user-0"]
+    assert page["nextCursor"] is None
+
+async def test_marketing_dashboard_counts_every_company(db, monkeypatch):
+    monkeypatch.setattr(server, "DASHBOARD_LIST_LIMIT", 2)
+    now = datetime.now(timezone.utc)
+    await db.companies.insert_many([{"id": f"company-{index}", "name": f"Company {index}", "createdAt": now} for index in range(5)])
+    
+    dashboard = await marketing_dashboard(SUPER_ADMIN)
+    
+    assert dashboard["companyCount"] == 5
+    assert len(dashboard["companies"]["items"]) == 2
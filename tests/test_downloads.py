@@ -0,0 +1,104 @@
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import server
+from server import download_project_file, parse_byte_range
+
+pytestmark = pytest.mark.anyio
+
+CONTENT = bytes(range(100))
+USER = {"id": "user-1", "role": server.UserRole.CLIENT_ENGINEER, "companyId": "company-1"}
+
+@pytest.mark.parametrize("header, expected", [
+    ("bytes=0-9", (0, 9)),
+    ("bytes=90-", (90, 99)),
+    ("bytes=-10", (90, 99)),
+    ("bytes=-500", (0, 99)),
+    ("bytes=95-500", (95, 99)),
+    ("bytes=5-3", None),
+    ("bytes=0-1,5-9", None),
+    ("items=0-9", None),
+    ("bytes=-", None),
+])
+def test_parse_byte_range(header, expected):
+    assert parse_byte_range(header, len(CONTENT)) == expected
+
+@pytest.mark.parametrize("header", ["bytes=100-", "bytes=200-300", "bytes=-0"])
+def test_unsatisfiable_range_is_refused(header):
+    with pytest.raises(HTTPException) as refused:
+        parse_byte_range(header, len(CONTENT))
+    
+    assert refused.value.status_code == 416
+    assert refused.value.headers["Content-Range"] == "bytes */100"
+
+@pytest.fixture
+async def project(db, tmp_path):
+    path = tmp_path / "drawing.pdf"
+    path.write_bytes(CONTENT)
+    await db.projects.insert_one({
+        "id": "project-1",
+        "companyId": "company-1",
+        "filePath": str(path),
+        "fileName": "drawing.pdf",
+        "drawingType": "PDF",
+        "checksum": "abc123"
+    })
+
+def request_with(**headers) -> Request:
+    raw = [(name.replace("_", "-").encode(), value.encode()) for name, value in headers.items()]
+    return Request({"type": "http", "method": "GET", "headers": raw})
+
+async def body_of(response) -> bytes:
+    chunks = []
+    
+    async def send(message):
+        if message["type"] == "http.response.body":
+            chunks.append(message["body"])
+    
+    await response({"type": "http", "method": "GET"}, None, send)
+    return b"".join(chunks)
+
+async def test_full_download(project):
+    response = await download_project_file("project-1", request_with(), user=USER)
+    
+    assert response.status_code == 200
+    assert response.headers["etag"] == '"abc123"'
+    assert response.headers["accept-ranges"] == "bytes"
+    assert await body_of(response) == CONTENT
+
+async def test_range_returns_partial_content(project):
+    response = await download_project_file("project-1", request_with(range="bytes=10-19"), user=USER)
+    
+    assert response.status_code == 206
+    assert response.headers["content-range"] == "bytes 10-19/100"
+    assert response.headers["content-length"] == "10"
+    assert await body_of(response) == CONTENT[10:20]
+
+async def test_invalid_range_is_ignored(project):
+    response = await download_project_file("project-1", request_with(range="bytes=5-3"), user=USER)
+    
+    assert response.status_code == 200
+    assert await body_of(response) == CONTENT
+
+async def test_if_range_mismatch_sends_the_whole_file(project):
+    matching = await download_project_file("project-1", request_with(range="bytes=0-9", if_range='"abc123"'), user=USER)
+    stale = await download_project_file("project-1", request_with(range="bytes=0-9", if_range='"old"'), user=USER)
+    
+    assert matching.status_code == 206
+    assert stale.status_code == 200
+    assert await body_of(stale) == CONTENT
+
+@pytest.mark.parametrize("if_none_match", ['"abc123"', '"old", "abc123"', "*"])
+async def test_matching_etag_is_not_modified(project, if_none_match):
+    response = await download_project_file("project-1", request_with(if_none_match=if_none_match), user=USER)
+    
+    assert response.status_code == 304
+    assert response.headers["etag"] == '"abc123"'
+    assert "content-disposition" not in response.headers
+
+async def test_other_company_is_denied(project):
+    with pytest.raises(HTTPException) as denied:
+        await download_project_file("project-1", request_with(), user={**USER, "companyId": "company-2"})
+    
+    assert denied.value.status_code == 403
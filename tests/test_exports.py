@@ -0,0 +1,33 @@
+import csv
+import io
+from datetime import datetime
+
+import pytest
+
+from server import ExportFormat, export_cell, iter_export_rows
+
+pytestmark = pytest.mark.anyio
+
+@pytest.mark.parametrize("value", ["=HYPERLINK(\"http://x\")", "+1+1", "-2+3", "@SUM(A1)", "\tcmd", "\rcmd"])
+def test_formula_like_strings_are_neutralised(value):
+    assert export_cell(value) == "'" + value
+
+@pytest.mark.parametrize("value, expected", [
+    ("TechStruct Engineering", "TechStruct Engineering"),
+    ("a=b", "a=b"),
+    (-65000, -65000),
+    (None, ""),
+    (datetime(2025, 1, 2, 3, 4, 5), "2025-01-02T03:04:05"),
+])
+def test_ordinary_values_are_unchanged(value, expected):
+    assert export_cell(value) == expected
+
+async def test_csv_export_escapes_company_names():
+    async def documents():
+        yield {"id": "c1", "name": "=cmd|' /C calc'!A0"}
+        yield {"id": "c2", "name": "Plain Co"}
+    
+    body = "".join([chunk async for chunk in iter_export_rows(documents(), ["id", "name"], ExportFormat.CSV)])
+    
+    rows = list(csv.reader(io.StringIO(body)))
+    assert rows == [["id", "name"], ["c1", "'=cmd|' /C calc'!A0"], ["c2", "Plain Co"]]
@@ -0,0 +1,53 @@
+import contextvars
+import threading
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import server
+from server import MongoCommandMetrics, get_metrics, request_metrics
+
+pytestmark = pytest.mark.anyio
+
+def scrape_request(authorization: str = None) -> Request:
+    headers = [(b"authorization", authorization.encode())] if authorization else []
+    return Request({"type": "http", "headers": headers})
+
+async def test_metrics_are_disabled_without_a_token(monkeypatch):
+    monkeypatch.setattr(server, "METRICS_TOKEN", None)
+    
+    with pytest.raises(HTTPException) as exc:
+        await get_metrics(scrape_request())
+    assert exc.value.status_code == 404
+
+@pytest.mark.parametrize("authorization", [None, "Bearer wrong", "test-metrics-token"])
+async def test_metrics_reject_missing_or_wrong_token(authorization):
+    with pytest.raises(HTTPException) as exc:
+        await get_metrics(scrape_request(authorization))
+    assert exc.value.status_code == 401
+
+async def test_metrics_are_served_with_the_token():
+    response = await get_metrics(scrape_request(f"Bearer {server.METRICS_TOKEN}"))
+    
+    assert b"# TYPE http_requests_total counter" in response.body
+
+def test_request_tally_survives_concurrent_listener_threads():
+    listener = MongoCommandMetrics()
+    tally = {"mongoCommands": 0, "mongoSeconds": 0.0}
+    token = request_metrics.set(tally)
+    try:
+        def issue_commands():
+            for _ in range(2000):
+                listener.record("find", 1, "ok")
+        
+        # Threads inherit nothing from contextvars, so hand each one the caller's context like Motor does
+        threads = [threading.Thread(target=contextvars.copy_context().run, args=(issue_commands,)) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+    finally:
+        request_metrics.reset(token)
+    
+    assert tally["mongoCommands"] == 16000
@@ -0,0 +1,95 @@
+import base64
+from datetime import datetime, timedelta
+
+import pytest
+from fastapi import HTTPException
+
+import server
+from server import SortOrder, decode_cursor, encode_cursor, paginate
+
+pytestmark = pytest.mark.anyio
+
+BASE = datetime(2025, 1, 1, 12, 0, 0)
+
+async def seed(db, count: int, same_timestamp_every: int = 1):
+    # Groups of documents share a createdAt so the id tie-breaker is exercised
+    await db.items.insert_many([
+        {"id": f"item{i:03d}", "createdAt": BASE + timedelta(seconds=i // same_timestamp_every)}
+        for i in range(count)
+    ])
+
+async def walk(db, order: SortOrder, limit: int) -> list:
+    ids, cursor = [], None
+    while True:
+        page = await paginate(db.items, {}, "createdAt", cursor, limit, order, {"_id": 0})
+        assert len(page["items"]) <= limit
+        ids.extend(item["id"] for item in page["items"])
+        cursor = page["nextCursor"]
+        if not cursor:
+            return ids
+
+@pytest.mark.parametrize("order", [SortOrder.DESC, SortOrder.ASC])
+async def test_walk_visits_every_document_once_in_order(db, order):
+    await seed(db, 23, same_timestamp_every=4)
+    
+    ids = await walk(db, order, limit=5)
+    
+    expected = sorted((f"item{i:03d}" for i in range(23)), reverse=order == SortOrder.DESC)
+    assert ids == expected
+
+async def test_ties_on_sort_field_are_broken_by_id(db):
+    await seed(db, 10, same_timestamp_every=10)
+    
+    first = await paginate(db.items, {}, "createdAt", None, 3, SortOrder.DESC, {"_id": 0})
+    second = await paginate(db.items, {}, "createdAt", first["nextCursor"], 3, SortOrder.DESC, {"_id": 0})
+    
+    assert [item["id"] for item in first["items"]] == ["item009", "item008", "item007"]
+    assert [item["id"] for item in second["items"]] == ["item006", "item005", "item004"]
+
+async def test_last_page_has_no_cursor(db):
+    await seed(db, 4)
+    
+    page = await paginate(db.items, {}, "createdAt", None, 4, SortOrder.DESC, {"_id": 0})
+    
+    assert len(page["items"]) == 4
+    assert page["nextCursor"] is None
+
+async def test_query_filter_is_kept_across_pages(db):
+    await seed(db, 12)
+    await db.items.update_many({"id": {"$in": ["item001", "item005", "item009"]}}, {"$set": {"flag": True}})
+    
+    ids, cursor = [], None
+    while True:
+        page = await paginate(db.items, {"flag": True}, "createdAt", cursor, 1, SortOrder.ASC, {"_id": 0})
+        ids.extend(item["id"] for item in page["items"])
+        cursor = page["nextCursor"]
+        if not cursor:
+            break
+    
+    assert ids == ["item001", "item005", "item009"]
+
+def test_cursor_round_trip():
+    cursor = encode_cursor({"id": "abc", "createdAt": BASE}, "createdAt")
+    
+    assert "=" not in cursor
+    assert decode_cursor(cursor) == (BASE, "abc")
+
+@pytest.mark.parametrize("cursor", [
+    "not-base64!!",
+    base64.urlsafe_b64encode(b"not json").decode(),
+    base64.urlsafe_b64encode(b'["2025-01-01T00:00:00"]').decode(),
+    base64.urlsafe_b64encode(b'[12, "abc"]').decode(),
+    base64.urlsafe_b64encode(b'["yesterday", "abc"]').decode(),
+    "été",
+])
+def test_invalid_cursor_is_rejected_with_400(cursor):
+    with pytest.raises(HTTPException) as error:
+        decode_cursor(cursor)
+    
+    assert error.value.status_code == 400
+
+async def test_paginate_rejects_invalid_cursor(db):
+    with pytest.raises(HTTPException) as error:
+        await paginate(server.db.items, {}, "createdAt", "bogus", 10, SortOrder.DESC, {"_id": 0})
+    
+    assert error.value.status_code == 400
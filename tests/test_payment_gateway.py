@@ -0,0 +1,80 @@
+import httpx
+import pytest
+
+import server
+from server import CircuitBreaker, PaymentGatewayError, PaymentGatewayUnavailable, RazorpayGateway
+
+pytestmark = pytest.mark.anyio
+
+def gateway_with(handler) -> RazorpayGateway:
+    gateway = RazorpayGateway("rzp_test", "secret", "webhook_secret")
+    gateway.client = httpx.AsyncClient(base_url="https://razorpay.test", transport=httpx.MockTransport(handler))
+    return gateway
+
+@pytest.fixture(autouse=True)
+def no_backoff(monkeypatch):
+    async def instant(_):
+        return None
+    monkeypatch.setattr(server.asyncio, "sleep", instant)
+
+def open_breaker(gateway: RazorpayGateway):
+    for _ in range(gateway.breaker.failure_threshold):
+        gateway.breaker.record_failure()
+    gateway.breaker.opened_at -= gateway.breaker.reset_seconds
+
+async def test_open_breaker_rejects_without_calling_razorpay():
+    calls = []
+    gateway = gateway_with(lambda request: calls.append(request) or httpx.Response(200, json={}))
+    open_breaker(gateway)
+    gateway.breaker.opened_at += gateway.breaker.reset_seconds
+    
+    with pytest.raises(PaymentGatewayUnavailable):
+        await gateway.fetch_payment("pay_1")
+    assert calls == []
+
+async def test_half_open_trial_with_client_error_closes_breaker():
+    gateway = gateway_with(lambda request: httpx.Response(400, json={"error": "bad request"}))
+    open_breaker(gateway)
+    
+    with pytest.raises(PaymentGatewayError):
+        await gateway.create_order(100, "INR")
+    
+    assert gateway.breaker.opened_at is None
+    assert gateway.breaker.allow()
+
+async def test_half_open_trial_with_server_error_keeps_breaker_open():
+    gateway = gateway_with(lambda request: httpx.Response(503))
+    open_breaker(gateway)
+    
+    with pytest.raises(PaymentGatewayError):
+        await gateway.create_order(100, "INR")
+    
+    assert gateway.breaker.opened_at is not None
+    assert not gateway.breaker.allow()
+
+async def test_fetch_payment_retries_server_errors():
+    responses = iter([httpx.Response(502), httpx.Response(200, json={"id": "pay_1", "status": "captured"})])
+    gateway = gateway_with(lambda request: next(responses))
+    
+    payment = await gateway.fetch_payment("pay_1")
+    
+    assert payment["status"] == "captured"
+
+async def test_create_order_is_not_retried_after_a_server_error():
+    calls = []
+    
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(500)
+    gateway = gateway_with(handler)
+    
+    with pytest.raises(PaymentGatewayError):
+        await gateway.create_order(100, "INR")
+    assert len(calls) == 1
+
+def test_breaker_opens_after_threshold():
+    breaker = CircuitBreaker(failure_threshold=2, reset_seconds=60)
+    breaker.record_failure()
+    assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
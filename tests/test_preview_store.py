@@ -0,0 +1,31 @@
+import os
+import time
+
+import server
+from server import PreviewStore
+
+def test_missing_preview_is_a_miss(tmp_path):
+    store = PreviewStore(tmp_path, max_bytes=1024)
+    
+    assert store.get(tmp_path / "absent.png") is None
+
+def test_stale_preview_is_touched(tmp_path):
+    preview = tmp_path / "preview.png"
+    preview.write_bytes(b"png")
+    os.utime(preview, (time.time() - 3600, time.time() - 3600))
+    store = PreviewStore(tmp_path, max_bytes=1024)
+    
+    assert store.get(preview) == preview
+    assert time.time() - preview.stat().st_mtime < 60
+
+def test_preview_evicted_before_touch_is_a_miss(tmp_path, monkeypatch):
+    preview = tmp_path / "preview.png"
+    preview.write_bytes(b"png")
+    os.utime(preview, (time.time() - 3600, time.time() - 3600))
+    store = PreviewStore(tmp_path, max_bytes=1024)
+    
+    def evicted(path, *args):
+        raise FileNotFoundError(path)
+    
+    monkeypatch.setattr(server.os, "utime", evicted)
+    assert store.get(preview) is None
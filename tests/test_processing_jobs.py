@@ -0,0 +1,111 @@
+import asyncio
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import server
+from server import JobStatus, claim_next_processing_job, run_processing_job
+
+pytestmark = pytest.mark.anyio
+
+async def insert_job(db, job_id: str, company_id: str, status: str = JobStatus.QUEUED, **fields):
+    now = datetime.now(timezone.utc)
+    await db.processing_jobs.insert_one({
+        "id": job_id,
+        "projectId": f"project-{job_id}",
+        "companyId": company_id,
+        "status": status,
+        "attempts": 0,
+        "nextAttemptAt": now - timedelta(seconds=1),
+        "createdAt": now - timedelta(minutes=1),
+        **fields
+    })
+
+@pytest.fixture
+def claimable(db, monkeypatch):
+    # mongomock's find_one_and_update returns None whenever a projection excludes _id
+    collection_type = type(db.processing_jobs)
+    original = collection_type.find_one_and_update
+    
+    async def find_one_and_update(self, *args, projection=None, **kwargs):
+        document = await original(self, *args, **kwargs)
+        if document is not None:
+            document.pop("_id", None)
+        return document
+    
+    monkeypatch.setattr(collection_type, "find_one_and_update", find_one_and_update)
+
+async def test_company_cap_counts_jobs_running_on_other_workers(db, claimable, monkeypatch):
+    monkeypatch.setattr(server, "PROCESSING_MAX_PER_COMPANY", 1)
+    lease = datetime.now(timezone.utc) + timedelta(minutes=5)
+    await insert_job(db, "busy", "company-a", JobStatus.RUNNING, claimedBy="other-worker", leaseExpiresAt=lease)
+    await insert_job(db, "waiting-a", "company-a")
+    await insert_job(db, "waiting-b", "company-b", createdAt=datetime.now(timezone.utc))
+    
+    job = await claim_next_processing_job()
+    
+    assert job["id"] == "waiting-b"
+    assert await claim_next_processing_job() is None
+
+async def test_lease_is_renewed_while_a_stage_runs(db, monkeypatch):
+    monkeypatch.setattr(server, "PROCESSING_HEARTBEAT_SECONDS", 0.05)
+    started = datetime.now(timezone.utc)
+    await db.projects.insert_one({"id": "project-slow", "companyId": "company-a", "filePath": "/dev/null", "drawingType": "PDF", "checksum": "abc"})
+    await insert_job(db, "slow", "company-a", JobStatus.RUNNING, claimedBy=server.WORKER_ID, attempts=1, leaseExpiresAt=started)
+    
+    def slow_stage(project):
+        time.sleep(0.3)
+        return {}
+    
+    monkeypatch.setattr(server, "PROCESSING_STAGES", [("slow", slow_stage)])
+    task = asyncio.create_task(run_processing_job(await db.processing_jobs.find_one({"id": "slow"}, {"_id": 0})))
+    await asyncio.sleep(0.2)
+    
+    renewed = await db.processing_jobs.find_one({"id": "slow"})
+    assert server.as_utc(renewed["leaseExpiresAt"]) > started
+    assert renewed["status"] == JobStatus.RUNNING
+    
+    await task
+    assert (await db.processing_jobs.find_one({"id": "slow"}))["status"] == JobStatus.SUCCEEDED
+
+@pytest.fixture
+def pool(monkeypatch):
+    # Thread pools stand in for process pools so the test never forks
+    monkeypatch.setattr(server, "ProcessPoolExecutor", server.ThreadPoolExecutor)
+    executor = server.ThreadPoolExecutor(max_workers=1)
+    monkeypatch.setattr(server, "processing_executor", executor)
+    yield executor
+    server.processing_executor.shutdown(wait=False)
+
+def crashing_stage(project):
+    raise server.BrokenProcessPool("A child process terminated abruptly")
+
+async def test_broken_pool_is_replaced_and_job_requeued_without_charge(db, pool, monkeypatch):
+    await db.projects.insert_one({"id": "project-crash", "companyId": "company-a", "filePath": "/dev/null", "drawingType": "PDF", "checksum": "abc"})
+    await insert_job(db, "crash", "company-a", JobStatus.RUNNING, claimedBy=server.WORKER_ID, attempts=1)
+    monkeypatch.setattr(server, "PROCESSING_STAGES", [("crash", crashing_stage)])
+    
+    await run_processing_job(await db.processing_jobs.find_one({"id": "crash"}, {"_id": 0}))
+    
+    assert server.processing_executor is not pool
+    stored = await db.processing_jobs.find_one({"id": "crash"})
+    assert stored["status"] == JobStatus.QUEUED
+    assert stored["attempts"] == 0
+    assert stored["poolCrashes"] == 1
+    
+    # The next run lands on the new pool and succeeds
+    monkeypatch.setattr(server, "PROCESSING_STAGES", [("ok", lambda project: {})])
+    await run_processing_job(await db.processing_jobs.find_one({"id": "crash"}, {"_id": 0}))
+    assert (await db.processing_jobs.find_one({"id": "crash"}))["status"] == JobStatus.SUCCEEDED
+
+async def test_job_that_keeps_breaking_the_pool_eventually_fails(db, pool, monkeypatch):
+    monkeypatch.setattr(server, "PROCESSING_MAX_POOL_CRASHES", 2)
+    await db.projects.insert_one({"id": "project-poison", "companyId": "company-a", "filePath": "/dev/null", "drawingType": "PDF", "checksum": "abc"})
+    await insert_job(db, "poison", "company-a", JobStatus.RUNNING, claimedBy=server.WORKER_ID, attempts=1, poolCrashes=1)
+    monkeypatch.setattr(server, "PROCESSING_STAGES", [("crash", crashing_stage)])
+    
+    await run_processing_job(await db.processing_jobs.find_one({"id": "poison"}, {"_id": 0}))
+    
+    assert (await db.processing_jobs.find_one({"id": "poison"}))["status"] == JobStatus.FAILED
+    assert (await db.projects.find_one({"id": "project-poison"}))["status"] == server.ProjectStatus.FAILED
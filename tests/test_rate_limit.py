@@ -0,0 +1,81 @@
+import pytest
+from starlette.requests import Request
+
+import server
+from server import MemoryRateLimitBackend, RateLimitBackend, client_ip
+
+pytestmark = pytest.mark.anyio
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+    
+    def __call__(self) -> float:
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(server.time, "monotonic", clock)
+    return clock
+
+def request_from(host: str, forwarded_for: str = None) -> Request:
+    headers = [(b"x-forwarded-for", forwarded_for.encode())] if forwarded_for else []
+    return Request({"type": "http", "headers": headers, "client": (host, 50000)})
+
+async def test_burst_is_allowed_then_rejected(clock):
+    backend = MemoryRateLimitBackend(max_keys=10)
+    
+    waits = [await backend.take("login:ip:1.2.3.4", 1.0, 3) for _ in range(4)]
+    
+    assert waits[:3] == [0.0, 0.0, 0.0]
+    assert waits[3] == pytest.approx(1.0)
+    assert backend.stats()["rejections"] == 1
+
+async def test_tokens_refill_over_time_up_to_burst(clock):
+    backend = MemoryRateLimitBackend(max_keys=10)
+    for _ in range(2):
+        await backend.take("key", 0.5, 2)
+    
+    clock.now += 2
+    assert await backend.take("key", 0.5, 2) == 0.0
+    assert await backend.take("key", 0.5, 2) == pytest.approx(2.0)
+    
+    # A long idle period never banks more than the burst
+    clock.now += 3600
+    waits = [await backend.take("key", 0.5, 2) for _ in range(3)]
+    assert waits[:2] == [0.0, 0.0]
+    assert waits[2] > 0
+
+async def test_least_recently_used_keys_are_evicted(clock):
+    backend = MemoryRateLimitBackend(max_keys=2)
+    await backend.take("a", 1.0, 1)
+    await backend.take("b", 1.0, 1)
+    await backend.take("a", 1.0, 1)
+    await backend.take("c", 1.0, 1)
+    
+    assert backend.stats()["size"] == 2
+    assert backend.stats()["evictions"] == 1
+    # "b" was evicted, so it starts again with a full bucket; "c" is still empty
+    assert await backend.take("b", 1.0, 1) == 0.0
+    assert await backend.take("c", 1.0, 1) > 0
+
+def test_backend_interface_is_abstract():
+    with pytest.raises(TypeError):
+        RateLimitBackend()
+
+def test_forwarded_for_is_ignored_without_trusted_proxies(monkeypatch):
+    monkeypatch.setattr(server, "RATE_LIMIT_TRUSTED_PROXY_HOPS", 0)
+    
+    assert client_ip(request_from("10.0.0.1", "6.6.6.6")) == "10.0.0.1"
+
+@pytest.mark.parametrize("hops, forwarded_for, expected", [
+    (1, "203.0.113.7", "203.0.113.7"),
+    (1, "6.6.6.6, 203.0.113.7", "203.0.113.7"),
+    (2, "6.6.6.6, 203.0.113.7, 10.0.0.2", "203.0.113.7"),
+    (3, "203.0.113.7, 10.0.0.2", "203.0.113.7"),
+])
+def test_client_ip_uses_entry_appended_by_trusted_proxy(monkeypatch, hops, forwarded_for, expected):
+    monkeypatch.setattr(server, "RATE_LIMIT_TRUSTED_PROXY_HOPS", hops)
+    
+    assert client_ip(request_from("10.0.0.1", forwarded_for)) == expected
@@ -0,0 +1,193 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+import server
+from server import (
+    PLATFORM_STATS_ID,
+    SubscriptionStatus,
+    TransactionStatus,
+    apply_settlements,
+    process_payment_events,
+    recover_settlements,
+)
+
+pytestmark = pytest.mark.anyio
+
+PLAN_SNAPSHOT = {"name": "Professional", "price": 4999, "maxUsers": 25, "storageLimitGB": 100}
+
+@pytest.fixture
+async def transaction(db):
+    await db.companies.insert_one({"id": "company-1", "name": "Acme", "subscriptionStatus": SubscriptionStatus.EXPIRED})
+    document = {
+        "id": "tx-1",
+        "companyId": "company-1",
+        "amount": 4999,
+        "currency": "INR",
+        "status": TransactionStatus.CREATED,
+        "razorpayOrderId": "order_1",
+        "planSnapshot": PLAN_SNAPSHOT,
+        "date": datetime.now(timezone.utc)
+    }
+    await db.transactions.insert_one(dict(document))
+    return document
+
+def captured_event(event_id: str) -> dict:
+    return {"id": event_id, "eventType": "payment.captured", "orderId": "order_1", "paymentId": "pay_1", "attempts": 1}
+
+async def total_revenue(db) -> int:
+    stats = await db.platform_stats.find_one({"_id": PLATFORM_STATS_ID}) or {}
+    return stats.get("totalRevenue", 0)
+
+async def assert_settled_once(db):
+    company = await db.companies.find_one({"id": "company-1"})
+    assert company["subscriptionStatus"] == SubscriptionStatus.ACTIVE
+    assert company["subscriptionTier"] == "Professional"
+    assert company["activatedByTransactionId"] == "tx-1"
+    
+    stored = await db.transactions.find_one({"id": "tx-1"})
+    assert stored["status"] == TransactionStatus.PAID
+    assert "settlementPending" not in stored
+    assert await total_revenue(db) == 4999
+
+async def test_duplicate_webhook_settles_once(db, transaction):
+    await process_payment_events([captured_event("evt-1"), captured_event("evt-2")])
+    await process_payment_events([captured_event("evt-3")])
+    
+    await assert_settled_once(db)
+
+async def test_webhook_and_browser_verify_settle_once(db, transaction):
+    await process_payment_events([captured_event("evt-1")])
+    settled = await apply_settlements([{"transaction": transaction, "paymentId": "pay_1", "signature": "sig"}])
+    
+    assert settled == []
+    await assert_settled_once(db)
+
+async def test_retry_finishes_activation_after_failure_past_the_flip(db, transaction, monkeypatch):
+    async def crash(transactions):
+        raise RuntimeError("worker died")
+    
+    monkeypatch.setattr(server, "activate_subscriptions", crash)
+    with pytest.raises(RuntimeError):
+        await apply_settlements([{"transaction": transaction, "paymentId": "pay_1"}])
+    monkeypatch.undo()
+    
+    stored = await db.transactions.find_one({"id": "tx-1"})
+    assert stored["status"] == TransactionStatus.PAID
+    assert stored["activationPending"] is True
+    
+    # The retry no longer wins the flip but still completes the outstanding steps
+    assert await apply_settlements([{"transaction": transaction, "paymentId": "pay_1"}]) == []
+    await assert_settled_once(db)
+
+async def test_revenue_is_not_booked_twice_when_cleanup_fails(db, transaction, monkeypatch):
+    calls = []
+    original = server.record_payments
+    
+    async def record_then_crash(payments):
+        calls.append(payments)
+        await original(payments)
+        raise RuntimeError("worker died")
+    
+    monkeypatch.setattr(server, "record_payments", record_then_crash)
+    with pytest.raises(RuntimeError):
+        await apply_settlements([{"transaction": transaction, "paymentId": "pay_1"}])
+    monkeypatch.undo()
+    
+    await apply_settlements([{"transaction": transaction, "paymentId": "pay_1"}])
+    
+    assert len(calls) == 1
+    await assert_settled_once(db)
+
+async def test_recovery_sweep_finishes_abandoned_settlements(db, transaction):
+    await db.transactions.update_one({"id": "tx-1"}, {"$set": {
+        "status": TransactionStatus.PAID,
+        "paidAt": datetime.now(timezone.utc) - timedelta(minutes=5),
+        "settlementPending": True,
+        "activationPending": True,
+        "revenuePending": True
+    }})
+    
+    await recover_settlements()
+    
+    await assert_settled_once(db)
+
+async def test_older_payment_never_overrides_newer_activation(db, transaction):
+    now = datetime.now(timezone.utc)
+    await db.companies.update_one({"id": "company-1"}, {"$set": {
+        "subscriptionStatus": SubscriptionStatus.ACTIVE,
+        "subscriptionPaidAt": now,
+        "activatedByTransactionId": "tx-newer"
+    }})
+    stale = {**transaction, "paidAt": now - timedelta(days=1)}
+    
+    await server.activate_subscriptions([stale])
+    
+    company = await db.companies.find_one({"id": "company-1"})
+    assert company["activatedByTransactionId"] == "tx-newer"
+
+async def store_event(db, event_id: str, **fields):
+    now = datetime.now(timezone.utc)
+    await db.payment_events.insert_one({
+        "id": event_id,
+        "eventType": "payment.captured",
+        "orderId": "order_1",
+        "paymentId": "pay_1",
+        "status": server.PaymentEventStatus.PENDING,
+        "attempts": 0,
+        "receivedAt": now,
+        "nextAttemptAt": now,
+        **fields
+    })
+
+async def test_gateway_outage_backs_off_instead_of_burning_attempts(db, transaction, monkeypatch):
+    async def unavailable(payment_id):
+        raise server.PaymentGatewayUnavailable("Razorpay is down")
+    
+    monkeypatch.setattr(server.payment_gateway, "fetch_payment", unavailable)
+    await store_event(db, "evt-1")
+    
+    await process_payment_events(await server.claim_payment_events())
+    
+    stored = await db.payment_events.find_one({"id": "evt-1"})
+    assert stored["status"] == server.PaymentEventStatus.PENDING
+    assert stored["attempts"] == 1
+    delay = (server.as_utc(stored["nextAttemptAt"]) - datetime.now(timezone.utc)).total_seconds()
+    assert server.PAYMENT_EVENT_RETRY_BASE_SECONDS / 2 - 1 < delay <= server.PAYMENT_EVENT_RETRY_BASE_SECONDS
+    # Nothing is claimable until the backoff has passed
+    assert await server.claim_payment_events() == []
+    
+    monkeypatch.undo()
+    await db.payment_events.update_one({"id": "evt-1"}, {"$set": {"nextAttemptAt": datetime.now(timezone.utc) - timedelta(seconds=1)}})
+    await process_payment_events(await server.claim_payment_events())
+    
+    assert (await db.payment_events.find_one({"id": "evt-1"}))["status"] == server.PaymentEventStatus.PROCESSED
+    await assert_settled_once(db)
+
+def test_backoff_grows_exponentially_up_to_the_cap():
+    ceilings = [server.payment_event_backoff(attempts).total_seconds() for attempts in range(1, 12)]
+    
+    assert ceilings[0] <= server.PAYMENT_EVENT_RETRY_BASE_SECONDS
+    assert ceilings[3] >= server.PAYMENT_EVENT_RETRY_BASE_SECONDS * 4
+    assert max(ceilings) <= server.PAYMENT_EVENT_RETRY_MAX_SECONDS
+
+async def test_events_stored_before_backoff_are_still_claimed(db, transaction):
+    await store_event(db, "evt-legacy")
+    await db.payment_events.update_one({"id": "evt-legacy"}, {"$unset": {"nextAttemptAt": ""}})
+    
+    assert [event["id"] for event in await server.claim_payment_events()] == ["evt-legacy"]
+
+async def test_browser_verify_refreshes_cache_after_webhook_settled_elsewhere(db, transaction):
+    user = {"id": "user-1", "role": server.UserRole.CLIENT_ADMIN, "companyId": "company-1"}
+    # This worker cached the expired state; the webhook then settles on another worker
+    with pytest.raises(server.HTTPException) as refused:
+        await server.check_subscription_status(user)
+    assert refused.value.status_code == 403
+    await process_payment_events([captured_event("evt-1")])
+    server.cache_subscription_state("company-1", SubscriptionStatus.EXPIRED, None)
+    
+    payment = server.PaymentVerify(razorpayOrderId="order_1", razorpayPaymentId="pay_1", razorpaySignature=server.payment_gateway.sign("order_1", "pay_1"))
+    await server.verify_payment(payment, server.Response(), user)
+    
+    assert await server.check_subscription_status(user) is True
+    await assert_settled_once(db)
@@ -0,0 +1,141 @@
+import hashlib
+from datetime import datetime, timedelta, timezone
+
+import pytest
+from fastapi import HTTPException
+from starlette.requests import Request
+
+import server
+from server import (
+    UploadSessionCreate,
+    UploadSessionStatus,
+    complete_upload_session,
+    create_upload_session,
+    purge_expired_upload_sessions,
+    upload_chunk,
+)
+
+pytestmark = pytest.mark.anyio
+
+CHUNK = 1024 * 1024
+CONTENT = b"%PDF-1.4\n" + bytes(range(256)) * (CHUNK // 128)
+USER = {
+    "id": "user-1",
+    "role": server.UserRole.CLIENT_ENGINEER,
+    "companyId": "company-1",
+    "subscription": {"status": server.SubscriptionStatus.ACTIVE, "expiresAt": datetime.now(timezone.utc) + timedelta(days=30)}
+}
+
+@pytest.fixture
+async def uploads(db, monkeypatch):
+    monkeypatch.setattr(server, "UPLOAD_SESSION_CHUNK_SIZE_MB", 1)
+    for directory in (server.UPLOAD_TMP_DIR, server.BLOB_DIR):
+        directory.mkdir(parents=True, exist_ok=True)
+    return db
+
+def body_request(body: bytes) -> Request:
+    messages = [{"type": "http.request", "body": body, "more_body": False}]
+    
+    async def receive():
+        return messages.pop(0) if messages else {"type": "http.disconnect"}
+    
+    return Request({"type": "http", "method": "PUT", "headers": []}, receive)
+
+async def open_session(sha256: str = None) -> dict:
+    data = UploadSessionCreate(title="Tower", location="Pune", drawingType="PDF", fileName="tower.pdf", totalSize=len(CONTENT), sha256=sha256)
+    return await create_upload_session(data, USER)
+
+async def send_all_chunks(session: dict):
+    for index in session["missingChunks"]:
+        await upload_chunk(session["uploadId"], index, body_request(CONTENT[index * CHUNK:(index + 1) * CHUNK]), USER)
+
+async def test_chunks_must_match_the_expected_size(uploads):
+    session = await open_session()
+    assert session["totalChunks"] == 3
+    
+    with pytest.raises(HTTPException) as short:
+        await upload_chunk(session["uploadId"], 0, body_request(b"x" * 10), USER)
+    assert short.value.status_code == 400
+    with pytest.raises(HTTPException) as oversized:
+        await upload_chunk(session["uploadId"], 0, body_request(b"x" * (CHUNK + 1)), USER)
+    assert oversized.value.status_code == 413
+    with pytest.raises(HTTPException) as out_of_range:
+        await upload_chunk(session["uploadId"], 3, body_request(b"x"), USER)
+    assert out_of_range.value.status_code == 400
+    
+    stored = await uploads.upload_sessions.find_one({"id": session["uploadId"]})
+    assert stored["receivedChunks"] == []
+    assert not server.upload_chunk_path(session["uploadId"], 0).exists()
+
+async def test_finalize_assembles_once(uploads):
+    session = await open_session()
+    with pytest.raises(HTTPException) as incomplete:
+        await complete_upload_session(session["uploadId"], USER)
+    assert incomplete.value.status_code == 409
+    await send_all_chunks(session)
+    
+    created = await complete_upload_session(session["uploadId"], USER)
+    
+    project = await uploads.projects.find_one({"id": created["id"]})
+    assert project["checksum"] == hashlib.sha256(CONTENT).hexdigest()
+    assert server.Path(project["filePath"]).read_bytes() == CONTENT
+    assert not server.upload_session_dir(session["uploadId"]).exists()
+    # A retried finalize returns the same project rather than creating another
+    assert (await complete_upload_session(session["uploadId"], USER))["id"] == created["id"]
+    assert await uploads.projects.count_documents({}) == 1
+
+async def test_finalize_already_claimed_elsewhere_is_refused(uploads):
+    session = await open_session()
+    await send_all_chunks(session)
+    await uploads.upload_sessions.update_one({"id": session["uploadId"]}, {"$set": {"status": UploadSessionStatus.ASSEMBLING}})
+    
+    with pytest.raises(HTTPException) as claimed:
+        await complete_upload_session(session["uploadId"], USER)
+    
+    assert claimed.value.status_code == 409
+
+async def test_failed_finalize_rolls_back_for_a_retry(uploads, monkeypatch):
+    session = await open_session()
+    await send_all_chunks(session)
+    collection_type = type(uploads.projects)
+    original = collection_type.insert_one
+    
+    async def fail_for_projects(self, document, *args, **kwargs):
+        if self.name == "projects":
+            raise RuntimeError("primary stepped down")
+        return await original(self, document, *args, **kwargs)
+    
+    monkeypatch.setattr(collection_type, "insert_one", fail_for_projects)
+    with pytest.raises(RuntimeError):
+        await complete_upload_session(session["uploadId"], USER)
+    monkeypatch.undo()
+    
+    stored = await uploads.upload_sessions.find_one({"id": session["uploadId"]})
+    assert stored["status"] == UploadSessionStatus.OPEN
+    assert (await uploads.blobs.find_one({}))["refCount"] == 0
+    
+    created = await complete_upload_session(session["uploadId"], USER)
+    assert (await uploads.blobs.find_one({}))["refCount"] == 1
+    assert await uploads.projects.find_one({"id": created["id"]})
+
+async def test_known_hash_skips_the_transfer(uploads):
+    first = await open_session()
+    await send_all_chunks(first)
+    await complete_upload_session(first["uploadId"], USER)
+    
+    second = await open_session(sha256=hashlib.sha256(CONTENT).hexdigest())
+    
+    assert second["status"] == UploadSessionStatus.COMPLETED
+    assert second["missingChunks"] == []
+    assert (await uploads.blobs.find_one({}))["refCount"] == 2
+
+async def test_expired_sessions_are_purged_with_their_chunks(uploads):
+    expired, live = await open_session(), await open_session()
+    await upload_chunk(expired["uploadId"], 0, body_request(CONTENT[:CHUNK]), USER)
+    await uploads.upload_sessions.update_one({"id": expired["uploadId"]}, {"$set": {"expiresAt": datetime.now(timezone.utc) - timedelta(minutes=1)}})
+    
+    assert await purge_expired_upload_sessions() == 1
+    
+    assert not server.upload_session_dir(expired["uploadId"]).exists()
+    assert await uploads.upload_sessions.find_one({"id": expired["uploadId"]}) is None
+    assert await uploads.upload_sessions.find_one({"id": live["uploadId"]})